@@ -1,38 +1,35 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
-import re
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from recommender import Recommender, RecommendationCache
+from recommender.engine import requested_sections
+from recommender.recording import RequestRecorder
+from recommender.tiers import clients, load_tiers
+from recommender.workers import ProcessSemaphore, DEFAULT_LOCK_DIR
 
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
 
-# Initialize Gemini LLM
-llm = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-pro",
-    temperature=0.2,
-    api_key=API_KEY
-)
+# Environment and recommendation engine, built once per process
+@st.cache_resource
+def get_recommender():
+    load_dotenv()
+    # Optional cap on concurrent Gemini calls shared with every other app process on this host
+    max_llm_calls = int(os.getenv("RECOMMENDER_MAX_LLM_CALLS", "0"))
+    semaphore = None
+    if max_llm_calls:
+        semaphore = ProcessSemaphore(os.getenv("RECOMMENDER_LOCK_DIR", DEFAULT_LOCK_DIR), max_llm_calls)
+    # Cheapest model from config.toml first, escalating when its answer falls short
+    tiers = clients(load_tiers(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.toml")),
+                    semaphore=semaphore)
+    # Opt-in request log for benchmarks/bench_replay.py
+    record_path = os.getenv("RECOMMENDER_RECORD_PATH")
+    recorder = RequestRecorder(record_path) if record_path else None
+    return Recommender(cache=RecommendationCache(), tiers=tiers, recorder=recorder)
 
-# Prompt template
-movie_title_template = ChatPromptTemplate.from_messages([
-    ("system", """You are a helpful movie assistant. Based on the user's preferences (language: {lang}, genre: {genre}, type: {type}, formula: {formula}, year_range: {year_range}):
-- Provide **5 movie names** under a section called `Movies`.
-- Provide **5 series names** under a section called `Series`.
-- Give each item a very short 2-line explanation.
-- Return the results in **bullet format under clear headers**.
-- Strictly no use of emojis.
-"""),
-    ("user", "I want to watch something in {lang}. "
-             "I'm in the mood for {genre}. "
-             "I prefer {type} and from the {formula} industry. "
-             "I want to watch on {platform}. "
-             "My current mood is {mood}. "
-             "The movie/series should be between this year range {year_range}. "
-             "Please give me best suggestions according to my preferences.")
-])
+
+recommender = get_recommender()
+
+# Render each recommendation as soon as the model finishes it instead of waiting for the full answer
+STREAMING = os.getenv("RECOMMENDER_STREAMING", "1") == "1"
 
 # Streamlit UI Config
 st.set_page_config(page_title="Movie/Series Recommender", layout="wide")
@@ -89,7 +86,7 @@ submit = st.sidebar.button("Submit", type="primary")
 if submit:
     st.subheader("🎯 Recommended Movies & Series")
 
-    prompt_input = {
+    preferences = {
         "lang": lang,
         "genre": genre,
         "type": type,
@@ -99,39 +96,46 @@ if submit:
         "year_range": year_range
     }
 
-    user_movie_prompt = movie_title_template.invoke(prompt_input)
-    response = llm.invoke(user_movie_prompt)
-    response_text = response.content
-
-    match = re.split(r"(?i)###?\s*Series", response_text)
-    if len(match) == 2:
-        movies_section, series_section = match
-        movies = re.findall(r"\*+\s+(.*)", movies_section)
-        series = re.findall(r"\*+\s+(.*)", series_section)
+    icons = {"Movies": "🎬", "Series": "📺"}
+    # Only the requested sections get a card, side by side when both were asked for
+    sections = requested_sections(preferences)
+    columns = st.columns(2, gap="small") if len(sections) == 2 else [st.container()]
 
-        col1, col2 = st.columns(2, gap="small")
+    if STREAMING:
+        # Fill the cards bullet by bullet while the model is still generating
+        placeholders = {section: column.empty() for section, column in zip(sections, columns)}
+        items = {section: [] for section in sections}
 
-        with col1:
-            with st.container():
-                st.markdown("<div class='movie-container'>", unsafe_allow_html=True)
-                st.subheader("🎬 Movies")
-                if movies:
-                    for movie in movies:
-                        st.markdown(f"- {movie}")
-                else:
-                    st.info("No movie results found.")
-                st.markdown("</div>", unsafe_allow_html=True)
+        def on_item(item):
+            items[item.section].append(item.text)
+            bullets = "\n".join(f"- {text}" for text in items[item.section])
+            placeholders[item.section].markdown(f"### {icons[item.section]} {item.section}\n{bullets}")
 
-        with col2:
-            with st.container():
-                st.markdown("<div class='series-container'>", unsafe_allow_html=True)
-                st.subheader("📺 Series")
-                if series:
-                    for show in series:
-                        st.markdown(f"- {show}")
-                else:
-                    st.info("No series results found.")
-                st.markdown("</div>", unsafe_allow_html=True)
+        result = recommender.stream(preferences, on_item)
+        for section, placeholder in placeholders.items():
+            final = [item.text for item in result.section(section)]
+            if not final:
+                placeholder.info(f"No {'movie' if section == 'Movies' else 'series'} results found.")
+            elif final != items[section]:
+                # A stronger tier replaced the streamed answer
+                bullets = "\n".join(f"- {text}" for text in final)
+                placeholder.markdown(f"### {icons[section]} {section}\n{bullets}")
     else:
-        st.warning("⚠️ Couldn't parse AI output. Showing raw response:")
-        st.text_area("Debug Output:", response_text, height=300)
+        result = recommender.recommend(preferences)
+        if result.movies or result.series:
+            for section, column in zip(sections, columns):
+                with column:
+                    with st.container():
+                        container = "movie-container" if section == "Movies" else "series-container"
+                        st.markdown(f"<div class='{container}'>", unsafe_allow_html=True)
+                        st.subheader(f"{icons[section]} {section}")
+                        entries = [item.text for item in result.section(section)]
+                        if entries:
+                            for entry in entries:
+                                st.markdown(f"- {entry}")
+                        else:
+                            st.info(f"No {'movie' if section == 'Movies' else 'series'} results found.")
+                        st.markdown("</div>", unsafe_allow_html=True)
+        else:
+            st.warning("⚠️ Couldn't parse AI output. Showing raw response:")
+            st.text_area("Debug Output:", result.raw, height=300)
@@ -0,0 +1,72 @@
+"""Load test: the ASGI recommendation API in-process against a stub LLM.
+
+Fires --requests concurrent POSTs spread over --distinct preference sets and
+reports latency percentiles, throughput, upstream LLM calls (coalescing) and
+429 rejections (backpressure). No server or network is involved.
+
+Run from the repository root:  python -m benchmarks.bench_api [--requests 500] [--distinct 20]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from recommender import Recommender
+from recommender.api import RecommendationAPI
+from recommender.fakes import DictTemplate, FakeLatencyLLM
+from recommender.telemetry import percentile
+
+
+async def post(app, payload):
+    body = json.dumps(payload).encode()
+    sent = False
+    response = {}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    started = time.perf_counter()
+    await app({"type": "http", "method": "POST", "path": "/recommendations"}, receive, send)
+    return response["status"], time.perf_counter() - started
+
+
+async def run(args):
+    llm = FakeLatencyLLM(latency=args.latency)
+    app = RecommendationAPI(Recommender(llm=llm, template=DictTemplate),
+                            max_concurrency=args.concurrency, max_queue=args.queue)
+    payloads = [{"lang": "Hindi", "genre": ["Drama"], "type": "Both", "formula": "Bollywood",
+                 "platform": ["Netflix"], "mood": "Happy", "year_range": [1990 + i, 2023]}
+                for i in range(args.distinct)]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(post(app, payloads[i % args.distinct]) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for status, latency in results if status == 200]
+    print(f"{args.requests} requests over {args.distinct} distinct preference sets in {elapsed:.3f}s "
+          f"({len(ok) / elapsed:.1f} successful req/s)")
+    if ok:
+        print(f"latency p50 {percentile(ok, 0.50) * 1000:.1f} ms, p99 {percentile(ok, 0.99) * 1000:.1f} ms")
+    print(f"upstream LLM calls {llm.calls}, coalesced {app.coalesced}, rejected with 429 {app.rejected}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per stub LLM call")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark: build and query time of the local catalog index on synthetic titles.
+
+Run from the repository root:  python -m benchmarks.bench_catalog [--rows 100000]
+"""
+import argparse
+import random
+import time
+
+from recommender import options
+from recommender.catalog import Catalog
+
+
+def synthetic_rows(n, seed=0):
+    rng = random.Random(seed)
+    words = ["night", "river", "empire", "love", "shadow", "city", "dream", "storm", "house", "code",
+             "summer", "ghost", "kingdom", "road", "star", "secret", "family", "war", "heart", "game"]
+    for i in range(n):
+        yield {
+            "title": " ".join(rng.sample(words, 2)).title() + f" {i}",
+            "year": rng.randint(options.YEAR_MIN, options.YEAR_MAX),
+            "type": rng.choice(("movie", "series")),
+            "language": rng.choice(options.LANGUAGES),
+            "formula": rng.choice(options.FORMULAS),
+            "genres": "|".join(rng.sample(options.GENRES, rng.randint(1, 3))),
+            "platforms": "|".join(rng.sample(options.PLATFORMS, rng.randint(1, 3))),
+            "description": " ".join(rng.choices(words, k=8)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog = Catalog.from_rows(synthetic_rows(args.rows))
+    print(f"built index over {len(catalog)} titles in {time.perf_counter() - started:.2f}s "
+          f"(embeddings {catalog.embeddings.nbytes / 2**20:.1f} MiB)")
+
+    rng = random.Random(1)
+    timings = []
+    found = 0
+    for _ in range(args.queries):
+        start = rng.randint(options.YEAR_MIN, 2015)
+        prompt_input = {"lang": rng.choice(options.LANGUAGES), "genre": rng.choice(options.GENRES),
+                        "type": rng.choice(options.TYPES), "formula": rng.choice(options.FORMULAS),
+                        "platform": ", ".join(rng.sample(options.PLATFORMS, 2)), "mood": rng.choice(options.MOODS),
+                        "year_range": f"{start}-{start + 10}"}
+        t = time.perf_counter()
+        result = catalog.search(prompt_input, 5)
+        timings.append(time.perf_counter() - t)
+        found += sum(len(items) for items in result.values())
+    timings.sort()
+    print(f"search: median {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:.2f} ms, "
+          f"{found / args.queries:.1f} results per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Benchmark: catalog cold start, the memory-mapped columnar format vs pandas reading the CSV.
+
+Writes --rows synthetic titles (benchmarks.bench_catalog) to a CSV, builds the
+columnar catalog from it with `python -m recommender.catalog build`, then
+starts fresh processes that each load the data one way and report the load
+time and their resident memory from /proc/self/status (Linux only):
+
+  pandas    pd.read_csv(titles.csv)
+  columnar  Catalog.load(directory), then --queries searches
+
+Resident memory is split into anonymous pages, private to the process, and
+file pages, which every process mapping the same catalog shares. --workers
+columnar processes are also started side by side to show what N app workers
+cost together.
+
+Run from the repository root:  python -m benchmarks.bench_coldstart [--rows 1000000] [--workers 4]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from recommender import options
+
+FIELDS = ("title", "year", "type", "language", "formula", "genres", "platforms", "description")
+
+
+def memory():
+    """Resident memory in MiB, from /proc/self/status."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon", "RssFile"):
+                values[name] = int(value.split()[0]) / 1024
+    return values
+
+
+def child(loader, path, queries):
+    started = time.perf_counter()
+    before = memory()
+    if loader == "pandas":
+        import pandas as pd
+        data = pd.read_csv(path)
+        loaded = time.perf_counter() - started
+        rows = len(data)
+    else:
+        from recommender.catalog import Catalog
+        catalog = Catalog.load(path)
+        loaded = time.perf_counter() - started
+        rows = len(catalog)
+    report = {"loader": loader, "rows": rows, "load_s": loaded, "before": before, "loaded": memory()}
+    if loader == "columnar":
+        rng = random.Random(1)
+        first = None
+        for _ in range(queries):
+            start = rng.randint(options.YEAR_MIN, 2015)
+            query_started = time.perf_counter()
+            catalog.search({"lang": rng.choice(options.LANGUAGES), "genre": rng.choice(options.GENRES),
+                            "type": rng.choice(options.TYPES), "formula": rng.choice(options.FORMULAS),
+                            "platform": ", ".join(rng.sample(options.PLATFORMS, 2)),
+                            "mood": rng.choice(options.MOODS), "year_range": f"{start}-{start + 10}"}, 5)
+            first = first or time.perf_counter() - query_started
+        report["first_query_s"] = first
+        report["queried"] = memory()
+    print(json.dumps(report))
+
+
+def spawn(loader, path, queries):
+    return subprocess.Popen([sys.executable, "-m", "benchmarks.bench_coldstart", "--child", loader, path,
+                             "--queries", str(queries)], stdout=subprocess.PIPE, text=True)
+
+
+def collect(process):
+    output, _ = process.communicate()
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def write_csv(path, rows):
+    from benchmarks.bench_catalog import synthetic_rows
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(synthetic_rows(rows))
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def describe(report, stage):
+    values = report[stage]
+    return f"RSS {values['VmRSS']:.0f} MiB ({values['RssAnon']:.0f} private, {values['RssFile']:.0f} shared file)"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--directory", help="reuse titles.csv and catalog/ from here")
+    parser.add_argument("--child", nargs=2, metavar=("LOADER", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child, args.queries)
+        return
+
+    directory = args.directory or tempfile.mkdtemp()
+    source, catalog = os.path.join(directory, "titles.csv"), os.path.join(directory, "catalog")
+    if not os.path.exists(source):
+        started = time.perf_counter()
+        write_csv(source, args.rows)
+        print(f"wrote {args.rows:,} rows to {source} in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(source) / 2 ** 20:.0f} MiB)")
+    if not os.path.exists(catalog):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "recommender.catalog", "build", source, "-o", catalog], check=True)
+        print(f"build: {time.perf_counter() - started:.1f}s, {directory_size(catalog) / 2 ** 20:.0f} MiB on disk")
+
+    # A throwaway run so both loaders find the files in the page cache
+    for loader, path in (("pandas", source), ("columnar", catalog)):
+        collect(spawn(loader, path, 0))
+    for loader, path in (("pandas", source), ("columnar", catalog)):
+        report = collect(spawn(loader, path, args.queries))
+        print(f"{loader:<9}: loaded {report['rows']:,} rows in {report['load_s'] * 1000:.0f} ms, "
+              f"{describe(report, 'loaded')} (interpreter and imports: {report['before']['VmRSS']:.0f} MiB)")
+        if "queried" in report:
+            print(f"           first search {report['first_query_s'] * 1000:.1f} ms; after {args.queries} "
+                  f"searches {describe(report, 'queried')}")
+
+    reports = [collect(process) for process in [spawn("columnar", catalog, args.queries)
+                                                for _ in range(args.workers)]]
+    private = sum(r["queried"]["RssAnon"] for r in reports)
+    shared = max(r["queried"]["RssFile"] for r in reports)
+    print(f"{args.workers} columnar workers: {private:.0f} MiB private in total, up to {shared:.0f} MiB of shared "
+          f"file pages each, mean load {sum(r['load_s'] for r in reports) / len(reports) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
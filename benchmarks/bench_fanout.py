@@ -0,0 +1,54 @@
+"""Benchmark: one "Both" call vs concurrent Movies/Series fan-out against a fake LLM.
+
+Latency is modelled as a fixed round trip plus a per-item generation cost, so
+the single call pays for 10 items while each branch pays for 5.
+
+Run from the repository root:  python -m benchmarks.bench_fanout [--rtt 0.4] [--per-item 0.25]
+"""
+import argparse
+import time
+
+from recommender.fakes import DictTemplate, FakeLatencyLLM, canned_reply
+from recommender.fanout import fan_out
+from recommender.parser import parse_response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt", type=float, default=0.4, help="fixed seconds per call")
+    parser.add_argument("--per-item", type=float, default=0.25, help="seconds per generated item")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    def latency(prompt):
+        items = 10 if prompt["type"] == "Both" else 5
+        return args.rtt + args.per_item * items
+
+    llm = FakeLatencyLLM(canned_reply, latency)
+    prompt_input = {"lang": "Hindi", "genre": "Drama", "type": "Both", "formula": "Bollywood",
+                    "platform": "Netflix", "mood": "Happy", "year_range": "2010-2023"}
+
+    single = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        sections = parse_response(llm.invoke(DictTemplate.invoke(prompt_input)).content)
+        assert len(sections["Movies"]) == len(sections["Series"]) == 5
+        single.append(time.perf_counter() - started)
+
+    fanned, first = [], []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        arrivals = []
+        fan_out(llm, DictTemplate, prompt_input,
+                lambda section, text, error: arrivals.append(time.perf_counter() - started))
+        fanned.append(time.perf_counter() - started)
+        first.append(arrivals[0])
+
+    best_single, best_fan = min(single), min(fanned)
+    print(f"single call      : {best_single:.3f}s to first and last column")
+    print(f"fan-out          : {min(first):.3f}s to first column, {best_fan:.3f}s to last")
+    print(f"wall-clock gain  : {best_single / best_fan:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark: ALS training time, memory and ranking quality on synthetic feedback, and re-ranking latency.
+
+Users and titles get hidden taste vectors and titles a long-tailed
+popularity; each user rates --per-user titles drawn in proportion to
+popularity x exp(affinity), liking, watching or disliking each according to
+its affinity. One liked title per user is held out, and for --eval-users users
+it is ranked against 100 titles they never rated (HR@10, NDCG@10), by the
+trained model and by popularity alone.
+
+Training memory is the tracemalloc peak, which includes the NumPy arrays.
+Re-ranking latency is FeedbackModel.rerank over a 15-item candidate list,
+for a trained user and for a session folded in from 5 ratings.
+
+Run from the repository root:  python -m benchmarks.bench_feedback [--interactions 100000,1000000] [--factors 32]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from recommender.feedback import train
+from recommender.parser import Recommendation
+
+EVENTS = np.array(["dislike", "watched", "like"])
+
+
+def synthetic(n_users, n_items, per_user, seed=0, taste=16):
+    """(records, held_out) where held_out[user] is one liked item index withheld from records."""
+    rng = np.random.default_rng(seed)
+    users = rng.standard_normal((n_users, taste)) / np.sqrt(taste) * 2
+    items = rng.standard_normal((n_items, taste)) / np.sqrt(taste) * 2
+    popularity = np.log(rng.pareto(1.2, n_items) + 1)
+    records, held_out = [], np.full(n_users, -1)
+    for start in range(0, n_users, 1000):
+        block = users[start:start + 1000]
+        affinity = block @ items.T
+        # Gumbel top-k: per_user distinct titles, sampled by popularity x exp(affinity)
+        keys = affinity + popularity - np.log(-np.log(rng.random(affinity.shape)))
+        chosen = np.argpartition(-keys, per_user, axis=1)[:, :per_user]
+        chosen_affinity = np.take_along_axis(affinity, chosen, axis=1)
+        noisy = chosen_affinity + rng.normal(0, 0.5, chosen.shape)
+        events = np.digitize(noisy, [-0.5, 0.5])
+        for offset in range(len(block)):
+            user = start + offset
+            liked = np.flatnonzero(events[offset] == 2)
+            if liked.size:
+                held_out[user] = chosen[offset, liked[-1]]
+            for column in range(per_user):
+                item = chosen[offset, column]
+                if item != held_out[user]:
+                    records.append((user, item, events[offset, column]))
+    return records, held_out
+
+
+def as_records(records):
+    return ({"user": f"u{user}", "item": f"Movies/title {item}", "event": EVENTS[event]}
+            for user, item, event in records)
+
+
+def evaluate(scores_for, records, held_out, n_items, eval_users, seed=1):
+    rng = np.random.default_rng(seed)
+    rated = {}
+    for user, item, _ in records:
+        rated.setdefault(user, set()).add(item)
+    candidates = np.flatnonzero(held_out >= 0)
+    hits, ndcg = 0, 0.0
+    sample = rng.choice(candidates, min(eval_users, len(candidates)), replace=False)
+    for user in sample:
+        negatives = []
+        while len(negatives) < 100:
+            item = int(rng.integers(n_items))
+            if item not in rated.get(user, ()) and item != held_out[user]:
+                negatives.append(item)
+        items = np.array([held_out[user]] + negatives)
+        scores = scores_for(user, items)
+        rank = int((scores > scores[0]).sum())
+        if rank < 10:
+            hits += 1
+            ndcg += 1 / np.log2(rank + 2)
+    return hits / len(sample), ndcg / len(sample)
+
+
+def rerank_latency(model, rng, repeats=2000):
+    items = [Recommendation("Movies", f"title {i}", "", "") for i in rng.choice(len(model.items), 15, replace=False)]
+    users = list(model.users)
+    ratings = {f"Movies/title {i}": "like" for i in rng.choice(len(model.items), 5, replace=False)}
+    timings = {}
+    for label, kwargs in (("trained user", lambda: {"user": users[rng.integers(len(users))]}),
+                          ("folded-in session", lambda: {"ratings": ratings})):
+        started = time.perf_counter()
+        for _ in range(repeats):
+            model.rerank(items, **kwargs())
+        timings[label] = (time.perf_counter() - started) / repeats
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interactions", default="100000,1000000", help="comma-separated sizes to compare")
+    parser.add_argument("--per-user", type=int, default=50, help="ratings per user")
+    parser.add_argument("--items", type=int, default=20000, help="distinct titles")
+    parser.add_argument("--factors", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--regularization", type=float, default=0.1)
+    parser.add_argument("--alpha", type=float, default=10.0)
+    parser.add_argument("--eval-users", type=int, default=2000)
+    args = parser.parse_args()
+
+    for size in (int(value) for value in args.interactions.split(",")):
+        n_users = size // args.per_user
+        records, held_out = synthetic(n_users, args.items, args.per_user)
+        tracemalloc.start()
+        started = time.perf_counter()
+        model = train(as_records(records), args.factors, args.iterations, args.regularization, args.alpha)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        factor_bytes = model.user_factors.nbytes + model.item_factors.nbytes
+
+        def model_scores(user, items):
+            vector = model.user_factors[model.users[f"u{user}"]]
+            rows = [model.items.get(f"Movies/title {i}") for i in items]
+            return np.array([-np.inf if row is None else model.item_factors[row] @ vector for row in rows])
+
+        counts = np.bincount([item for _, item, event in records if event == 2], minlength=args.items)
+        als = evaluate(model_scores, records, held_out, args.items, args.eval_users)
+        popular = evaluate(lambda user, items: counts[items].astype(float), records, held_out, args.items,
+                           args.eval_users)
+        latency = rerank_latency(model, np.random.default_rng(2))
+        print(f"{len(records):,} interactions, {n_users:,} users x {len(model.items):,} titles, "
+              f"{args.factors} factors, {args.iterations} iterations")
+        print(f"  train  : {elapsed:.2f}s, peak traced memory {peak / 2 ** 20:.0f} MiB, "
+              f"model {factor_bytes / 2 ** 20:.1f} MiB")
+        print(f"  quality: ALS HR@10 {als[0]:.3f} NDCG@10 {als[1]:.3f}; "
+              f"popularity HR@10 {popular[0]:.3f} NDCG@10 {popular[1]:.3f}")
+        print("  rerank : " + ", ".join(f"{label} {seconds * 1e6:.0f} us" for label, seconds in latency.items())
+              + " per 15-item list")
+
+
+if __name__ == "__main__":
+    main()
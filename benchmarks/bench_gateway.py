@@ -0,0 +1,94 @@
+"""Benchmark: bare LLM calls vs the gateway against a fake with a slow tail and errors.
+
+Each call takes --latency seconds, except a --slow fraction that takes
+--slow-latency, and a --errors fraction fails with ConnectionError. The bare
+client surfaces every error and waits out every slow call; the gateway retries
+errors and hedges calls that run past its learned p95. A final phase takes the
+model down completely to show the circuit breaker failing fast.
+
+Run from the repository root:  python -m benchmarks.bench_gateway [--calls 300] [--errors 0.05]
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from recommender.fakes import DictTemplate, FakeLatencyLLM, flaky
+from recommender.gateway import CircuitBreaker, CircuitOpenError, LLMGateway
+from recommender.telemetry import percentile
+
+PROMPT = DictTemplate.invoke({"lang": "English", "genre": "Drama", "type": "Both", "formula": "Hollywood",
+                              "platform": "Netflix", "mood": "Happy", "year_range": "2010-2023"})
+
+
+def run(client, calls, concurrency):
+    latencies, failures = [], 0
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            client.invoke(PROMPT)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed in pool.map(one, range(calls)):
+            if elapsed is None:
+                failures += 1
+            else:
+                latencies.append(elapsed)
+    return latencies, failures
+
+
+def report(name, latencies, failures, calls):
+    print(f"{name:<8}: {calls - failures}/{calls} ok, p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, p99 {percentile(latencies, 0.99) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow", type=float, default=0.03, help="fraction of calls in the slow tail")
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--errors", type=float, default=0.05, help="fraction of calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    def latency(prompt):
+        return args.slow_latency if rng.random() < args.slow else args.latency * rng.uniform(0.8, 1.2)
+
+    def fake():
+        return FakeLatencyLLM(latency=latency, error=flaky(args.errors, seed=args.seed))
+
+    latencies, failures = run(fake(), args.calls, args.concurrency)
+    report("bare", latencies, failures, args.calls)
+
+    gateway = LLMGateway(fake(), breaker=CircuitBreaker(), base_delay=0.01, max_workers=args.concurrency * 2)
+    latencies, failures = run(gateway, args.calls, args.concurrency)
+    report("gateway", latencies, failures, args.calls)
+    print(f"          {gateway.stats()}")
+
+    # Outage: every call fails; the breaker should open and turn the rest away without waiting
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60)
+    down = LLMGateway(FakeLatencyLLM(latency=args.latency, error=ConnectionError("down")), breaker=breaker,
+                      max_retries=1, base_delay=0.01, hedge_quantile=None)
+    started = time.perf_counter()
+    open_errors = 0
+    for _ in range(50):
+        try:
+            down.invoke(PROMPT)
+        except CircuitOpenError:
+            open_errors += 1
+        except ConnectionError:
+            pass
+    print(f"outage  : 50 calls in {time.perf_counter() - started:.2f}s, {open_errors} failed fast "
+          f"with the circuit open, {down.llm.calls} reached the model")
+
+
+if __name__ == "__main__":
+    main()
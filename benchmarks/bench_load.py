@@ -0,0 +1,354 @@
+"""Load test: N concurrent browser sessions against one Streamlit process with a stub LLM, and a stored baseline.
+
+Starts `streamlit run <script>` in a scratch directory, with the app's LLM
+client replaced by recommender.fakes.FakeLatencyLLM (--latency seconds per
+call), and drives it over Streamlit's websocket protocol the way the browser
+does: every interaction is a rerun_script message carrying the widget
+states, answered by the rendered deltas and a script_finished message. So
+the sessions share one process, its st.cache_resource objects and its GIL,
+exactly as real users of one worker do. AppTest cannot stand in for them:
+each of its runs swaps Streamlit's global Runtime, so concurrent runs break.
+
+A session loads the page, then for --rounds rounds edits --edits random
+sidebar widgets (each edit is a rerun) and clicks the submit button, with
+--think seconds (+-50%) of think time before every action. Preferences are
+random, so submits are mostly cache misses that reach the LLM. The app's
+own gateway stays in front of the stub, with any rate limit
+RECOMMENDER_RATE_LIMIT sets (main.py only; none by default), since it is part
+of what one process can serve; every RECOMMENDER_* variable applies.
+
+Every --sessions level gets a fresh server, so caches start cold:
+
+  rerun    time from sending a widget edit to script_finished, p50 and p95
+  submit   the same for a submit, including the LLM call and rendering
+  memory   the server's resident memory growth per connected session, after
+           a warm-up session has loaded the imports (Linux /proc)
+  errors   exceptions rendered by the app
+
+The saturation point is the first level whose p95 submit latency is more
+than --saturation times that of the first level, i.e. where submits start
+queueing behind each other rather than running side by side.
+
+--save stores the results in --baseline (benchmarks/baselines/load.json);
+--check compares with it and exits 1 if a p95 latency grew by more than
+--tolerance (plus 50 ms), memory per session by more than --tolerance, the
+saturation point came earlier, or the app raised. Record the baseline and
+check on the same machine.
+
+Run from the repository root:  python -m benchmarks.bench_load [main.py app.py] [--sessions 1,2,4,8,16,32] [--check]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from recommender.telemetry import percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "load.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Absolute allowance on top of --tolerance, so fast stages do not fail --check on noise
+SLACK = 0.05
+# One byte per stub LLM call, appended by the server
+CALLS_FILE = "llm_calls"
+EDITABLE = ("selectbox", "multiselect", "radio", "slider")
+
+
+def serve(script, port, latency):
+    """Server process: `streamlit run script` with the stub LLM."""
+    import recommender.gateway as gateway
+    from recommender.fakes import FakeLatencyLLM
+    from streamlit.web import cli
+
+    class CountingLLM(FakeLatencyLLM):
+        def _count(self):
+            super()._count()
+            with open(CALLS_FILE, "ab") as f:
+                f.write(b".")
+
+    gateway.gemini = lambda **options: CountingLLM(latency=latency)
+    sys.argv = ["streamlit", "run", script, "--server.headless", "true", "--server.port", str(port),
+                "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none",
+                "--browser.gatherUsageStats", "false"]
+    cli.main()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(script, args, directory):
+    port = free_port()
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")]))}
+    with open(os.path.join(directory, "server.log"), "w") as log:
+        process = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_load", script, "--serve", str(port),
+                                    "--latency", str(args.latency)], cwd=directory, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.read() == b"ok":
+                    return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{script} did not start; see {directory}/server.log")
+
+
+def memory(pid):
+    """Resident memory of process pid in MiB, or None off Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+class Session:
+    """One browser tab: the sidebar widgets it has seen and the values it has set."""
+
+    def __init__(self, websocket, rng):
+        self.websocket = websocket
+        self.rng = rng
+        self.widgets = {}
+        self.values = {}
+        self.errors = 0
+
+    async def rerun(self, trigger=None):
+        """Seconds until the script run this starts has finished."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        states = message.rerun_script.widget_states.widgets
+        states.extend(self.values.values())
+        if trigger is not None:
+            states.add(id=trigger, trigger_value=True)
+        started = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(await self.websocket.recv())
+            kind = reply.WhichOneof("type")
+            if kind == "script_finished":
+                return time.perf_counter() - started
+            if kind != "delta" or reply.delta.WhichOneof("type") != "new_element":
+                continue
+            element = reply.delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type == "exception":
+                self.errors += 1
+            elif element_type in EDITABLE + ("button",) and reply.metadata.delta_path[0] == 1:
+                widget = getattr(element, element_type)
+                self.widgets.setdefault(widget.id, (element_type, widget))
+
+    def _state(self, id):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        return WidgetState(id=id)
+
+    def edit(self):
+        """Change one random sidebar widget: language, genre, type, formula, platform, mood or years."""
+        id, (kind, widget) = self.rng.choice([(id, entry) for id, entry in self.widgets.items()
+                                              if entry[0] in EDITABLE])
+        state = self._state(id)
+        if kind == "multiselect":
+            state.string_array_value.data.extend(self.rng.sample(list(widget.options), self.rng.randint(1, 3)))
+        elif kind == "slider":
+            start = self.rng.randint(int(widget.min), int(widget.max) - 5)
+            state.double_array_value.data.extend([start, self.rng.randint(start + 5, int(widget.max))])
+        else:
+            state.string_value = self.rng.choice(list(widget.options))
+        self.values[id] = state
+
+    def fill_required(self):
+        # main.py requires a genre and a platform
+        for id, (kind, widget) in self.widgets.items():
+            if kind == "multiselect" and id not in self.values:
+                state = self._state(id)
+                state.string_array_value.data.append(self.rng.choice(list(widget.options)))
+                self.values[id] = state
+
+    def submit_button(self):
+        return next(id for id, (kind, _) in self.widgets.items() if kind == "button")
+
+
+async def think(args, rng):
+    await asyncio.sleep(args.think * rng.uniform(0.5, 1.5))
+
+
+async def user(port, index, args, report, connected, done):
+    import websockets
+
+    rng = random.Random(index)
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                  max_size=None, open_timeout=args.timeout) as websocket:
+        session = Session(websocket, rng)
+        report["load"].append(await session.rerun())
+        for _ in range(args.rounds):
+            for _ in range(args.edits):
+                await think(args, rng)
+                session.edit()
+                report["rerun"].append(await session.rerun())
+            session.fill_required()
+            await think(args, rng)
+            report["submit"].append(await session.rerun(session.submit_button()))
+        report["errors"] += session.errors
+        connected.append(session)
+        # Stay connected until every session is done, so their memory is measured together
+        await done.wait()
+
+
+async def drive(port, sessions, args, server):
+    warm = {"load": [], "rerun": [], "submit": [], "errors": 0}
+    done = asyncio.Event()
+    done.set()
+    await user(port, -1, argparse.Namespace(**{**vars(args), "rounds": 1, "edits": 0}), warm, [], done)
+    before = memory(server.pid)
+
+    report = {"load": [], "rerun": [], "submit": [], "errors": warm["errors"]}
+    connected, done = [], asyncio.Event()
+    started = time.perf_counter()
+    users = [asyncio.create_task(user(port, index, args, report, connected, done)) for index in range(sessions)]
+    while len(connected) < sessions and not any(task.done() for task in users):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    after = memory(server.pid)
+    done.set()
+    await asyncio.gather(*users)
+    return report, elapsed, before, after
+
+
+def measure(script, sessions, args):
+    directory = tempfile.mkdtemp()
+    server, port = start_server(os.path.abspath(script), args, directory)
+    try:
+        report, elapsed, before, after = asyncio.run(asyncio.wait_for(drive(port, sessions, args, server),
+                                                                      args.timeout * 10))
+    finally:
+        server.terminate()
+        server.wait()
+    calls = os.path.join(directory, CALLS_FILE)
+    level = {"sessions": sessions, "elapsed_s": elapsed, "errors": report["errors"],
+             "llm_calls": os.path.getsize(calls) if os.path.exists(calls) else 0,
+             "mib_per_session": None if before is None or after is None else (after - before) / sessions,
+             "submits_per_s": len(report["submit"]) / elapsed}
+    for stage in ("load", "rerun", "submit"):
+        level[f"{stage}_p50_s"] = percentile(report[stage], 0.5)
+        level[f"{stage}_p95_s"] = percentile(report[stage], 0.95)
+    return level
+
+
+def saturation(levels, factor):
+    """Sessions at the first level whose p95 submit exceeds factor x the first level's, or None."""
+    reference = levels[0]["submit_p95_s"]
+    for level in levels[1:]:
+        if level["submit_p95_s"] > factor * reference:
+            return level["sessions"]
+    return None
+
+
+def milliseconds(value):
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def describe(script, levels, saturated):
+    print(f"{script}:")
+    print(f"  {'sessions':>8} {'rerun p50/p95 ms':>17} {'submit p50/p95 ms':>18} {'submits/s':>9} "
+          f"{'MiB/session':>11} {'LLM calls':>9} {'errors':>6}")
+    for level in levels:
+        per_session = level["mib_per_session"]
+        print(f"  {level['sessions']:>8} "
+              f"{milliseconds(level['rerun_p50_s']) + '/' + milliseconds(level['rerun_p95_s']):>17} "
+              f"{milliseconds(level['submit_p50_s']) + '/' + milliseconds(level['submit_p95_s']):>18} "
+              f"{level['submits_per_s']:>9.2f} {'-' if per_session is None else f'{per_session:.2f}':>11} "
+              f"{level['llm_calls']:>9} {level['errors']:>6}")
+    print(f"  saturation: {'not reached' if saturated is None else f'{saturated} sessions'}")
+
+
+def regressions(script, result, baseline, tolerance):
+    """Descriptions of everything in result that is worse than baseline."""
+    problems = []
+    previous = {level["sessions"]: level for level in baseline["levels"]}
+    for level in result["levels"]:
+        if level["errors"]:
+            problems.append(f"{script}, {level['sessions']} sessions: {level['errors']} errors")
+        old = previous.get(level["sessions"])
+        if old is None:
+            continue
+        for stage in ("rerun", "submit"):
+            name = f"{stage}_p95_s"
+            if level[name] > old[name] * (1 + tolerance) + SLACK:
+                problems.append(f"{script}, {level['sessions']} sessions: {stage} p95 {milliseconds(level[name])} ms "
+                                f"vs {milliseconds(old[name])} ms")
+        if (level["mib_per_session"] is not None and old["mib_per_session"] is not None
+                and level["mib_per_session"] > max(old["mib_per_session"], 1.0) * (1 + tolerance)):
+            problems.append(f"{script}, {level['sessions']} sessions: {level['mib_per_session']:.2f} MiB per "
+                            f"session vs {old['mib_per_session']:.2f}")
+    if baseline["saturation"] is not None and (result["saturation"] or float("inf")) < baseline["saturation"]:
+        problems.append(f"{script}: saturates at {result['saturation']} sessions vs {baseline['saturation']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scripts", nargs="*", default=["main.py", "app.py"])
+    parser.add_argument("--sessions", default="1,2,4,8,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=3, help="edit-and-submit rounds per session")
+    parser.add_argument("--edits", type=int, default=3, help="widget edits before each submit")
+    parser.add_argument("--think", type=float, default=0.5, help="mean seconds between actions")
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per stub LLM call")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for one script run")
+    parser.add_argument("--saturation", type=float, default=2.0, help="p95 submit growth that counts as saturated")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative growth for --check")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.scripts[0], args.serve, args.latency)
+        return
+
+    results = {}
+    for script in args.scripts:
+        levels = [measure(script, int(sessions), args) for sessions in args.sessions.split(",")]
+        results[script] = {"levels": levels, "saturation": saturation(levels, args.saturation)}
+        describe(script, levels, results[script]["saturation"])
+    settings = {name: getattr(args, name) for name in ("sessions", "rounds", "edits", "think", "latency",
+                                                       "saturation")}
+
+    if args.check:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["settings"] != settings:
+            print(f"warning: the baseline was recorded with {baseline['settings']}")
+        problems = [problem for script, result in results.items() if script in baseline["scripts"]
+                    for problem in regressions(script, result, baseline["scripts"][script], args.tolerance)]
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "scripts": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
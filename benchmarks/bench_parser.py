@@ -0,0 +1,90 @@
+"""Micro-benchmark: single-pass ResponseParser vs the old regex cascade from main.py.
+
+The parser is not faster on well-formed output: it also splits titles from
+explanations, builds a Recommendation per item and accepts indented and
+numbered bullets and decorated headers, where the cascade only runs
+re.findall in C. It takes about 1.5x as long there (typical 18 vs 11.5 us,
+2000 items 3.3 vs 2.2 ms). It pulls ahead on long malformed output (~1.1-1.2x
+at 2000 items) and is the only one of the two that recovers the Series
+section when its header is not "### Series".
+
+Run from the repository root:  python -m benchmarks.bench_parser [--items 10,2000] [--number 2000]
+"""
+import argparse
+import random
+import re
+import timeit
+
+from recommender.parser import parse_response
+
+BULLET = r"[-*•]\s+(.*?)(?=\n[-*•]|\n\n|$)"
+
+
+def regex_cascade(response_text):
+    # Verbatim copy of the parsing that used to live in main.py
+    movies = []
+    series = []
+    series_split = re.split(r"(?i)###?\s*Series", response_text)
+    if len(series_split) == 2:
+        movies_section, series_section = series_split
+        movies = re.findall(BULLET, movies_section, re.DOTALL)
+        series = re.findall(BULLET, series_section, re.DOTALL)
+    else:
+        if "Movies" in response_text and "Series" not in response_text:
+            movies = re.findall(BULLET, response_text, re.DOTALL)
+        elif "Series" in response_text and "Movies" not in response_text:
+            series = re.findall(BULLET, response_text, re.DOTALL)
+        else:
+            movies = re.findall(BULLET, response_text, re.DOTALL)
+    return movies, series
+
+
+def item(i):
+    return f"*   **Title {i} ({2000 + i % 24})**\n    A short explanation of title {i}\n    spanning two lines."
+
+
+def well_formed(n):
+    half = n // 2
+    return ("Here are your picks.\n\n### Movies\n" + "\n".join(item(i) for i in range(half))
+            + "\n\n### Series\n" + "\n".join(item(i) for i in range(half, n)) + "\n")
+
+
+def malformed(n, seed=0):
+    # No blank lines, headers in odd forms, stray prose, mentions of "Series" in explanations
+    rng = random.Random(seed)
+    lines = ["**Movies:**"]
+    for i in range(n):
+        if i == n // 2:
+            lines.append("Series")
+        lines.append(f"- Title {i} - a film that feels like a Series of vignettes")
+        if rng.random() < 0.3:
+            lines.append("  some trailing commentary " * rng.randint(1, 20))
+    return "\n".join(lines)
+
+
+def bench(label, text, number):
+    regex = min(timeit.repeat(lambda: regex_cascade(text), number=number, repeat=5)) / number
+    single = min(timeit.repeat(lambda: parse_response(text), number=number, repeat=5)) / number
+    movies, series = regex_cascade(text)
+    sections = parse_response(text)
+    print(f"{label:<24} {len(text):>9} chars  regex {regex * 1e6:>10.1f} us "
+          f"[{len(movies)}/{len(series)}]  single-pass {single * 1e6:>10.1f} us "
+          f"[{len(sections['Movies'])}/{len(sections['Series'])}]  ({regex / single:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", default="10,2000", help="comma-separated answer sizes")
+    parser.add_argument("--number", type=int, default=2000, help="parses per timing for a 10-item answer")
+    args = parser.parse_args()
+
+    print("[movies/series] = items recovered by each parser")
+    for size in map(int, args.items.split(",")):
+        # Same total work per timing whatever the size
+        number = max(1, args.number * 10 // size)
+        bench(f"well-formed ({size} items)", well_formed(size), number)
+        bench(f"malformed ({size} items)", malformed(size), number)
+
+
+if __name__ == "__main__":
+    main()
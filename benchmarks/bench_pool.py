@@ -0,0 +1,73 @@
+"""Benchmark: "Show more" with a pool of over-generated items vs a new LLM call per page.
+
+Each of --sessions users submits distinct preferences and then clicks "Show
+more" --pages times. With pool 5 (the page size) every click is a
+Recommender.more() call; with a larger pool the first call asks for that many
+items per section and clicks are served from recommender.pool until it runs
+low. The stub LLM takes --base seconds plus --per-token seconds per output
+token, so bigger pools make the first page slower, and prompts are rendered
+with the real PromptBuilder so input tokens include the exclusion lists.
+
+Run from the repository root:  python -m benchmarks.bench_pool [--pools 5,10,15,20] [--pages 4] [--scale 0.1]
+"""
+import argparse
+import time
+
+from recommender import Recommender, RecommendationCache
+from recommender import options
+from recommender.fakes import FakeLatencyLLM, canned_reply
+from recommender.pool import RecommendationPool
+from recommender.precompute import sample_grid
+from recommender.telemetry import RequestTrace, percentile
+
+
+def run(args, pool_size, preferences):
+    def latency(prompt):
+        return (args.base + args.per_token * len(canned_reply(prompt).split())) * args.scale
+
+    llm = FakeLatencyLLM(latency=latency)
+    recommender = Recommender(llm=llm, cache=RecommendationCache(path=None), pool=pool_size)
+    recommender.template.invoke(preferences[0])  # imports langchain outside the timings
+    first, clicks, tokens = [], [], 0
+    for preference in preferences:
+        trace = RequestTrace("submit")
+        started = time.perf_counter()
+        pool = RecommendationPool(preference["type"], recommender.recommend(preference, trace=trace),
+                                  recommender.limit)
+        pool.next_page()
+        first.append((time.perf_counter() - started) / args.scale)
+        for _ in range(args.pages):
+            started = time.perf_counter()
+            if pool.needs_refill():
+                pool.refill(recommender, preference, trace=trace)
+            page = pool.next_page()
+            clicks.append((time.perf_counter() - started) / args.scale)
+            assert all(len(page.section(s)) == recommender.limit for s in pool.sections)
+        tokens += trace.tokens["total_tokens"]
+    return first, clicks, llm.calls, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=4, help='"Show more" clicks per session')
+    parser.add_argument("--pools", default="5,10,15,20", help="comma-separated items per section to compare")
+    parser.add_argument("--base", type=float, default=1.0, help="seconds per LLM call before the first token")
+    parser.add_argument("--per-token", type=float, default=0.02, help="seconds per output token")
+    parser.add_argument("--scale", type=float, default=0.1, help="simulated seconds per real second")
+    args = parser.parse_args()
+
+    preferences = list(sample_grid([options.DEFAULT_YEAR_RANGE], args.sessions, seed=1))
+    print(f"{args.sessions} sessions, {args.pages} \"Show more\" clicks each, LLM call {args.base:.1f}s "
+          f"+ {args.per_token * 1000:.0f} ms per output token (times in simulated seconds)")
+    print(f"{'pool':>4}  {'first page':>10}  {'click p50':>9}  {'click p95':>9}  {'click mean':>10}  "
+          f"{'calls/session':>13}  {'tokens/session':>14}")
+    for pool_size in (int(value) for value in args.pools.split(",")):
+        first, clicks, calls, tokens = run(args, pool_size, preferences)
+        print(f"{pool_size:>4}  {sum(first) / len(first):>9.2f}s  {percentile(clicks, 0.5):>8.2f}s  "
+              f"{percentile(clicks, 0.95):>8.2f}s  {sum(clicks) / len(clicks):>9.2f}s  "
+              f"{calls / args.sessions:>13.2f}  {tokens / args.sessions:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
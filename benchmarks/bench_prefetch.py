@@ -0,0 +1,88 @@
+"""Benchmark: perceived submit latency with and without speculative prefetch.
+
+Simulates --sessions users editing the sidebar concurrently against a stub
+LLM with --latency seconds per call. Each user fills in the required fields,
+keeps tweaking one of them for a moment (which may or may not outlast the
+debounce interval), settles, thinks, and clicks "Get Recommendations". Submit
+latency is measured from the click to the parsed answer, once with a
+Prefetcher and once without; every session asks for different preferences,
+so nothing is served from another session's answer.
+
+Run from the repository root:  python -m benchmarks.bench_prefetch [--latency 3] [--debounce 0.25,0.5,1] [--scale 0.1]
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from recommender import Recommender, RecommendationCache
+from recommender import options
+from recommender.fakes import DictTemplate, FakeLatencyLLM
+from recommender.precompute import sample_grid
+from recommender.prefetch import Prefetcher
+from recommender.telemetry import percentile
+
+
+def session(recommender, prefetcher, index, final, args):
+    rng = random.Random(index)
+    scale = args.scale
+    draft = {**final, "mood": rng.choice([m for m in options.MOODS if m != final["mood"]])}
+    time.sleep(rng.uniform(0, 1) * scale)
+    if prefetcher is not None:
+        prefetcher.schedule(index, draft)
+    time.sleep(rng.uniform(0.2, 2.0) * scale)  # still deciding on the mood
+    if prefetcher is not None:
+        prefetcher.schedule(index, final)
+    time.sleep(rng.lognormvariate(0.4, 0.5) * scale)  # settled; moves to the button and clicks
+    started = time.perf_counter()
+    if prefetcher is not None:
+        prefetcher.adopt(index, final)
+    recommender.recommend(final)
+    return time.perf_counter() - started
+
+
+def run(args, debounce):
+    llm = FakeLatencyLLM(latency=args.latency * args.scale)
+    recommender = Recommender(llm=llm, template=DictTemplate(), cache=RecommendationCache(path=None))
+    prefetcher = None
+    if debounce is not None:
+        prefetcher = Prefetcher(recommender, debounce=debounce * args.scale, max_per_session=args.budget,
+                                max_workers=args.workers)
+    finals = list(sample_grid([options.DEFAULT_YEAR_RANGE], args.sessions, seed=1))
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        latencies = list(pool.map(lambda i: session(recommender, prefetcher, i, finals[i], args),
+                                  range(args.sessions)))
+    time.sleep(args.latency * args.scale)  # let prefetches nobody adopted finish, so they are counted
+    return [latency / args.scale for latency in latencies], llm.calls, prefetcher
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=3.0, help="seconds per LLM call")
+    parser.add_argument("--debounce", default="0.25,0.5,1", help="comma-separated seconds to compare")
+    parser.add_argument("--budget", type=int, default=5, help="prefetch LLM calls per session")
+    parser.add_argument("--workers", type=int, help="prefetch threads (default: one per session)")
+    parser.add_argument("--scale", type=float, default=0.1, help="simulated seconds per real second")
+    args = parser.parse_args()
+    args.workers = args.workers or args.sessions
+
+    baseline, baseline_calls, _ = run(args, None)
+    print(f"{args.sessions} sessions, {args.latency:.1f}s LLM calls, {args.workers} prefetch threads "
+          f"(times in simulated seconds)")
+    print(f"no prefetch   : submit p50 {percentile(baseline, 0.5):.2f}s, p95 {percentile(baseline, 0.95):.2f}s, "
+          f"mean {sum(baseline) / len(baseline):.2f}s, {baseline_calls / args.sessions:.2f} LLM calls per session")
+    for debounce in (float(value) for value in args.debounce.split(",")):
+        latencies, calls, prefetcher = run(args, debounce)
+        stats = prefetcher.stats()
+        print(f"debounce {debounce:.2f}s: submit p50 {percentile(latencies, 0.5):.2f}s, "
+              f"p95 {percentile(latencies, 0.95):.2f}s, mean {sum(latencies) / len(latencies):.2f}s, "
+              f"{calls / args.sessions:.2f} LLM calls per session")
+        print(f"               saved {(sum(baseline) - sum(latencies)) / len(latencies):.2f}s per submit; "
+              f"{stats['adopted_ready']} ready, {stats['adopted_in_flight']} in flight, {stats['missed']} missed; "
+              f"{stats['superseded']} superseded, {stats['cancelled']} cancelled in the queue, "
+              f"{stats['not_adopted']} wasted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark: prompt tokens per request, the old single template vs recommender.prompts.PromptBuilder.
+
+Renders the old prompt (all three type branches, preferences stated twice,
+2-line explanations) and the builder's full and compact prompts for every
+point of the preference grid, and reports input tokens per request by type.
+Tokens are estimated offline as words plus punctuation marks, which tracks
+Gemini's tokenizer closely enough for a comparison; --api-sample N also
+counts N sampled prompts with the model's own tokenizer (needs GOOGLE_API_KEY).
+
+Run from the repository root:  python -m benchmarks.bench_prompts [--sample 5000] [--api-sample 20]
+"""
+import argparse
+import re
+from collections import defaultdict
+
+from recommender import options
+from recommender.engine import to_prompt_input
+from recommender.precompute import grid, grid_size, sample_grid
+from recommender.prompts import PromptBuilder
+
+# The template main.py used before PromptBuilder
+LEGACY_USER_MESSAGE = ("I want to watch something in {lang}. "
+                       "I'm in the mood for {genre}. "
+                       "I prefer {type} and from the {formula} industry. "
+                       "I want to watch on {platform}. "
+                       "My current mood is {mood}. "
+                       "The movie/series should be between this year range {year_range}. "
+                       "Please give me best suggestions according to my preferences.")
+
+LEGACY_SYSTEM_PROMPT = """You are a helpful movie assistant. Based on the user's preferences (language: {lang}, genre: {genre}, type: {type}, formula: {formula}, year_range: {year_range}):
+
+If type is "Movies":
+- Provide **5 movie names** under a section called `Movies`.
+- Do NOT provide any series.
+
+If type is "Series":
+- Provide **5 series names** under a section called `Series`.
+- Do NOT provide any movies.
+
+If type is "Both":
+- Provide **5 movie names** under a section called `Movies`.
+- Provide **5 series names** under a section called `Series`.
+
+- Give each item a very short 2-line explanation.
+- Return the results in **bullet format under clear headers**.
+- Strictly no use of emojis.
+- also make title of movies nd series bolder more
+"""
+
+TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def legacy_template():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([("system", LEGACY_SYSTEM_PROMPT), ("user", LEGACY_USER_MESSAGE)])
+
+
+def estimate(prompt):
+    return sum(len(TOKEN.findall(message.content)) for message in prompt.to_messages())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sample", type=int, help="preference sets to render (default: the whole grid)")
+    parser.add_argument("--api-sample", type=int, default=0, help="prompts to also count with the Gemini API")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    args = parser.parse_args()
+
+    year_ranges = [options.DEFAULT_YEAR_RANGE]
+    preferences = sample_grid(year_ranges, args.sample) if args.sample else grid(year_ranges)
+    templates = {"old": legacy_template(), "new": PromptBuilder(), "compact": PromptBuilder(compact=True)}
+    totals = {name: defaultdict(int) for name in templates}
+    counts = defaultdict(int)
+    examples = []
+    for preference in preferences:
+        prompt_input = to_prompt_input(preference)
+        counts[prompt_input["type"]] += 1
+        for name, template in templates.items():
+            totals[name][prompt_input["type"]] += estimate(template.invoke(prompt_input))
+        if len(examples) < args.api_sample:
+            examples.append(prompt_input)
+
+    print(f"{sum(counts.values())} preference sets (grid size {grid_size(year_ranges)}), "
+          f"estimated input tokens per request:")
+    print(f"{'type':<8}{'old':>8}{'new':>8}{'compact':>9}")
+    for type in options.TYPES:
+        row = [totals[name][type] / counts[type] for name in templates]
+        print(f"{type:<8}{row[0]:8.1f}{row[1]:8.1f}{row[2]:9.1f}")
+    old, new = sum(totals["old"].values()), sum(totals["new"].values())
+    print(f"overall : {old / sum(counts.values()):.1f} -> {new / sum(counts.values()):.1f} "
+          f"({1 - new / old:.0%} fewer input tokens)")
+    print("output  : old asks for 2-line explanations, new for one sentence, compact for titles only")
+
+    if examples:
+        from dotenv import load_dotenv
+        from recommender.llm import gemini
+        load_dotenv()
+        llm = gemini(model=args.model)
+        for name, template in templates.items():
+            counted = [llm.get_num_tokens_from_messages(template.invoke(p).to_messages()) for p in examples]
+            estimated = [estimate(template.invoke(p)) for p in examples]
+            print(f"{name:<8}: {sum(counted) / len(counted):.1f} tokens by {args.model}, "
+                  f"{sum(estimated) / len(estimated):.1f} estimated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark: websocket frames and bytes per result, per-item st.markdown vs one payload per result.
+
+Both renderers run inside Streamlit's AppTest, and every ForwardMsg the script
+enqueues (each one is a websocket frame in a real session) is captured and
+measured, for Movies-only and Both results of --items items per section.
+
+Run from the repository root:  python -m benchmarks.bench_render [--items 5]
+"""
+import argparse
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+
+
+def legacy(type, movies, series):
+    # The per-item display code that used to live in main.py, condensed to its st.markdown calls
+    import streamlit as st
+
+    def card(container, heading, items, empty, single):
+        st.markdown(f"""
+        <div class="{container}"{' style="max-width: 600px;"' if single else ''}>
+            {heading}
+            <ul>
+        """, unsafe_allow_html=True)
+        if items:
+            for text in items[:5]:
+                st.markdown(f"<li>{text.strip().replace(chr(10), ' ')}</li>", unsafe_allow_html=True)
+        else:
+            st.markdown(f"<li>{empty}</li>", unsafe_allow_html=True)
+        st.markdown("</ul></div></div>" if single else "</ul></div>", unsafe_allow_html=True)
+
+    if type == "Both":
+        st.markdown('<div class="recommendations-grid">', unsafe_allow_html=True)
+        col1, col2 = st.columns(2, gap="medium")
+        with col1:
+            card("movie-container", "<h2>🎬 Movies</h2>", movies, "No movie results found for your preferences.", False)
+        with col2:
+            card("series-container", "<h2>📺 Series</h2>", series, "No series results found for your preferences.", False)
+        st.markdown('</div>', unsafe_allow_html=True)
+    else:
+        st.markdown('<div style="display: flex; justify-content: center;">', unsafe_allow_html=True)
+        card("movie-container", "<h3>🎬 Movies</h3>", movies, "No movie results found for your preferences.", True)
+
+
+def batched(type, movies, series):
+    import streamlit as st
+    from recommender.engine import Recommendations
+    from recommender.parser import split_title, Recommendation
+    from recommender.render import results_html
+
+    def items(section, texts):
+        return [Recommendation(section, *split_title(text), text) for text in texts]
+
+    result = Recommendations(movies=items("Movies", movies), series=items("Series", series))
+    st.markdown(results_html(result, type), unsafe_allow_html=True)
+
+
+def measure(script, type, movies, series):
+    captured = []
+    original = ForwardMsgQueue.enqueue
+
+    def enqueue(self, msg):
+        if msg.HasField("delta"):
+            captured.append(len(msg.SerializeToString()))
+        return original(self, msg)
+
+    ForwardMsgQueue.enqueue = enqueue
+    try:
+        at = AppTest.from_function(script, args=(type, movies, series))
+        at.run()
+        assert not at.exception, at.exception
+    finally:
+        ForwardMsgQueue.enqueue = original
+    return len(captured), sum(captured)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    movies = [f"**Movie {i} ({2010 + i})** - A <thoughtful> drama about family & loss on Netflix."
+              for i in range(args.items)]
+    series = [f"**Series {i} ({2015 + i})** - A slow-burn mystery told over three seasons." for i in range(args.items)]
+
+    for type in ("Movies", "Both"):
+        old_frames, old_bytes = measure(legacy, type, movies, series)
+        new_frames, new_bytes = measure(batched, type, movies, series)
+        print(f"{type:<7} per-item : {old_frames:3d} frames, {old_bytes:6d} bytes")
+        print(f"{type:<7} batched  : {new_frames:3d} frames, {new_bytes:6d} bytes "
+              f"({old_frames / new_frames:.1f}x fewer frames)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Replay benchmark: recorded requests through the full recommendation path, offline.
+
+Record a workload by running the app with RECOMMENDER_RECORD_PATH=.cache/requests.jsonl.gz,
+or let this script synthesize one. Each request is templated with the real
+prompt, answered by ReplayLLM with its recorded response, parsed, and rendered
+to the results HTML; nothing is cached and nothing touches the network.
+
+Run from the repository root:
+    python -m benchmarks.bench_replay .cache/requests.jsonl.gz [--scale 0] [--concurrency 4]
+    python -m benchmarks.bench_replay --synthetic 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from recommender import Recommender, prompts
+from recommender.engine import to_prompt_input
+from recommender.fakes import ReplayLLM, canned_reply
+from recommender.precompute import sample_grid
+from recommender.recording import RequestRecorder, read_records
+from recommender.render import results_html
+from recommender.telemetry import percentile
+
+
+def synthesize(path, n, seed=0):
+    """A recording of n distinct grid requests with canned answers and log-normal latencies."""
+    rng = random.Random(seed)
+    recorder = RequestRecorder(path)
+    for preferences in sample_grid([(2010, 2023)], n, seed):
+        prompt_input = to_prompt_input(preferences)
+        recorder.record(prompt_input, canned_reply({"type": prompt_input["type"]}), rng.lognormvariate(1.0, 0.4))
+    recorder.close()
+
+
+def run(recommender, records, concurrency):
+    def one(record):
+        started = time.perf_counter()
+        result = recommender.recommend(record["prompt_input"])
+        results_html(result, record["prompt_input"]["type"])
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, records))
+    return latencies, time.perf_counter() - started
+
+
+def allocations(recommender, records):
+    """Mean peak and retained traced memory per request, run serially under tracemalloc."""
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for record in records:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = recommender.recommend(record["prompt_input"])
+            results_html(result, record["prompt_input"]["type"])
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks), sum(retained) / len(retained)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording", nargs="?", help="JSONL or .jsonl.gz file written by RequestRecorder")
+    parser.add_argument("--synthetic", type=int, default=300, help="requests to synthesize without a recording")
+    parser.add_argument("--scale", type=float, default=0.0, help="multiplier for recorded latencies (0 = none)")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--alloc-sample", type=int, default=200, help="requests measured under tracemalloc")
+    args = parser.parse_args()
+
+    path = args.recording
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.jsonl.gz")
+        synthesize(path, args.synthetic)
+    records = list(read_records(path))
+    template = prompts.movie_title_template()
+    llm = ReplayLLM.from_records(records, template, args.scale)
+    recommender = Recommender(llm=llm, template=template)
+    print(f"{len(records)} recorded requests from {path} "
+          f"({os.path.getsize(path) / len(records):.0f} bytes/request on disk)")
+
+    recommender.recommend(records[0]["prompt_input"])  # warm up imports and the template
+    best = None
+    for _ in range(args.repeat):
+        latencies, elapsed = run(recommender, records, args.concurrency)
+        if best is None or elapsed < best[1]:
+            best = latencies, elapsed
+    latencies, elapsed = best
+    print(f"throughput : {len(records) / elapsed:.0f} req/s at concurrency {args.concurrency} "
+          f"(best of {args.repeat}, latency scale {args.scale})")
+    print(f"latency    : p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    peak, retained = allocations(recommender, records[:args.alloc_sample])
+    print(f"memory     : {peak / 1024:.1f} KiB peak, {retained / 1024:.2f} KiB retained per request")
+    if llm.misses:
+        print(f"warning    : {llm.misses} prompts had no recorded response (templates changed since recording?)")
+
+
+if __name__ == "__main__":
+    main()
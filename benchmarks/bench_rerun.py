@@ -0,0 +1,43 @@
+"""Benchmark: script time of a widget-interaction rerun (no submit) of a Streamlit entry point.
+
+Uses Streamlit's headless AppTest runner, so nothing is rendered in a browser
+and no LLM is contacted. Compare the numbers against a checkout from before
+the st.cache_resource change to see the difference.
+
+Run from the repository root:  python -m benchmarks.bench_rerun [main.py] [--reruns 50]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("script", nargs="?", default="main.py")
+    parser.add_argument("--reruns", type=int, default=50)
+    args = parser.parse_args()
+
+    app = AppTest.from_file(os.path.abspath(args.script), default_timeout=60)
+    started = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - started
+
+    timings = []
+    for i in range(args.reruns):
+        # Simulate the typical interaction: dragging the year slider
+        app.sidebar.slider[0].set_value((2010 - i % 10, 2023))
+        started = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    print(f"{args.script}: first run {first * 1000:.1f} ms")
+    print(f"widget reruns: median {statistics.median(timings) * 1000:.1f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.1f} ms over {len(timings)} reruns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark: TitleIndex lookup throughput on a large title list, and what a backfill saves over a re-prompt.
+
+Titles are 1-5 words drawn from a Zipf-distributed vocabulary of pronounceable
+made-up words, so common words, and their trigrams, are shared by many
+titles as in a real catalog. Lookups are timed for three kinds of query:
+
+  exact   a catalog title with a "(2016)" suffix, found by its key hash
+  typo    one character changed, found through the trigram postings
+  miss    three characters changed, usually too far from anything to match
+
+The index is also written with recommender.columnar and reopened, to time the
+memory-mapped start-up. Last, ResponseValidator.clean() is timed on a
+10-item answer, and the tokens of a backfill for two rejected items are
+compared with regenerating the answer. They are recommender.fakes word
+counts, whose canned explanations are one word long, so the output saving of
+a real answer is larger.
+
+Run from the repository root:  python -m benchmarks.bench_titles [--titles 500000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from recommender.columnar import open_table, write_table
+from recommender.engine import Recommender
+from recommender.fakes import FakeLatencyLLM, canned_reply
+from recommender.parser import Recommendation
+from recommender.telemetry import RequestTrace
+from recommender.titles import TitleIndex
+from recommender.validate import ResponseValidator
+
+SYLLABLES = [consonant + vowel for consonant in "bcdfghjklmnprstvwz" for vowel in ("a", "e", "i", "o", "u", "ai", "ou")]
+PREFERENCES = {"lang": "English", "genre": "Drama", "type": "Both", "formula": "Hollywood", "platform": "Netflix",
+               "mood": "happy", "year_range": "2005-2023"}
+
+
+def synthetic_titles(n, vocabulary=40000, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < vocabulary:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.choice((1, 2, 2, 3, 3, 4)))))
+    words = sorted(words)
+    np_rng = np.random.default_rng(seed)
+    lengths = np_rng.choice([1, 2, 3, 4, 5], n, p=[0.15, 0.35, 0.3, 0.15, 0.05])
+    weights = 1 / np.arange(1, vocabulary + 1)
+    picks = np_rng.choice(vocabulary, lengths.sum(), p=weights / weights.sum())
+    ends = np.cumsum(lengths)
+    return [" ".join(words[i] for i in picks[end - length:end]).title() for end, length in zip(ends, lengths)]
+
+
+def typo(title, rng, edits=1):
+    for _ in range(edits):
+        i = rng.randrange(len(title))
+        title = title[:i] + rng.choice("aeiourst") + title[i + 1:]
+    return title
+
+
+def time_lookups(index, queries):
+    started = time.perf_counter()
+    found = sum(index.lookup(query) is not None for query in queries)
+    elapsed = time.perf_counter() - started
+    return elapsed / len(queries), found / len(queries)
+
+
+def backfill_tokens():
+    """{kind: (regenerated answer, backfill)} token counts when two of ten items are rejected."""
+    def reply(prompt):
+        text = prompt.to_string()
+        if "already been offered" in text:
+            return canned_reply(prompt)
+        # A repeated title and one outside the year range
+        return canned_reply(prompt).replace("Movies 4", "Movies 3").replace("Series 4", "Series 4 (1980)")
+
+    trace = RequestTrace("recommend")
+    Recommender(llm=FakeLatencyLLM(reply), validator=ResponseValidator()).recommend(PREFERENCES, trace=trace)
+    regenerate = RequestTrace("recommend")
+    Recommender(llm=FakeLatencyLLM()).recommend(PREFERENCES, trace=regenerate)
+    tokens = {}
+    for kind in ("input", "output"):
+        full = regenerate.tokens[f"{kind}_tokens"]
+        tokens[kind] = full, trace.tokens[f"{kind}_tokens"] - full
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    titles = synthetic_titles(args.titles)
+    started = time.perf_counter()
+    index = TitleIndex.build(titles)
+    built = time.perf_counter() - started
+    size = sum(column.nbytes for column in index.columns().values())
+    print(f"built an index over {len(index):,} titles in {built:.1f}s, {size / 2 ** 20:.0f} MiB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "titles")
+        write_table(path, index.columns(), {})
+        started = time.perf_counter()
+        mapped = TitleIndex.from_columns(open_table(path)[0])
+        print(f"memory-mapped open: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        rng = random.Random(1)
+        for kind, queries in (("exact", [f"{rng.choice(titles)} (2016)" for _ in range(args.queries)]),
+                              ("typo", [typo(rng.choice(titles), rng) for _ in range(args.queries)]),
+                              ("miss", [typo(rng.choice(titles), rng, 3) for _ in range(args.queries)])):
+            for label, tested in (("in memory", index), ("mapped", mapped)):
+                seconds, found = time_lookups(tested, queries)
+                print(f"{kind:<6} {label:<9}: {seconds * 1e6:7.0f} us per lookup, {1 / seconds:9,.0f} lookups/s, "
+                      f"{found:.0%} matched")
+
+    validator = ResponseValidator(index)
+    answer = {section: [Recommendation(section, f"{rng.choice(titles)} (2016)", "", "") for _ in range(5)]
+              for section in ("Movies", "Series")}
+    started = time.perf_counter()
+    for _ in range(200):
+        validator.clean(PREFERENCES, answer)
+    print(f"validating a 10-item answer against the index: {(time.perf_counter() - started) / 200 * 1000:.2f} ms")
+
+    print("two rejected items, backfill vs regenerating the answer: " + ", ".join(
+        f"{kind} {backfill} vs {full} tokens" for kind, (full, backfill) in backfill_tokens().items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Multi-worker check: several processes, one shared cache, one global cap on LLM calls.
+
+Spawns --workers processes, each with its own Recommender and LLMGateway over a
+stub LLM, all pointed at one SQLite cache file and one ProcessSemaphore lock
+directory. The stubs count how many calls run at once across every process.
+
+  phase 1  each worker answers its own slice of --prompts distinct requests
+           (all cache misses) from --threads threads
+  phase 2  each worker asks for every prompt; all must be cache hits, most of
+           them answers generated by another worker
+
+Runs once without a cap and once with --limit, and exits 1 if the cap was
+exceeded, a phase-2 request reached the LLM, or a worker was not ready.
+
+Run from the repository root:  python -m benchmarks.bench_workers [--workers 4] [--limit 2]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from recommender import Recommender, RecommendationCache
+from recommender.engine import to_prompt_input
+from recommender.fakes import DictTemplate, FakeLatencyLLM
+from recommender.gateway import LLMGateway
+from recommender.precompute import sample_grid
+from recommender.workers import ProcessSemaphore, readiness
+
+
+class CountingLLM(FakeLatencyLLM):
+    """Stub whose calls are counted in shared memory, across processes."""
+
+    def __init__(self, counters, latency):
+        super().__init__(latency=latency)
+        self.counters = counters
+
+    def invoke(self, prompt):
+        current, peak, calls = self.counters
+        with current.get_lock():
+            current.value += 1
+            calls.value += 1
+            peak.value = max(peak.value, current.value)
+        try:
+            return super().invoke(prompt)
+        finally:
+            with current.get_lock():
+                current.value -= 1
+
+
+def worker(index, args, limit, directory, counters, barrier, results):
+    semaphore = ProcessSemaphore(os.path.join(directory, "locks"), limit) if limit else None
+    gateway = LLMGateway(llm=CountingLLM(counters, args.latency), semaphore=semaphore, hedge_quantile=None)
+    recommender = Recommender(tiers=[("stub", gateway)], template=DictTemplate(),
+                              cache=RecommendationCache(os.path.join(directory, "cache.sqlite3")))
+    prompts = [to_prompt_input(p) for p in sample_grid([(2010, 2023)], args.prompts)]
+
+    barrier.wait()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(recommender.recommend, prompts[index::args.workers]))
+    generated = time.perf_counter() - started
+    barrier.wait()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        answers = list(pool.map(recommender.recommend, prompts))
+    results.put({"generated": generated, "hits": sum(answer.cached for answer in answers),
+                 "lookups": len(answers), "ready": readiness(recommender, semaphore)[0]})
+
+
+def run(args, limit):
+    context = multiprocessing.get_context("spawn")
+    directory = tempfile.mkdtemp()
+    counters = (context.Value("i", 0), context.Value("i", 0), context.Value("i", 0))
+    barrier = context.Barrier(args.workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(i, args, limit, directory, counters, barrier, results))
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    barrier.wait()  # every worker has imported and built its recommender
+    started = time.perf_counter()
+    barrier.wait()
+    elapsed = time.perf_counter() - started
+    phase1_calls = counters[2].value
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {
+        "peak": counters[1].value,
+        "phase1_calls": phase1_calls,
+        "phase2_calls": counters[2].value - phase1_calls,
+        "hits": sum(r["hits"] for r in reports),
+        "lookups": sum(r["lookups"] for r in reports),
+        "ready": all(r["ready"] for r in reports),
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="concurrent requests per worker")
+    parser.add_argument("--limit", type=int, default=2, help="global cap on concurrent LLM calls")
+    parser.add_argument("--prompts", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{args.workers} workers x {args.threads} threads, {args.prompts} prompts, "
+          f"{args.latency * 1000:.0f} ms per LLM call")
+    for limit in (0, args.limit):
+        stats = run(args, limit)
+        label = f"cap {limit}" if limit else "no cap"
+        print(f"{label:<7}: peak {stats['peak']:2d} concurrent LLM calls, phase 1 {stats['phase1_calls']} calls in "
+              f"{stats['elapsed'] * 1000:.0f} ms, phase 2 {stats['phase2_calls']} calls, "
+              f"{stats['hits']}/{stats['lookups']} cache hits")
+        if limit and stats["peak"] > limit:
+            failures.append(f"{label}: {stats['peak']} concurrent calls")
+        if stats["phase1_calls"] != args.prompts or stats["phase2_calls"]:
+            failures.append(f"{label}: cache not shared ({stats['phase1_calls']} + {stats['phase2_calls']} calls)")
+        if stats["hits"] != stats["lookups"]:
+            failures.append(f"{label}: {stats['lookups'] - stats['hits']} phase-2 misses")
+        if not stats["ready"]:
+            failures.append(f"{label}: a worker was not ready")
+    for failure in failures:
+        print(f"FAILED {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,214 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
-import re
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
+import uuid
+import logging
+from recommender import Recommender, Recommendations, RecommendationCache, DEFAULT_CACHE_PATH
+from recommender import options
+from recommender.cache import output_namespace
+from recommender.engine import requested_sections
+from recommender.catalog import Catalog, DEFAULT_CATALOG_PATH
+from recommender.feedback import FeedbackModel, FeedbackStore, item_key, DEFAULT_FEEDBACK_PATH, DEFAULT_MODEL_PATH
+from recommender.pool import RecommendationPool
+from recommender.prefetch import Prefetcher
+from recommender.popularity import PopularityStore, Refresher, DEFAULT_POPULARITY_PATH
+from recommender.precompute import PrecomputedStore, DEFAULT_STORE_PATH
+from recommender.recording import RequestRecorder
+from recommender.render import card_html, results_html
+from recommender.structured import stats as structured_stats
+from recommender.tiers import clients, load_tiers, stats as tier_stats
+from recommender.telemetry import Telemetry, JsonLogSink, PrometheusSink, serve_metrics
+from recommender.validate import ResponseValidator
+from recommender.workers import ProcessSemaphore, readiness, DEFAULT_LOCK_DIR
+
+rerun_started = time.perf_counter()
+logger = logging.getLogger(__name__)
+
+# Streamlit re-executes this script on every widget interaction, so everything
+# expensive below is built once per process with st.cache_resource; the
+# recommender imports langchain and creates the Gemini client on first use.
+
 
 # Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY") 
-
-# Initialize Gemini LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-pro",
-    temperature=0.2,
-    api_key=API_KEY
-)
+@st.cache_resource
+def load_environment():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+
+load_environment()
+
+# Opt-in: ask for validated JSON instead of markdown bullets (disables streaming)
+STRUCTURED = os.getenv("RECOMMENDER_STRUCTURED", "0") == "1"
+
+# Render each recommendation as soon as the model finishes it instead of waiting for the full answer
+STREAMING = os.getenv("RECOMMENDER_STREAMING", "1") == "1" and not STRUCTURED
+
+# Opt-in: ask for titles only, about half the output tokens; an explanation is generated when its item is expanded
+COMPACT = os.getenv("RECOMMENDER_COMPACT", "0") == "1"
+
+# Opt-in: ask for this many items per section in one call and page through them with "Show more"; the model is
+# only asked again, for titles not offered yet, once they run out
+POOL_SIZE = int(os.getenv("RECOMMENDER_POOL_SIZE", "0"))
+
+CACHE_NAMESPACE = output_namespace(STRUCTURED, COMPACT, POOL_SIZE)
+
+# Opt-in: for "Both", request Movies and Series as two concurrent calls with per-branch timeouts
+FAN_OUT = os.getenv("RECOMMENDER_FAN_OUT", "0") == "1" and not STRUCTURED
+BRANCH_TIMEOUT = float(os.getenv("RECOMMENDER_BRANCH_TIMEOUT", "60"))
+
+# Opt-in: also answer near-duplicate preferences from the cache (cosine similarity threshold, e.g. 0.95)
+SEMANTIC_THRESHOLD = float(os.getenv("RECOMMENDER_SEMANTIC_THRESHOLD", "0"))
+
+# "fast" answers from the local catalog when it can, "grounded" gives the LLM a catalog shortlist
+MODE = os.getenv("RECOMMENDER_MODE", "llm")
+
+# Rate limiting, retries, hedged requests and a circuit breaker in front of Gemini; 0 calls it directly
+GATEWAY = os.getenv("RECOMMENDER_GATEWAY", "1") == "1"
+# Calls per second per model tier in this process, 0 for no limit. Each process has its own limiter, so with N
+# processes set it to the API quota divided by N (RECOMMENDER_MAX_LLM_CALLS caps concurrency across all of them)
+RATE_LIMIT = float(os.getenv("RECOMMENDER_RATE_LIMIT", "0"))
+
+# Model tiers ([models] in config.toml): the cheapest answers first, the last one on "Refine"
+CONFIG_PATH = os.getenv("RECOMMENDER_CONFIG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                "config.toml"))
+
+CACHE_TTL = int(os.getenv("RECOMMENDER_CACHE_TTL", str(24 * 3600)))
+
+# Opt-in: every N seconds, regenerate the most requested answers before their TTL runs out. Requests are
+# only counted while it is set, so set it for every app process that shares the popularity file
+REFRESH_INTERVAL = float(os.getenv("RECOMMENDER_REFRESH_INTERVAL", "0"))
+
+# Opt-in: once genre and platform are set and the sidebar has been left alone for this many seconds, start
+# generating in the background, so "Get Recommendations" finds the answer ready or already under way
+PREFETCH_DEBOUNCE = float(os.getenv("RECOMMENDER_PREFETCH_DEBOUNCE", "0"))
+
+# Opt-in: append every fresh LLM answer to this JSONL(.gz) file for benchmarks/bench_replay.py
+RECORD_PATH = os.getenv("RECOMMENDER_RECORD_PATH")
+
+# Opt-in: serve Prometheus text metrics at http://127.0.0.1:<port>/metrics, plus /healthz and /readyz;
+# give every worker process its own port
+METRICS_PORT = int(os.getenv("RECOMMENDER_METRICS_PORT", "0"))
+
+# Opt-in: like/dislike/watched buttons under the results, appended to RECOMMENDER_FEEDBACK_PATH; once
+# `python -m recommender.feedback train` has written a model, answers are re-ranked for the user (?user=<id>,
+# otherwise this session's own ratings)
+FEEDBACK = os.getenv("RECOMMENDER_FEEDBACK", "0") == "1"
+
+# Drop titles an answer repeats, near-duplicates ("Dark" and "Dark (2017)") and titles outside the year range, and
+# ask the same model for just that many replacements; with RECOMMENDER_VALIDATE_CATALOG=1, titles the local
+# catalog does not know are dropped too
+VALIDATE = os.getenv("RECOMMENDER_VALIDATE", "1") == "1"
+VALIDATE_CATALOG = VALIDATE and os.getenv("RECOMMENDER_VALIDATE_CATALOG", "0") == "1"
+
+# Several Streamlit processes may run side by side: the cache and popularity files are SQLite in WAL
+# mode, and this caps concurrent Gemini calls across all processes sharing RECOMMENDER_LOCK_DIR (0 = no cap)
+MAX_LLM_CALLS = int(os.getenv("RECOMMENDER_MAX_LLM_CALLS", "0"))
+
+
+# Per-request timing spans and token counts, logged as JSON lines and kept for the ?debug=1 panel
+@st.cache_resource
+def get_telemetry():
+    return Telemetry([JsonLogSink(), PrometheusSink()], history=int(os.getenv("RECOMMENDER_DEBUG_HISTORY", "50")))
+
+
+telemetry = get_telemetry()
+
+
+@st.cache_resource
+def get_llm_slots():
+    if not MAX_LLM_CALLS:
+        return None
+    return ProcessSemaphore(os.getenv("RECOMMENDER_LOCK_DIR", DEFAULT_LOCK_DIR), MAX_LLM_CALLS)
+
+
+llm_slots = get_llm_slots()
+
+
+# Recommendation engine shared by all sessions; the cache's SQLite tier survives restarts
+@st.cache_resource
+def get_recommender():
+    cache = RecommendationCache(
+        path=os.getenv("RECOMMENDER_CACHE_PATH", DEFAULT_CACHE_PATH),
+        max_entries=int(os.getenv("RECOMMENDER_CACHE_SIZE", "256")),
+        ttl=CACHE_TTL,
+        namespace=CACHE_NAMESPACE,
+    )
+    if SEMANTIC_THRESHOLD:
+        from recommender.semantic_cache import SemanticCache
+        cache = SemanticCache(cache, threshold=SEMANTIC_THRESHOLD)
+    # Answers warmed offline by `python -m recommender.precompute`, if that has been run
+    precomputed_path = os.getenv("RECOMMENDER_PRECOMPUTED_PATH", DEFAULT_STORE_PATH)
+    precomputed = None
+    if os.path.exists(precomputed_path):
+        precomputed = PrecomputedStore(precomputed_path, namespace=CACHE_NAMESPACE)
+    # Local title catalog built by `python -m recommender.catalog build`, used by the fast/grounded modes and
+    # catalog validation
+    catalog_path = os.getenv("RECOMMENDER_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+    catalog = None
+    if (MODE != "llm" or VALIDATE_CATALOG) and os.path.exists(catalog_path):
+        catalog = Catalog.load(catalog_path)
+    validator = None
+    if VALIDATE:
+        validator = ResponseValidator(catalog.title_index if VALIDATE_CATALOG and catalog is not None else None)
+    tiers = clients(load_tiers(CONFIG_PATH), gateway=GATEWAY, rate_limit=RATE_LIMIT, semaphore=llm_slots)
+    recorder = RequestRecorder(RECORD_PATH) if RECORD_PATH else None
+    # Request counts shared by all sessions and processes; they decide what the refresher keeps warm. Counting
+    # takes the SQLite write lock on every request, so without a refresher to read them nothing is counted
+    popularity = None
+    if REFRESH_INTERVAL:
+        popularity = PopularityStore(os.getenv("RECOMMENDER_POPULARITY_PATH", DEFAULT_POPULARITY_PATH))
+    recommender = Recommender(tiers=tiers, cache=cache, structured=STRUCTURED, precomputed=precomputed,
+                              catalog=catalog, mode=MODE, telemetry=telemetry, recorder=recorder,
+                              popularity=popularity, compact=COMPACT, pool=POOL_SIZE or None, validator=validator)
+    if REFRESH_INTERVAL:
+        Refresher(recommender, popularity, CACHE_TTL, interval=REFRESH_INTERVAL,
+                  budget=int(os.getenv("RECOMMENDER_REFRESH_BUDGET", "5"))).start()
+    return recommender
+
+
+recommender = get_recommender()
+
+
+@st.cache_resource
+def get_prefetcher():
+    if not PREFETCH_DEBOUNCE:
+        return None
+    return Prefetcher(recommender, debounce=PREFETCH_DEBOUNCE,
+                      max_per_session=int(os.getenv("RECOMMENDER_PREFETCH_BUDGET", "5")))
+
+
+prefetcher = get_prefetcher()
+
+
+@st.cache_resource
+def get_feedback_store():
+    if not FEEDBACK:
+        return None
+    return FeedbackStore(os.getenv("RECOMMENDER_FEEDBACK_PATH", DEFAULT_FEEDBACK_PATH))
+
+
+@st.cache_resource
+def get_feedback_model():
+    path = os.getenv("RECOMMENDER_FEEDBACK_MODEL", DEFAULT_MODEL_PATH)
+    if not FEEDBACK or not os.path.exists(path):
+        return None
+    return FeedbackModel.load(path)
+
+
+feedback_store = get_feedback_store()
+feedback_model = get_feedback_model()
+
+
+@st.cache_resource
+def serve_status():
+    prometheus = next(sink for sink in telemetry.sinks if isinstance(sink, PrometheusSink))
+    return serve_metrics(prometheus, METRICS_PORT, ready=lambda: readiness(recommender, llm_slots))
 
-# Prompt template
-movie_title_template = ChatPromptTemplate.from_messages([
-    ("system", """You are a helpful movie assistant. Based on the user's preferences (language: {lang}, genre: {genre}, type: {type}, formula: {formula}, year_range: {year_range}):
-
-If type is "Movies":
-- Provide **5 movie names** under a section called `Movies`.
-- Do NOT provide any series.
-
-If type is "Series":
-- Provide **5 series names** under a section called `Series`.
-- Do NOT provide any movies.
-
-If type is "Both":
-- Provide **5 movie names** under a section called `Movies`.
-- Provide **5 series names** under a section called `Series`.
-
-- Give each item a very short 2-line explanation.
-- Return the results in **bullet format under clear headers**.
-- Strictly no use of emojis.
-- also make title of movies nd series bolder more
-"""),
-    ("user", "I want to watch something in {lang}. "
-             "I'm in the mood for {genre}. "
-             "I prefer {type} and from the {formula} industry. "
-             "I want to watch on {platform}. "
-             "My current mood is {mood}. "
-             "The movie/series should be between this year range {year_range}. "
-             "Please give me best suggestions according to my preferences.")
-])
+
+if METRICS_PORT:
+    serve_status()
 
 # Streamlit UI Config
 st.set_page_config(
@@ -338,33 +502,216 @@ st.markdown("""
 st.sidebar.markdown("### 🎯 Set Your Preferences")
 st.sidebar.markdown('<p class="required">* Required fields</p>', unsafe_allow_html=True)
 
-lang = st.sidebar.selectbox("Choose your preferred language:", 
-    ("Hindi", "English", "Tamil", "Telugu", "Urdu", "French", "German", "Spanish"))
+lang = st.sidebar.selectbox("Choose your preferred language:", options.LANGUAGES)
 
-genre = st.sidebar.multiselect("Select Genre: *", 
-    ("Horror", "Action", "Thriller", "Comedy", "Romantic", "Sci-Fi", "Family", "Drama", "Adventure","Animated","kids"))
+genre = st.sidebar.multiselect("Select Genre: *", options.GENRES)
 
-type = st.sidebar.radio("Select Type:", ("Movies", "Series", "Both"))
+type = st.sidebar.radio("Select Type:", options.TYPES)
 
-formula = st.sidebar.selectbox("Select Formula Type:", 
-    ("Hollywood", "Bollywood", "Tollywood", "Korean", "Turkish","chinese","Japenese"))
+formula = st.sidebar.selectbox("Select Formula Type:", options.FORMULAS)
 
-platform = st.sidebar.multiselect("Select Platform: *", 
-    ("YouTube", "Netflix", "Prime Video", "Disney+", "Jio Cinema", "Z5", "Hulu", "HBO Max","Apple Tv"))
+platform = st.sidebar.multiselect("Select Platform: *", options.PLATFORMS)
 
-mood = st.sidebar.radio("Your Mood:", ("Happy", "Sad", "Neutral", "Excited", "Relaxed"))
+mood = st.sidebar.radio("Your Mood:", options.MOODS)
 
-year_range = st.sidebar.slider("Select Year Range:", 1980, 2025, (2010, 2023))
+year_range = st.sidebar.slider("Select Year Range:", options.YEAR_MIN, options.YEAR_MAX, options.DEFAULT_YEAR_RANGE)
 
 submit = st.sidebar.button("🎬 Get Recommendations", type="primary")
 
+selected_preferences = {
+    "lang": lang,
+    "genre": genre,
+    "type": type,
+    "formula": formula,
+    "platform": platform,
+    "mood": mood,
+    "year_range": year_range
+}
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+user_id = st.query_params.get("user") or session_id
+
+# Fan-out caches Movies and Series separately, so a prefetched "Both" answer would not be used
+if prefetcher is not None and not submit and genre and platform and not (FAN_OUT and type == "Both"):
+    prefetcher.schedule(session_id, selected_preferences)
+
+# Set by the "Refine" button below, which re-asks the strongest model for the last preferences
+refine = st.session_state.pop("refine_requested", False) and not submit
+
+# Set by the "Show more" button below, which shows the next page of the last answer's pool
+more = st.session_state.pop("more_requested", False) and not (submit or refine) and "pool" in st.session_state
+
+# Set when an item of a compact answer is expanded or an item is rated; the last results are drawn again
+redraw = (st.session_state.pop("redraw_requested", False) and not (submit or refine or more)
+          and "last_result" in st.session_state)
+
+cache_stats = recommender.cache.stats()
+st.sidebar.caption(f"Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+if SEMANTIC_THRESHOLD and cache_stats["mean_staleness"] is not None:
+    st.sidebar.caption(f"Near-duplicate hits: {cache_stats['semantic_hits']} (hit rate {cache_stats['hit_rate']:.0%}, "
+                       f"mean age {cache_stats['mean_staleness'] / 60:.0f} min)")
+if STRUCTURED:
+    json_stats = structured_stats.snapshot()
+    st.sidebar.caption(f"JSON mode: {json_stats['parse_failures']} parse failures, {json_stats['retries']} retries")
+
+
+def stream_into_cards(preferences, loading, trace):
+    # One placeholder per visible card; each is redrawn as bullets complete
+    if preferences["type"] == "Both":
+        col1, col2 = st.columns(2, gap="medium")
+        placeholders = {"Movies": col1.empty(), "Series": col2.empty()}
+    else:
+        placeholders = {preferences["type"]: st.empty()}
+    single = len(placeholders) == 1
+    items = {section: [] for section in placeholders}
+
+    def on_item(item):
+        with trace.span("render"):
+            loading.empty()
+            items[item.section].append(item)
+            placeholders[item.section].markdown(card_html(item.section, items[item.section], single),
+                                                unsafe_allow_html=True)
+
+    result = personalize(recommender.stream(preferences, on_item, trace=trace), trace)
+    with trace.span("render"):
+        loading.empty()
+        for section, placeholder in placeholders.items():
+            # Empty sections still get a card, and an escalated answer replaces the streamed one
+            shown = result.section(section)[:recommender.limit]
+            if not items[section] or shown != items[section]:
+                placeholder.markdown(card_html(section, shown, single), unsafe_allow_html=True)
+    return result
+
+
+def fan_out_into_cards(preferences, loading, trace):
+    col1, col2 = st.columns(2, gap="medium")
+    placeholders = {"Movies": col1.empty(), "Series": col2.empty()}
+    result = Recommendations()
+
+    def on_section(section, items, error):
+        if feedback_model is not None:
+            with trace.span("rerank"):
+                items = feedback_model.rerank(items, user_id, st.session_state.get("ratings"))
+        result.section(section).extend(items)
+        with trace.span("render"):
+            loading.empty()
+            if error is not None:
+                reason = "timed out" if isinstance(error, TimeoutError) else f"failed: {error}"
+                placeholders[section].markdown(f"""
+                <div class="error-box">
+                    <h3>⚠️ {section} request {reason}</h3>
+                </div>
+                """, unsafe_allow_html=True)
+                return
+            placeholders[section].markdown(card_html(section, items[:recommender.limit], False), unsafe_allow_html=True)
+
+    recommender.fan_out(preferences, on_section, BRANCH_TIMEOUT, trace=trace)
+    return result
+
+
+def personalize(result, trace):
+    # Re-ranked for this user once `python -m recommender.feedback train` has produced a model
+    if feedback_model is None:
+        return result
+    with trace.span("rerank"):
+        return feedback_model.rerank_result(result, user_id, st.session_state.get("ratings"))
+
+
+def start_pool(preferences, result):
+    # Only the first page is drawn; the rest of the answer waits in the session for "Show more"
+    if not POOL_SIZE:
+        return result
+    pool = st.session_state["pool"] = RecommendationPool(preferences["type"], result, recommender.limit)
+    return pool.next_page()
+
+
+def next_page(preferences, trace):
+    # Instant unless the pool has run low; then one call refills it, avoiding every title offered so far
+    pool = st.session_state["pool"]
+    if pool.needs_refill():
+        pool.refill(recommender, preferences, trace=trace, rank=lambda result: personalize(result, trace))
+    return pool.next_page()
+
+
+def explanations_panel(preferences, result):
+    # Compact answers are titles only; an item's explanation is generated the first time it is expanded
+    sections = requested_sections(preferences)
+    items = [item for section in sections for item in result.section(section) if item.title]
+    if not items:
+        return
+    st.markdown("#### 💡 Why these?")
+    for item in items:
+        key = f"explain-{item.section}-{item.title}"
+        with st.expander(item.label, key=key, on_change=lambda: st.session_state.update(redraw_requested=True)):
+            if st.session_state.get(key):
+                try:
+                    st.write(recommender.explain(preferences, item))
+                except Exception as e:
+                    st.caption(f"Could not load an explanation: {e}")
+
+
+RATING_ICONS = {"like": "👍", "dislike": "👎", "watched": "✅"}
+
+
+def rate(item, event):
+    feedback_store.record(user_id, item, event)
+    st.session_state.setdefault("ratings", {})[item_key(item)] = event
+    st.session_state["redraw_requested"] = True
+
+
+def feedback_panel(preferences, result):
+    # Ratings are appended to the feedback log, which `python -m recommender.feedback train` learns from
+    sections = requested_sections(preferences)
+    items = {item_key(item): item for section in sections for item in result.section(section) if item.title}
+    if not items:
+        return
+    ratings = st.session_state.get("ratings", {})
+    st.markdown("#### 🗳️ Rate these")
+    for key, item in items.items():
+        columns = st.columns([8, 1, 1, 1], vertical_alignment="center")
+        columns[0].text(item.label)
+        for column, (event, icon) in zip(columns[1:], RATING_ICONS.items()):
+            column.button(icon, key=f"rate-{event}-{key}", help=event.capitalize(), on_click=rate, args=(item, event),
+                          type="primary" if ratings.get(key) == event else "secondary")
+
+
+def debug_panel():
+    # Hidden unless the page is opened with ?debug=1
+    recent = list(telemetry.recent)
+    with st.expander(f"🛠️ Request timings (last {len(recent)})"):
+        if not recent:
+            st.write("No requests yet.")
+            return
+        for name, llm in recommender.tiers:
+            st.caption(f"{name} tier: {llm.stats()}")
+        if llm_slots is not None:
+            st.caption(f"LLM slots shared by all workers: {llm_slots.stats()}")
+        if prefetcher is not None:
+            st.caption(f"Prefetch: {prefetcher.stats()}")
+        if feedback_store is not None:
+            trained = "none"
+            if feedback_model is not None:
+                trained = f"{len(feedback_model.users)} users x {len(feedback_model.items)} titles"
+            st.caption(f"Feedback: {feedback_store.count} ratings recorded by this process; model: {trained}")
+        st.table([{"tier": name, **values} for name, values in tier_stats.snapshot().items()])
+        summary = telemetry.summary()
+        st.table([{"stage": stage, **values} for stage, values in sorted(summary.items())])
+        st.table([{
+            "kind": trace.kind,
+            "cache": trace.attributes.get("cache", ""),
+            "rejected": trace.attributes.get("rejected", 0),
+            "total_ms": round(trace.total * 1000, 1),
+            **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in trace.spans.items()},
+            "tokens": trace.tokens.get("total_tokens", 0),
+        } for trace in reversed(recent)])
+
+
 # Validation and Submit Handling
-if submit:
+if submit or refine or more:
     # Check required fields
     missing_fields = []
-    if not genre:
+    if submit and not genre:
         missing_fields.append("Genre")
-    if not platform:
+    if submit and not platform:
         missing_fields.append("Platform")
     
     if missing_fields:
@@ -376,7 +723,8 @@ if submit:
         """, unsafe_allow_html=True)
     else:
         # Show loading
-        with st.container():
+        loading = st.empty()
+        with loading.container():
             st.markdown("""
             <div class="loading">
                 <h2>🤖 AI is analyzing your preferences...</h2>
@@ -384,132 +732,46 @@ if submit:
             </div>
             """, unsafe_allow_html=True)
         
-        # Prepare prompt input
-        prompt_input = {
-            "lang": lang,
-            "genre": ", ".join(genre),
-            "type": type,
-            "formula": formula,
-            "platform": ", ".join(platform),
-            "mood": mood,
-            "year_range": f"{year_range[0]}-{year_range[1]}"
-        }
+        preferences = selected_preferences if submit else st.session_state["last_preferences"]
 
+        trace = telemetry.start("submit" if submit else "refine" if refine else "more")
         try:
-            user_movie_prompt = movie_title_template.invoke(prompt_input)
-            response = llm.invoke(user_movie_prompt)
-            response_text = response.content
-
-            # Parse the response
-            if isinstance(response_text, str):
-                # Initialize empty lists
-                movies = []
-                series = []
-                
-                # Split by Series section if it exists
-                series_split = re.split(r"(?i)###?\s*Series", response_text)
-                if len(series_split) == 2:
-                    movies_section, series_section = series_split
-                    movies = re.findall(r"[-*•]\s+(.*?)(?=\n[-*•]|\n\n|$)", movies_section, re.DOTALL)
-                    series = re.findall(r"[-*•]\s+(.*?)(?=\n[-*•]|\n\n|$)", series_section, re.DOTALL)
-                else:
-                    # Check if it's only movies or only series
-                    if "Movies" in response_text and "Series" not in response_text:
-                        # Only movies
-                        movies = re.findall(r"[-*•]\s+(.*?)(?=\n[-*•]|\n\n|$)", response_text, re.DOTALL)
-                    elif "Series" in response_text and "Movies" not in response_text:
-                        # Only series
-                        series = re.findall(r"[-*•]\s+(.*?)(?=\n[-*•]|\n\n|$)", response_text, re.DOTALL)
-                    else:
-                        # Try to parse both from the entire text
-                        movies = re.findall(r"[-*•]\s+(.*?)(?=\n[-*•]|\n\n|$)", response_text, re.DOTALL)
-                
-                # Display results based on user selection
-                if type == "Both":
-                    # Show both movies and series
-                    st.markdown('<div class="recommendations-grid">', unsafe_allow_html=True)
-                    col1, col2 = st.columns(2, gap="medium")
-
-                    with col1:
-                        st.markdown("""
-                        <div class="movie-container">
-                            <h2>🎬 Movies</h2>
-                            <ul>
-                        """, unsafe_allow_html=True)
-                        
-                        if movies:
-                            for movie in movies[:5]:
-                                clean_movie = movie.strip().replace('\n', ' ')
-                                st.markdown(f"<li>{clean_movie}</li>", unsafe_allow_html=True)
-                        else:
-                            st.markdown("<li>No movie results found for your preferences.</li>", unsafe_allow_html=True)
-                        
-                        st.markdown("</ul></div>", unsafe_allow_html=True)
-
-                    with col2:
-                        st.markdown("""
-                        <div class="series-container">
-                            <h2>📺 Series</h2>
-                            <ul>
-                        """, unsafe_allow_html=True)
-                        
-                        if series:
-                            for show in series[:5]:
-                                clean_show = show.strip().replace('\n', ' ')
-                                st.markdown(f"<li>{clean_show}</li>", unsafe_allow_html=True)
-                        else:
-                            st.markdown("<li>No series results found for your preferences.</li>", unsafe_allow_html=True)
-                        
-                        st.markdown("</ul></div>", unsafe_allow_html=True)
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                elif type == "Movies":
-                    # Show only movies - centered
-                    st.markdown('<div style="display: flex; justify-content: center;">', unsafe_allow_html=True)
-                    st.markdown("""
-                    <div class="movie-container" style="max-width: 600px;">
-                        <h3>🎬 Movies</h3>
-                        <ul>
-                    """, unsafe_allow_html=True)
-                    
-                    if movies:
-                        for movie in movies[:5]:
-                            clean_movie = movie.strip().replace('\n', ' ')
-                            st.markdown(f"<li>{clean_movie}</li>", unsafe_allow_html=True)
-                    else:
-                        st.markdown("<li>No movie results found for your preferences.</li>", unsafe_allow_html=True)
-                    
-                    st.markdown("</ul></div></div>", unsafe_allow_html=True)
-                
-                elif type == "Series":
-                    # Show only series - centered
-                    st.markdown('<div style="display: flex; justify-content: center;">', unsafe_allow_html=True)
-                    st.markdown("""
-                    <div class="series-container" style="max-width: 600px;">
-                        <h3>📺 Series</h3>
-                        <ul>
-                    """, unsafe_allow_html=True)
-                    
-                    if series:
-                        for show in series[:5]:
-                            clean_show = show.strip().replace('\n', ' ')
-                            st.markdown(f"<li>{clean_show}</li>", unsafe_allow_html=True)
-                    else:
-                        st.markdown("<li>No series results found for your preferences.</li>", unsafe_allow_html=True)
-                    
-                    st.markdown("</ul></div></div>", unsafe_allow_html=True)
-                
+            if submit and prefetcher is not None:
+                # A finished prefetch left the answer in the cache; one still running is waited for
+                with trace.span("prefetch_wait"):
+                    outcome, saved = prefetcher.adopt(session_id, preferences)
+                trace.attributes["prefetch"] = outcome or "miss"
+                if outcome:
+                    trace.attributes["prefetch_saved_ms"] = round(saved * 1000, 1)
+            if submit and FAN_OUT and type == "Both":
+                # Each column fills from its own call
+                result = start_pool(preferences, fan_out_into_cards(preferences, loading, trace))
+            elif submit and STREAMING:
+                result = start_pool(preferences, stream_into_cards(preferences, loading, trace))
             else:
-                # Handle non-string response
-                st.markdown("""
-                <div class="error-box">
-                    <h3>⚠️ Invalid response format</h3>
-                    <p>The AI returned an unexpected response format.</p>
-                </div>
-                """, unsafe_allow_html=True)
+                if more:
+                    result = next_page(preferences, trace)
+                elif refine:
+                    result = start_pool(preferences, personalize(recommender.refine(preferences, trace=trace), trace))
+                else:
+                    result = start_pool(preferences, personalize(recommender.recommend(preferences, trace=trace),
+                                                                 trace))
+                # All requested cards in one element
+                with trace.span("render"):
+                    loading.empty()
+                    st.markdown(results_html(result, preferences["type"]), unsafe_allow_html=True)
+
+            st.session_state["last_preferences"] = preferences
+            recommender.cache.log_stats()
+            if COMPACT or FEEDBACK:
+                st.session_state["last_result"] = result
+            if COMPACT:
+                explanations_panel(preferences, result)
+            if FEEDBACK:
+                feedback_panel(preferences, result)
 
         except Exception as e:
+            trace.attributes["error"] = e.__class__.__name__
             st.markdown(f"""
             <div class="error-box">
                 <h3>⚠️ Error generating recommendations</h3>
@@ -517,12 +779,38 @@ if submit:
                 <p>Please check your API key and try again.</p>
             </div>
             """, unsafe_allow_html=True)
+        finally:
+            telemetry.record(trace)
+
+if redraw:
+    preferences = st.session_state["last_preferences"]
+    st.markdown(results_html(st.session_state["last_result"], preferences["type"]), unsafe_allow_html=True)
+    if COMPACT:
+        explanations_panel(preferences, st.session_state["last_result"])
+    if FEEDBACK:
+        feedback_panel(preferences, st.session_state["last_result"])
 
 # Footer - show when no submission
-if not submit:
+if not (submit or refine or more or redraw):
     st.markdown("""
     <div class="info-message">
         <h3>👈 Fill in your preferences in the sidebar to get started!</h3>
         <p>Select your genres and platforms to receive personalized movie and series recommendations.</p>
     </div>
     """, unsafe_allow_html=True)
+
+# Drawn after the results so it is there right after the first submit
+if len(recommender.tiers) > 1 and "last_preferences" in st.session_state:
+    st.sidebar.button(f"✨ Refine with {recommender.tiers[-1][0]} model",
+                      on_click=lambda: st.session_state.update(refine_requested=True))
+
+if POOL_SIZE and "pool" in st.session_state:
+    pool = st.session_state["pool"]
+    ready = min(pool.remaining(section) for section in pool.sections)
+    st.sidebar.button("🔄 Show more", on_click=lambda: st.session_state.update(more_requested=True))
+    st.sidebar.caption(f"Page {pool.pages}; {ready} more ready without a new request")
+
+if st.query_params.get("debug") == "1":
+    debug_panel()
+
+logger.debug("rerun took %.1f ms", (time.perf_counter() - rerun_started) * 1000)
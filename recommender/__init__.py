@@ -0,0 +1,17 @@
+from .cache import RecommendationCache, DEFAULT_CACHE_PATH
+from .engine import Recommender, Recommendations, recommend, to_prompt_input
+from .parser import Recommendation, ResponseParser, parse_response
+from .structured import StructuredOutputError
+
+__all__ = [
+    "DEFAULT_CACHE_PATH",
+    "Recommendation",
+    "RecommendationCache",
+    "Recommendations",
+    "Recommender",
+    "ResponseParser",
+    "StructuredOutputError",
+    "parse_response",
+    "recommend",
+    "to_prompt_input",
+]
@@ -0,0 +1,231 @@
+"""Headless JSON API over the recommender, as a plain ASGI application.
+
+    POST /recommendations  {"lang": ..., "genre": [...], "type": "Both", "formula": ...,
+                            "platform": [...], "mood": ..., "year_range": [2010, 2023]}
+
+    GET /metrics           Prometheus text format, when the app has a metrics sink
+    GET /healthz           200 while the process is up
+    GET /readyz            200 or 503 with the checks of recommender.workers.readiness
+
+Serve it with any ASGI server, e.g. ``uvicorn recommender.api:app``. With
+``--workers N``, set RECOMMENDER_MAX_LLM_CALLS to cap model calls across all
+of them; the SQLite cache is shared. RECOMMENDER_RATE_LIMIT (calls per second
+per model tier, default 0: unlimited) applies to each worker on its own, so
+set it to the quota divided by N.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+
+from .cache import DEFAULT_CACHE_PATH, RecommendationCache, preference_key
+from .engine import Recommender, to_prompt_input
+from .tiers import DEFAULT_CONFIG_PATH, clients, load_tiers
+from .telemetry import JsonLogSink, PrometheusSink, Telemetry
+from .workers import DEFAULT_LOCK_DIR, ProcessSemaphore, readiness
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("lang", "genre", "type", "formula", "platform", "mood", "year_range")
+TYPES = ("Movies", "Series", "Both")
+
+
+class Rejected(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = list(headers)
+
+
+def validate(body):
+    try:
+        preferences = json.loads(body or b"{}")
+    except ValueError:
+        raise Rejected(400, "request body must be JSON")
+    if not isinstance(preferences, dict):
+        raise Rejected(400, "request body must be a JSON object")
+    missing = [name for name in REQUIRED_FIELDS if not preferences.get(name)]
+    if missing:
+        raise Rejected(400, f"missing required fields: {', '.join(missing)}")
+    if preferences["type"] not in TYPES:
+        raise Rejected(400, f"type must be one of {', '.join(TYPES)}")
+    for name in ("genre", "platform"):
+        value = preferences[name]
+        if not (isinstance(value, str) or isinstance(value, list) and all(isinstance(v, str) for v in value)):
+            raise Rejected(400, f"{name} must be a string or a list of strings")
+    year_range = preferences["year_range"]
+    # bool is an int subclass, but true is not a year
+    if not (isinstance(year_range, list) and len(year_range) == 2
+            and all(isinstance(year, int) and not isinstance(year, bool) for year in year_range)):
+        raise Rejected(400, "year_range must be a list of two integers, e.g. [2010, 2023]")
+    if year_range[0] > year_range[1]:
+        raise Rejected(400, "year_range must start no later than it ends")
+    return {name: preferences[name] for name in REQUIRED_FIELDS}
+
+
+def _items(recommendations):
+    return [
+        {"title": item.title, "year": item.year, "platform": item.platform, "explanation": item.explanation}
+        for item in recommendations
+    ]
+
+
+class RecommendationAPI:
+    """ASGI app that coalesces identical in-flight requests and bounds upstream concurrency.
+
+    At most max_concurrency LLM calls run at once; up to max_queue more wait
+    for a slot, and anything beyond that is turned away with 429. semaphore is
+    the ProcessSemaphore shared with other workers, if any, reported by /readyz.
+    """
+
+    def __init__(self, recommender, max_concurrency=4, max_queue=32, retry_after=2, metrics=None,
+                 semaphore=None):
+        self.recommender = recommender
+        self.metrics = metrics
+        self.semaphore = semaphore
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._max_concurrency = max_concurrency
+        self._slots = None
+        self._waiting = 0
+        self._in_flight = {}
+
+    async def recommend(self, preferences):
+        # A cache read may block on SQLite, so it stays off the event loop like generation
+        cached = await asyncio.to_thread(self.recommender.lookup, preferences, count=True)
+        if cached is not None:
+            return cached
+        key = preference_key(to_prompt_input(preferences))
+        call = self._in_flight.get(key)
+        if call is not None:
+            self.coalesced += 1
+        else:
+            if self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise Rejected(429, "too many pending requests", [(b"retry-after", str(self.retry_after).encode())])
+            # Counted now rather than when the task starts, so a burst within one loop turn still sees the queue
+            self._waiting += 1
+            call = self._in_flight[key] = asyncio.ensure_future(self._call_upstream(preferences))
+            call.add_done_callback(functools.partial(self._finished, key))
+        # The call is a task of its own: a client that disconnects cancels only its own wait, and the call goes on
+        # for the requests coalesced with it (and into the cache). Only its real errors reach them
+        return await asyncio.shield(call)
+
+    def _finished(self, key, call):
+        del self._in_flight[key]
+        if not call.cancelled():
+            # Mark the exception retrieved for calls every client gave up on
+            call.exception()
+
+    async def _call_upstream(self, preferences):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_concurrency)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            self.upstream_calls += 1
+            # recommend() has just missed the cache in lookup()
+            return await asyncio.to_thread(self.recommender.recommend, preferences, use_cache=False)
+        finally:
+            self._slots.release()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        if scope["type"] != "http":
+            return
+
+        if scope["path"] == "/metrics" and self.metrics is not None:
+            body = self.metrics.render().encode("utf-8")
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/plain; version=0.0.4"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        if scope["path"] in ("/healthz", "/readyz"):
+            status, payload = 200, {"status": "ok"}
+            if scope["path"] == "/readyz":
+                ready, checks = await asyncio.to_thread(readiness, self.recommender, self.semaphore)
+                status, payload = 200 if ready else 503, {"ready": ready, **checks}
+            body = json.dumps(payload).encode("utf-8")
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        headers = []
+        try:
+            if scope["path"] != "/recommendations":
+                raise Rejected(404, "not found")
+            if scope["method"] != "POST":
+                raise Rejected(405, "use POST")
+            preferences = validate(await _read_body(receive))
+            result = await self.recommend(preferences)
+            status, payload = 200, {
+                "movies": _items(result.movies),
+                "series": _items(result.series),
+                "cached": result.cached,
+            }
+        except Rejected as e:
+            status, payload, headers = e.status, {"error": str(e)}, e.headers
+        except Exception as e:
+            logger.exception("recommendation request failed")
+            status, payload = 502, {"error": f"upstream model failed: {e}"}
+
+        body = json.dumps(payload).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                       + headers,
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def create_app():
+    from dotenv import load_dotenv
+    load_dotenv()
+    metrics = PrometheusSink()
+    max_llm_calls = int(os.getenv("RECOMMENDER_MAX_LLM_CALLS", "0"))
+    semaphore = None
+    if max_llm_calls:
+        semaphore = ProcessSemaphore(os.getenv("RECOMMENDER_LOCK_DIR", DEFAULT_LOCK_DIR), max_llm_calls)
+    tiers = clients(load_tiers(os.getenv("RECOMMENDER_CONFIG_PATH", DEFAULT_CONFIG_PATH)),
+                    rate_limit=float(os.getenv("RECOMMENDER_RATE_LIMIT", "0")), semaphore=semaphore)
+    return RecommendationAPI(
+        Recommender(tiers=tiers, cache=RecommendationCache(os.getenv("RECOMMENDER_CACHE_PATH", DEFAULT_CACHE_PATH)),
+                    telemetry=Telemetry([JsonLogSink(), metrics])),
+        max_concurrency=int(os.getenv("RECOMMENDER_API_CONCURRENCY", "4")),
+        max_queue=int(os.getenv("RECOMMENDER_API_QUEUE", "32")),
+        metrics=metrics,
+        semaphore=semaphore,
+    )
+
+
+def __getattr__(name):
+    # The default app is built on first access so importing this module stays side-effect free
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(name)
@@ -0,0 +1,159 @@
+import json
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Fields of prompt_input that make up a cache key, in a fixed order
+PREFERENCE_FIELDS = ("lang", "genre", "type", "formula", "platform", "mood", "year_range")
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "recommendations.sqlite3")
+
+
+def _normalize(value):
+    # Multiselects may arrive as lists or as the joined ", " string; the year slider as a tuple
+    if isinstance(value, (list, tuple)):
+        separator = "-" if all(isinstance(v, int) for v in value) else ", "
+        value = separator.join(str(v) for v in value)
+    return " ".join(str(value).split()).casefold()
+
+
+def preference_key(prompt_input):
+    """Normalized preference tuple used to look up cached recommendations."""
+    return tuple((field, _normalize(prompt_input.get(field, ""))) for field in PREFERENCE_FIELDS)
+
+
+def cache_key(prompt_input, namespace=""):
+    """Stable digest of the normalized preferences, shared by every store keyed on them."""
+    key = preference_key(prompt_input)
+    payload = json.dumps([namespace, key] if namespace else key)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def output_namespace(structured=False, compact=False, pool=None):
+    """Cache namespace for answers in the given output format and size, so formats are never mixed up."""
+    return "-".join(name for name, enabled in (("json", structured), ("compact", compact),
+                                               (f"pool{pool}", pool)) if enabled)
+
+
+class RecommendationCache:
+    """Two-tier (memory + SQLite) LRU cache with a TTL for raw LLM responses.
+
+    namespace separates responses in different output formats for the same preferences.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=256, max_disk_entries=10000, ttl=24 * 3600,
+                 namespace=""):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # WAL lets several app processes read and write the same file (see recommender.workers)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, prompt_input, count=True):
+        # count=False for a second lookup on behalf of the same request (see SemanticCache)
+        digest = cache_key(prompt_input, self.namespace)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(digest)
+                    self.hits += count
+                    return value
+                del self._memory[digest]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM recommendations WHERE key = ?", (digest,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE recommendations SET accessed = ? WHERE key = ?", (now, digest))
+                        self._db.commit()
+                        self._remember(digest, value, created)
+                        self.hits += count
+                        self.disk_hits += count
+                        return value
+                    self._db.execute("DELETE FROM recommendations WHERE key = ?", (digest,))
+                    self._db.commit()
+
+            self.misses += count
+            return None
+
+    def age(self, prompt_input):
+        """Seconds since the entry for prompt_input was stored, or None; not counted as a lookup."""
+        digest = cache_key(prompt_input, self.namespace)
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                return time.time() - entry[1]
+            if self._db is not None:
+                row = self._db.execute("SELECT created FROM recommendations WHERE key = ?", (digest,)).fetchone()
+                if row is not None:
+                    return time.time() - row[0]
+        return None
+
+    def set(self, prompt_input, value):
+        digest = cache_key(prompt_input, self.namespace)
+        now = time.time()
+        with self._lock:
+            self._remember(digest, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO recommendations (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (digest, value, now, now),
+                )
+                # Evict least recently used rows beyond the disk bound
+                self._db.execute(
+                    "DELETE FROM recommendations WHERE key IN ("
+                    "SELECT key FROM recommendations ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+
+    def _remember(self, digest, value, created):
+        self._memory[digest] = (value, created)
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def ping(self):
+        """Raises if the SQLite tier cannot be read."""
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("SELECT 1 FROM recommendations LIMIT 1").fetchall()
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self._memory)}
+
+    def log_stats(self):
+        logger.info("recommendation cache: %(hits)d hits (%(disk_hits)d from disk), %(misses)d misses", self.stats())
@@ -0,0 +1,279 @@
+"""Local movie/series catalog with a vectorized similarity index.
+
+    python -m recommender.catalog build titles.csv -o .cache/catalog
+
+The CSV (or Parquet, with pandas installed) needs title, year and type
+columns; language, formula, genres, platforms and description are optional.
+Multi-valued columns use "|" or "," as separator.
+
+Titles are embedded with hashed word and character-trigram features, so no
+model download is needed. Language and formula are dictionary-encoded to
+small integer codes, genres and platforms to one bitset per row, and titles
+and descriptions live in a string heap. Every value of those four columns
+also has a packed bitmap of the rows that have it, so a query ORs the
+bitmaps of the values it accepts, ANDs the columns together, and takes one
+matrix-vector product over the surviving rows.
+
+build writes a recommender.columnar directory, which Catalog.load() maps
+instead of reading: startup does not grow with the catalog, and every worker
+process shares the same pages. Old .npz indexes still load, the slow way.
+The directory also holds a recommender.titles.TitleIndex over the titles,
+for checking that a model's answer names titles that exist; catalogs built
+before it have it built on first use.
+"""
+import argparse
+import csv
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from .columnar import (StringColumn, encode, encode_sets, is_table, open_table, set_bitmaps, set_codes,
+                       value_bitmaps, write_table)
+from .parser import Recommendation
+from .titles import TitleIndex
+
+DEFAULT_CATALOG_PATH = os.path.join(".cache", "catalog")
+FORMAT = "catalog-columnar/1"
+DIMENSIONS = 256
+EMBED_BATCH = 65536
+KINDS = ("Movies", "Series")
+
+# Words that tilt the query vector towards a mood; the mood itself is never a hard filter
+MOOD_TERMS = {
+    "happy": "feel-good comedy uplifting fun",
+    "sad": "emotional drama tearjerker moving",
+    "neutral": "",
+    "excited": "thrilling action adventure fast-paced",
+    "relaxed": "light calm slice-of-life gentle",
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _features(text):
+    words = _WORD.findall(text.lower())
+    grams = [w[i:i + 3] for w in words for i in range(max(len(w) - 2, 1))]
+    return words + grams
+
+
+def embed(texts, dimensions=DIMENSIONS):
+    """L2-normalized hashed bag-of-features vectors, one row per text."""
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vectors[row, h % dimensions] += 1.0 if h & 0x80000000 else -1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _split(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [part.strip() for part in re.split(r"[|,]", value or "") if part.strip()]
+
+
+def _kind(value):
+    return 1 if str(value).strip().lower() in ("series", "show", "tv", "tv series") else 0
+
+
+class Catalog:
+    """Columnar title store; see the module docstring for the index layout.
+
+    titles and descriptions are StringColumns, categories maps "language" and
+    "formula" to (codes, dictionary) and sets maps "genre" and "platform" to
+    (bitsets, dictionary), as built by recommender.columnar. bitmaps maps the
+    same four columns to their per-value packed row bitmaps, and is built from
+    the codes unless given. The arrays are either in memory (from_columns) or
+    memory-mapped (open).
+    """
+
+    def __init__(self, titles, years, kinds, categories, sets, descriptions, embeddings, title_index=None,
+                 bitmaps=None):
+        self.titles = titles
+        self.years = years
+        self.kinds = kinds
+        self.categories = categories
+        self.sets = sets
+        self.descriptions = descriptions
+        self.embeddings = embeddings
+        self._title_index = title_index
+        if bitmaps is None:
+            # Tables written before the bitmaps were stored
+            bitmaps = {**{column: value_bitmaps(codes, len(dictionary))
+                          for column, (codes, dictionary) in categories.items()},
+                       **{column: set_bitmaps(bits, len(dictionary)) for column, (bits, dictionary) in sets.items()}}
+        self.bitmaps = bitmaps
+        self._index = {column: {value.casefold(): code for code, value in enumerate(dictionary)}
+                       for column, (_, dictionary) in {**categories, **sets}.items()}
+        # Columns the source file left empty are not used as filters
+        self._filterable = {column: any(dictionary) for column, (_, dictionary) in {**categories, **sets}.items()}
+
+    def __len__(self):
+        return len(self.years)
+
+    @property
+    def title_index(self):
+        if self._title_index is None:
+            self._title_index = TitleIndex.build(self.titles)
+        return self._title_index
+
+    @classmethod
+    def from_columns(cls, titles, years, kinds, languages, formulas, genres, platforms, descriptions,
+                     embeddings=None):
+        """Encode plain per-row lists; embeddings are computed unless given."""
+        if embeddings is None:
+            embeddings = np.empty((len(titles), DIMENSIONS), dtype=np.float16)
+            for start in range(0, len(titles), EMBED_BATCH):
+                rows = range(start, min(start + EMBED_BATCH, len(titles)))
+                embeddings[start:rows.stop] = embed([f"{titles[i]} {' '.join(genres[i])} {descriptions[i]}"
+                                                     for i in rows])
+        return cls(StringColumn.from_strings(titles), np.asarray(years, dtype=np.int16),
+                   np.asarray(kinds, dtype=np.int8),
+                   {"language": encode(list(languages)), "formula": encode(list(formulas))},
+                   {"genre": encode_sets(list(genres)), "platform": encode_sets(list(platforms))},
+                   StringColumn.from_strings(descriptions), embeddings)
+
+    def _codes(self, column, values):
+        index = self._index[column]
+        return [index[value.casefold()] for value in values if value.casefold() in index]
+
+    def _any_of(self, column, values):
+        """Packed bitmap of the rows with any of values; unknown values match nothing."""
+        bitmaps = self.bitmaps[column]
+        codes = self._codes(column, values)
+        if not codes:
+            return np.zeros(bitmaps.shape[1], dtype=np.uint8)
+        if len(codes) == 1:
+            return bitmaps[codes[0]]
+        return np.bitwise_or.reduce(bitmaps[codes], axis=0)
+
+    @classmethod
+    def from_rows(cls, rows):
+        columns = {name: [] for name in ("title", "year", "kind", "language", "formula", "genres",
+                                          "platforms", "description")}
+        for row in rows:
+            row = {k.strip().lower(): v for k, v in row.items() if k}
+            if not row.get("title"):
+                continue
+            columns["title"].append(row["title"].strip())
+            columns["year"].append(int(float(row.get("year") or 0)))
+            columns["kind"].append(_kind(row.get("type", "")))
+            columns["language"].append((row.get("language") or "").strip())
+            columns["formula"].append((row.get("formula") or row.get("industry") or "").strip())
+            columns["genres"].append(_split(row.get("genres") or row.get("genre") or ""))
+            columns["platforms"].append(_split(row.get("platforms") or row.get("platform") or ""))
+            columns["description"].append((row.get("description") or "").strip())
+        return cls.from_columns(*columns.values())
+
+    @classmethod
+    def from_file(cls, path):
+        if path.endswith(".parquet"):
+            import pandas as pd
+            return cls.from_rows(pd.read_parquet(path).fillna("").astype(str).to_dict("records"))
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls.from_rows(csv.DictReader(f))
+
+    def save(self, path):
+        """Write the catalog as a columnar directory (see recommender.columnar)."""
+        columns = {"titles": self.titles, "years": self.years, "kinds": self.kinds,
+                   "descriptions": self.descriptions, "embeddings": self.embeddings, **self.title_index.columns()}
+        dictionaries = {}
+        for column, (values, dictionary) in {**self.categories, **self.sets}.items():
+            columns[column] = values
+            columns[f"{column}_bitmaps"] = self.bitmaps[column]
+            dictionaries[column] = list(dictionary)
+        write_table(path, columns, {"format": FORMAT, "rows": len(self), "dictionaries": dictionaries})
+
+    @classmethod
+    def open(cls, path):
+        """Map a directory written by save(); nothing is parsed or copied."""
+        columns, meta = open_table(path)
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a {FORMAT} table; rebuild it with `python -m recommender.catalog build`")
+        dictionaries = meta["dictionaries"]
+        return cls(columns["titles"], columns["years"], columns["kinds"],
+                   {column: (columns[column], dictionaries[column]) for column in ("language", "formula")},
+                   {column: (columns[column], dictionaries[column]) for column in ("genre", "platform")},
+                   columns["descriptions"], columns["embeddings"], TitleIndex.from_columns(columns),
+                   {column: columns[f"{column}_bitmaps"] for column in ("language", "formula", "genre", "platform")}
+                   if all(f"{column}_bitmaps" in columns for column in ("language", "formula", "genre", "platform"))
+                   else None)
+
+    @classmethod
+    def load(cls, path):
+        if is_table(path):
+            return cls.open(path)
+        if not path.endswith(".npz"):
+            return cls.from_file(path)
+        # Indexes built before the columnar format
+        with np.load(path) as data:
+            return cls.from_columns(data["titles"].tolist(), data["years"], data["kinds"], data["languages"].tolist(),
+                                    data["formulas"].tolist(), [_split(g) for g in data["genres"].tolist()],
+                                    [_split(p) for p in data["platforms"].tolist()], data["descriptions"].tolist(),
+                                    data["embeddings"])
+
+    def filter(self, prompt_input):
+        """Boolean mask of rows compatible with the hard preference filters."""
+        start, end = (int(y) for y in str(prompt_input.get("year_range", "0-9999")).split("-"))
+        mask = (self.years >= start) & (self.years <= end)
+        packed = None
+        for column, field in (("language", "lang"), ("formula", "formula"),
+                              ("genre", "genre"), ("platform", "platform")):
+            if prompt_input.get(field) and self._filterable[column]:
+                rows = self._any_of(column, _split(prompt_input[field]))
+                packed = rows if packed is None else packed & rows
+        if packed is not None:
+            # Eight rows per byte until here; unpacked once, to 0/1 bytes that view as bools
+            mask &= np.unpackbits(packed, count=len(self)).view(bool)
+        return mask
+
+    def query_vector(self, prompt_input):
+        text = " ".join([prompt_input.get("genre", ""), prompt_input.get("formula", ""),
+                         MOOD_TERMS.get(str(prompt_input.get("mood", "")).lower(), "")])
+        return embed([text])[0]
+
+    def search(self, prompt_input, k=5):
+        """Best k matches per requested section as {"Movies": [...], "Series": [...]}."""
+        mask = self.filter(prompt_input)
+        query = self.query_vector(prompt_input)
+        wanted = KINDS if prompt_input.get("type", "Both") == "Both" else (prompt_input["type"],)
+        platforms, dictionary = self.sets["platform"]
+        wanted_platforms = set(self._codes("platform", _split(prompt_input.get("platform", ""))))
+        results = {kind: [] for kind in KINDS}
+        for kind in wanted:
+            rows = np.flatnonzero(mask & (self.kinds == KINDS.index(kind)))
+            if rows.size == 0:
+                continue
+            scores = self.embeddings[rows].astype(np.float32) @ query
+            if rows.size > k:
+                best = np.argpartition(-scores, k)[:k]
+                rows, scores = rows[best], scores[best]
+            for i in rows[np.argsort(-scores, kind="stable")]:
+                platform = next((dictionary[c] for c in set_codes(platforms[i]) if c in wanted_platforms), None)
+                title, year, explanation = self.titles[i], int(self.years[i]), self.descriptions[i]
+                text = f"**{title} ({year})** {explanation}".strip()
+                results[kind].append(Recommendation(kind, title, explanation, text, year, platform))
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="ingest a CSV/Parquet file into a columnar index")
+    build.add_argument("source")
+    build.add_argument("-o", "--output", default=DEFAULT_CATALOG_PATH)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    catalog = Catalog.from_file(args.source)
+    catalog.save(args.output)
+    print(f"indexed {len(catalog)} titles into {args.output} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""A directory of memory-mapped columns, for data every app process opens at startup.
+
+    <directory>/
+        meta.json            row count, dictionaries and anything else the owner stores
+        <name>.npy           fixed-width column, opened with np.load(mmap_mode="r")
+        <name>.offsets.npy   string column: int64 start of row i, plus one end offset
+        <name>.heap          string column: the UTF-8 bytes of every row back to back
+
+Opening a table reads meta.json and maps the files; no column is parsed or
+copied, pages are read on first touch, and every process that maps the same
+files shares them through the OS page cache. write_table() builds the whole
+directory next to the target and renames it into place, so readers see
+either the old table or the new one; processes that already mapped the old
+files keep reading them until they reopen.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+META = "meta.json"
+
+
+class StringColumn:
+    """Variable-length strings as an offsets array plus one byte heap; row i decodes on access."""
+
+    def __init__(self, offsets, heap):
+        self.offsets = offsets
+        self.heap = heap
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [str(s).encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return bytes(self.heap[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.heap.nbytes
+
+
+def smallest_code_dtype(size):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+def encode(values, key=str.casefold):
+    """Dictionary-encode a single-valued column: (codes, dictionary); values equal under key share a code."""
+    index, dictionary, codes = {}, [], []
+    for value in values:
+        code = index.get(key(value))
+        if code is None:
+            code = index[key(value)] = len(dictionary)
+            dictionary.append(value)
+        codes.append(code)
+    return np.asarray(codes, dtype=smallest_code_dtype(len(dictionary))), dictionary
+
+
+def encode_sets(rows, key=str.casefold):
+    """Dictionary-encode a multi-valued column as bitsets: (uint64 array of shape (rows, words), dictionary)."""
+    index, dictionary, row_ids, codes = {}, [], [], []
+    for row, values in enumerate(rows):
+        for value in values:
+            code = index.get(key(value))
+            if code is None:
+                code = index[key(value)] = len(dictionary)
+                dictionary.append(value)
+            row_ids.append(row)
+            codes.append(code)
+    bits = np.zeros((len(rows), max(1, -(-len(dictionary) // 64))), dtype=np.uint64)
+    codes = np.asarray(codes, dtype=np.uint64)
+    np.bitwise_or.at(bits, (np.asarray(row_ids, dtype=np.int64), (codes >> np.uint64(6)).astype(np.int64)),
+                     np.left_shift(np.uint64(1), codes & np.uint64(63)))
+    return bits, dictionary
+
+
+def bitset(codes, words):
+    """The query bitset with the given codes set, to AND with an encode_sets column."""
+    query = np.zeros(words, dtype=np.uint64)
+    for code in codes:
+        query[code >> 6] |= np.uint64(1) << np.uint64(code & 63)
+    return query
+
+
+def set_codes(bits):
+    """Codes set in one row of an encode_sets column, in dictionary order."""
+    return [word * 64 + bit for word, value in enumerate(bits.tolist()) if value
+            for bit in range(64) if value >> bit & 1]
+
+
+def value_bitmaps(codes, size):
+    """One np.packbits row bitmap per code of an encode() column, as a (size, ceil(rows / 8)) uint8 array."""
+    bitmaps = np.zeros((size, -(-len(codes) // 8)), dtype=np.uint8)
+    for code in range(size):
+        bitmaps[code] = np.packbits(codes == code)
+    return bitmaps
+
+
+def set_bitmaps(bits, size):
+    """value_bitmaps() for an encode_sets() column: the rows whose set holds each code."""
+    bitmaps = np.zeros((size, -(-len(bits) // 8)), dtype=np.uint8)
+    for code in range(size):
+        bitmaps[code] = np.packbits(bits[:, code >> 6] & (np.uint64(1) << np.uint64(code & 63)) != 0)
+    return bitmaps
+
+
+def write_table(directory, columns, meta):
+    """Write {name: ndarray or StringColumn} and meta (JSON-serializable) as a table at directory."""
+    staging = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, column in columns.items():
+        if isinstance(column, StringColumn):
+            np.save(os.path.join(staging, f"{name}.offsets.npy"), column.offsets)
+            np.asarray(column.heap, dtype=np.uint8).tofile(os.path.join(staging, f"{name}.heap"))
+        else:
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(column))
+    with open(os.path.join(staging, META), "w", encoding="utf-8") as f:
+        json.dump({**meta, "columns": sorted(columns)}, f)
+    retired = None
+    if os.path.exists(directory):
+        retired = directory.rstrip(os.sep) + ".old"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.rename(directory, retired)
+    os.rename(staging, directory)
+    if retired is not None:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def is_table(path):
+    return os.path.isfile(os.path.join(path, META))
+
+
+def open_table(directory):
+    """(columns, meta) with every column memory-mapped read-only."""
+    with open(os.path.join(directory, META), encoding="utf-8") as f:
+        meta = json.load(f)
+    columns = {}
+    for name in meta["columns"]:
+        path = os.path.join(directory, name)
+        if os.path.exists(f"{path}.heap"):
+            # np.memmap cannot map an empty file
+            heap = (np.memmap(f"{path}.heap", dtype=np.uint8, mode="r") if os.path.getsize(f"{path}.heap")
+                    else np.zeros(0, dtype=np.uint8))
+            columns[name] = StringColumn(np.load(f"{path}.offsets.npy", mmap_mode="r"), heap)
+        else:
+            columns[name] = np.load(f"{path}.npy", mmap_mode="r")
+    return columns, meta
@@ -0,0 +1,521 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import List
+
+from . import prompts
+from .cache import preference_key
+from .fanout import fan_out
+from .gateway import CircuitOpenError
+from .llm import gemini
+from .parser import Recommendation, parse_response, SECTIONS
+from .streaming import stream_recommendations
+from .structured import merge_structured, parse_structured, request_structured
+from .telemetry import RequestTrace
+from .tiers import stats as tier_stats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Recommendations:
+    movies: List[Recommendation] = field(default_factory=list)
+    series: List[Recommendation] = field(default_factory=list)
+    raw: str = ""
+    cached: bool = False
+    source: str = "llm"
+    tier: str = ""
+    # (item, reason) for every item the validator dropped
+    rejected: list = field(default_factory=list)
+
+    def section(self, name):
+        return self.movies if name == "Movies" else self.series
+
+
+def to_prompt_input(preferences):
+    """Turn widget values (lists, a year tuple) into the strings the prompt expects."""
+    prompt_input = dict(preferences)
+    for name in ("genre", "platform"):
+        if isinstance(prompt_input.get(name), (list, tuple)):
+            prompt_input[name] = ", ".join(prompt_input[name])
+    year_range = prompt_input.get("year_range")
+    if isinstance(year_range, (list, tuple)):
+        prompt_input["year_range"] = f"{year_range[0]}-{year_range[1]}"
+    return prompt_input
+
+
+def requested_sections(prompt_input):
+    return SECTIONS if prompt_input["type"] == "Both" else (prompt_input["type"],)
+
+
+class Recommender:
+    """Turns user preferences into parsed Movies/Series recommendations.
+
+    The LLM backend, cache and parser are pluggable, so the engine runs without
+    Streamlit and, with a stub llm (see recommender.fakes), without network access.
+    precomputed is an optional read-only store filled by recommender.precompute.
+
+    With a local catalog, mode "fast" answers from it directly whenever it has
+    enough matches, and mode "grounded" passes its matches to the LLM as a
+    shortlist; the default "llm" mode ignores the catalog.
+
+    tiers is an optional [(name, llm)] list, cheapest first (see recommender.tiers):
+    the first tier answers, and an answer that fails or comes up short of limit
+    items per section is escalated to the next. refine() goes straight to the
+    last tier.
+
+    compact asks for titles only, which roughly halves output tokens; explain()
+    then fetches one item's explanation when the user asks for it. Cache compact
+    answers under their own namespace.
+
+    pool asks for that many items per section (at least limit) in one call, for
+    paging through with recommender.pool.RecommendationPool; limit is then the
+    page size, which is what stream() emits and what a tier must deliver.
+    more() asks for a fresh pool that avoids the titles already offered. Cache
+    pooled answers under their own namespace, too.
+
+    validator (recommender.validate.ResponseValidator) drops repeated,
+    near-duplicate, out-of-range and, with a title index, unknown items from
+    every parsed answer. The slots it empties are backfilled by asking the
+    same tier for just that many more titles, and the two answers are cached
+    together, so a cache hit parses to the same result.
+
+    Every call times its stages (cache, prompt, llm, parse) on a RequestTrace.
+    Pass trace= to add them to a trace you record yourself, e.g. with rendering
+    time added; otherwise a trace per call goes to telemetry, if set.
+    """
+
+    MODES = ("llm", "fast", "grounded")
+
+    def __init__(self, llm=None, cache=None, parser=parse_response, template=None,
+                 structured=False, limit=5, precomputed=None, catalog=None, mode="llm", telemetry=None,
+                 tiers=None, recorder=None, popularity=None, compact=False, max_explanations=1024,
+                 pool=None, validator=None):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {', '.join(self.MODES)}")
+        self._llm = llm
+        self._template = template
+        self._grounded_template = None
+        self.catalog = catalog
+        self.mode = mode if catalog is not None else "llm"
+        self.cache = cache
+        self.precomputed = precomputed
+        self.parser = parser
+        self.structured = structured
+        self.limit = limit
+        self.pool = max(pool or limit, limit)
+        self.validator = validator
+        self._backfill_templates = {}
+        self.telemetry = telemetry
+        self.tiers = list(tiers or [])
+        self.recorder = recorder
+        self.popularity = popularity
+        self.compact = compact
+        self.max_explanations = max_explanations
+        self._explanation_template = None
+        self._explanations = OrderedDict()
+        self._explanations_lock = threading.Lock()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = self.tiers[0][1] if self.tiers else gemini()
+        return self._llm
+
+    def _tiers(self):
+        return self.tiers or [("llm", self.llm)]
+
+    @property
+    def template(self):
+        if self._template is None:
+            if self.structured:
+                self._template = prompts.structured_template(self.compact, self.pool)
+            else:
+                self._template = prompts.movie_title_template(self.compact, self.pool)
+        return self._template
+
+    @contextmanager
+    def _tracing(self, kind, trace):
+        if trace is not None:
+            yield trace
+            return
+        trace = RequestTrace(kind)
+        try:
+            yield trace
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.record(trace)
+
+    def _prompt(self, prompt_input):
+        if self.mode == "grounded":
+            candidates = self.catalog.search(prompt_input, max(self.limit * 3, self.pool))
+            if any(candidates.values()):
+                if self._grounded_template is None:
+                    self._grounded_template = prompts.grounded_template(self.structured, self.compact, self.pool)
+                return self._grounded_template.invoke({**prompt_input, "shortlist": prompts.shortlist(candidates)})
+        return self.template.invoke(prompt_input)
+
+    def _local(self, prompt_input, trace):
+        """Catalog answer in fast mode, if it fills every requested section."""
+        if self.mode != "fast":
+            return None
+        with trace.span("catalog"):
+            candidates = self.catalog.search(prompt_input, self.pool)
+        if all(len(candidates[section]) >= self.limit for section in requested_sections(prompt_input)):
+            trace.attributes["cache"] = "catalog"
+            return Recommendations(movies=candidates["Movies"], series=candidates["Series"], source="catalog")
+        return None
+
+    def _fallback(self, prompt_input, trace):
+        """Whatever the catalog has, in any mode, for when the LLM circuit is open."""
+        if self.catalog is None:
+            return None
+        candidates = self.catalog.search(prompt_input, self.pool)
+        if not any(candidates[section] for section in requested_sections(prompt_input)):
+            return None
+        trace.attributes["cache"] = "fallback"
+        return Recommendations(movies=candidates["Movies"], series=candidates["Series"], source="catalog")
+
+    def _cached(self, prompt_input, trace, count=True):
+        # count=False for lookups that are followed by a real request
+        if count and self.popularity is not None:
+            self.popularity.touch(prompt_input)
+        with trace.span("cache"):
+            text = self.cache.get(prompt_input) if self.cache is not None else None
+            trace.attributes["cache"] = "miss" if text is None else "hit"
+            if text is None and self.precomputed is not None:
+                text = self.precomputed.get(prompt_input)
+                if text is not None:
+                    trace.attributes["cache"] = "precomputed"
+                    self._store(prompt_input, text)
+        return text
+
+    def _hit(self, prompt_input, trace, count=True):
+        """The cached or precomputed answer, parsed, or None on a miss.
+
+        An answer the validator leaves short of limit in a requested section
+        (e.g. a semantic-cache neighbour for another year range) is a miss too,
+        so it is regenerated rather than served with empty slots.
+        """
+        text = self._cached(prompt_input, trace, count)
+        if text is None:
+            return None
+        result = self._parse(prompt_input, text, trace, cached=True)
+        if result.rejected and self._problem(prompt_input, result) is not None:
+            trace.attributes["cache"] = "invalid"
+            return None
+        return result
+
+    def _record(self, prompt_input, text, latency=None):
+        # Only fresh LLM answers; cached ones were recorded when they were generated
+        if self.recorder is not None:
+            self.recorder.record(prompt_input, text, latency)
+
+    def _store(self, prompt_input, text):
+        if self.cache is not None and isinstance(text, str):
+            self.cache.set(prompt_input, text)
+
+    def _parse(self, prompt_input, text, trace, cached=False):
+        with trace.span("parse"):
+            return self._parse_sections(prompt_input, text, cached)
+
+    def _parse_sections(self, prompt_input, text, cached):
+        if self.structured:
+            sections = parse_structured(text)
+        else:
+            sections = self.parser(text, "Series" if prompt_input["type"] == "Series" else "Movies")
+        wanted = requested_sections(prompt_input)
+        result = Recommendations(raw=text, cached=cached)
+        if self.validator is not None:
+            sections, result.rejected = self.validator.clean(prompt_input, {section: sections[section]
+                                                                            for section in wanted})
+        for section in wanted:
+            result.section(section).extend(sections[section][:self.pool])
+        return result
+
+    def lookup(self, preferences, trace=None, count=False):
+        """Cached recommendations for preferences, or None; never calls the LLM.
+
+        count=True counts it as a request (see recommender.popularity), for a
+        caller that follows a miss with recommend(use_cache=False).
+        """
+        prompt_input = to_prompt_input(preferences)
+        with self._tracing("lookup", trace) as trace:
+            return self._hit(prompt_input, trace, count=count)
+
+    def _invoke(self, llm, prompt, trace):
+        if self.structured:
+            _, text = request_structured(llm, prompt, trace=trace)
+            return text
+        response = llm.invoke(prompt)
+        trace.add_usage(response)
+        if not isinstance(response.content, str):
+            raise ValueError("The AI returned an unexpected response format.")
+        return response.content
+
+    def _backfill(self, prompt_input, result, llm, trace):
+        """result with the slots the validator emptied refilled by one short request to llm, if there are any."""
+        missing = {section: self.pool - len(result.section(section)) for section in requested_sections(prompt_input)
+                   if len(result.section(section)) < self.pool}
+        if not result.rejected or not missing:
+            return result
+        count = max(missing.values())
+        template = self._backfill_templates.get(count)
+        if template is None:
+            template = self._backfill_templates[count] = prompts.PromptBuilder(self.structured, self.compact,
+                                                                                count=count)
+        offered = [item for section in missing for item in result.section(section)] + [
+            item for item, _ in result.rejected]
+        exclude = [item.label for item in offered]
+        type = next(iter(missing)) if len(missing) == 1 else "Both"
+        with trace.span("backfill"):
+            prompt = template.invoke({**prompt_input, "type": type, "exclude": prompts.exclusions(exclude)})
+            extra = self._invoke(llm, prompt, trace)
+        if self.structured:
+            text = merge_structured(result.raw, extra)
+        elif type != "Both":
+            # A one-section reply may leave out its header, and the parser would file it under the last one seen
+            text = f"{result.raw}\n\n### {type}\n{extra}"
+        else:
+            text = f"{result.raw}\n\n{extra}"
+        merged = self._parse(prompt_input, text, trace)
+        trace.attributes["backfilled"] = sum(len(merged.section(section)) - len(result.section(section))
+                                             for section in missing)
+        return merged
+
+    def _problem(self, prompt_input, result):
+        """Why a lower tier's answer should be escalated, or None if it is good enough."""
+        for section in requested_sections(prompt_input):
+            found = len(result.section(section))
+            if found < self.limit:
+                return f"{found} {section.lower()} instead of {self.limit}"
+        return None
+
+    def _generate(self, prompt_input, prompt, trace, start=0, on_attempt=None):
+        """Answer from the first tier, from start on, that succeeds and validates.
+
+        The last tier's answer is returned even if it falls short; its errors
+        propagate. on_attempt(name, llm) performs the call instead of invoke(),
+        e.g. to stream it, and returns the raw text.
+        """
+        tiers = self._tiers()[start:]
+        for position, (name, llm) in enumerate(tiers):
+            last = position == len(tiers) - 1
+            tokens = trace.tokens["total_tokens"]
+            started = time.perf_counter()
+            try:
+                with trace.span("llm"), trace.span(f"llm.{name}") if self.tiers else nullcontext():
+                    text = on_attempt(name, llm) if on_attempt else self._invoke(llm, prompt, trace)
+                result = self._parse(prompt_input, text, trace)
+            except Exception as e:
+                tier_stats.record(name, time.perf_counter() - started, trace.tokens["total_tokens"] - tokens, "error")
+                if last:
+                    raise
+                logger.warning("%s tier failed, trying the next one: %r", name, e)
+                on_attempt = None
+                continue
+            if result.rejected:
+                trace.attributes["rejected"] = len(result.rejected)
+                try:
+                    result = self._backfill(prompt_input, result, llm, trace)
+                except Exception as e:
+                    logger.warning("backfill from the %s tier failed: %r", name, e)
+            problem = None if last else self._problem(prompt_input, result)
+            tier_stats.record(name, time.perf_counter() - started, trace.tokens["total_tokens"] - tokens,
+                              "invalid" if problem else "ok")
+            if problem is None:
+                result.tier = trace.attributes["tier"] = name
+                return result
+            logger.info("escalating from the %s tier: %s", name, problem)
+            on_attempt = None
+
+    def recommend(self, preferences, trace=None, use_cache=True):
+        """Blocking call: cached answer if there is one, otherwise the cheapest tier that validates.
+
+        use_cache=False skips the cache read, for a caller whose lookup() just
+        missed; the answer is still cached.
+        """
+        prompt_input = to_prompt_input(preferences)
+        with self._tracing("recommend", trace) as trace:
+            result = self._local(prompt_input, trace)
+            if result is not None:
+                return result
+            if use_cache:
+                result = self._hit(prompt_input, trace)
+                if result is not None:
+                    return result
+            else:
+                trace.attributes["cache"] = "miss"
+
+            with trace.span("prompt"):
+                prompt = self._prompt(prompt_input)
+            try:
+                result = self._generate(prompt_input, prompt, trace)
+            except CircuitOpenError:
+                result = self._fallback(prompt_input, trace)
+                if result is None:
+                    raise
+                return result
+            self._record(prompt_input, result.raw, trace.spans.get("llm"))
+            self._store(prompt_input, result.raw)
+            return result
+
+    def explain(self, preferences, item, trace=None):
+        """Why item (from a compact answer) suits preferences, in a sentence or two; cheapest tier, memoized."""
+        prompt_input = to_prompt_input(preferences)
+        key = (preference_key(prompt_input), item.section, item.title)
+        with self._explanations_lock:
+            text = self._explanations.get(key)
+            if text is not None:
+                self._explanations.move_to_end(key)
+                return text
+        with self._tracing("explain", trace) as trace:
+            with trace.span("prompt"):
+                if self._explanation_template is None:
+                    self._explanation_template = prompts.explanation_template()
+                prompt = self._explanation_template.invoke(
+                    {**prompt_input, "kind": "movie" if item.section == "Movies" else "series", "title": item.label})
+            with trace.span("llm"):
+                response = self._tiers()[0][1].invoke(prompt)
+            trace.add_usage(response)
+        text = " ".join(str(response.content).split())
+        with self._explanations_lock:
+            self._explanations[key] = text
+            while len(self._explanations) > self.max_explanations:
+                self._explanations.popitem(last=False)
+        return text
+
+    def refine(self, preferences, trace=None):
+        """Regenerate with the strongest tier, bypassing the cache, and cache that answer instead."""
+        return self._regenerate("refine", preferences, trace, start=len(self._tiers()) - 1)
+
+    def refresh(self, preferences, trace=None):
+        """Regenerate like a cache miss would and replace the cached answer (see recommender.popularity)."""
+        return self._regenerate("refresh", preferences, trace, start=0)
+
+    def prefetch(self, preferences, trace=None):
+        """Generate and cache an answer nobody has asked for yet (recommender.prefetch); not counted as a request."""
+        return self._regenerate("prefetch", preferences, trace, start=0)
+
+    def more(self, preferences, exclude, trace=None):
+        """A fresh pool for preferences without the titles in exclude; not cached, since it depends on them."""
+        prompt_input = to_prompt_input(preferences)
+        with self._tracing("more", trace) as trace:
+            with trace.span("prompt"):
+                prompt = self._prompt({**prompt_input, "exclude": prompts.exclusions(exclude)})
+            return self._generate(prompt_input, prompt, trace)
+
+    def _regenerate(self, kind, preferences, trace, start):
+        prompt_input = to_prompt_input(preferences)
+        with self._tracing(kind, trace) as trace:
+            with trace.span("prompt"):
+                prompt = self._prompt(prompt_input)
+            result = self._generate(prompt_input, prompt, trace, start=start)
+            self._record(prompt_input, result.raw, trace.spans.get("llm"))
+            self._store(prompt_input, result.raw)
+            return result
+
+    def stream(self, preferences, on_item, trace=None):
+        """Like recommend(), but calls on_item(recommendation) as each item completes.
+
+        Only the first tier streams. If its answer is escalated, the returned
+        result differs from the items already emitted and should replace them.
+        Only the first limit items per section are emitted; the result holds
+        the whole pool.
+        """
+        prompt_input = to_prompt_input(preferences)
+        with self._tracing("stream", trace) as trace:
+            if self.structured or self._local(prompt_input, trace) is not None:
+                # JSON cannot be rendered until it validates and catalog answers are
+                # instant, so there is nothing to stream
+                result = self.recommend(preferences, trace)
+            else:
+                result = self._hit(prompt_input, trace)
+                if result is None:
+                    return self._stream(prompt_input, on_item, trace)
+            for section in requested_sections(prompt_input):
+                for item in result.section(section)[:self.limit]:
+                    on_item(item)
+            return result
+
+    def _stream(self, prompt_input, on_item, trace):
+        counts = {section: 0 for section in requested_sections(prompt_input)}
+        # The same checks _parse_sections applies once the answer is complete, so nothing emitted is dropped later
+        check = self.validator.checker(prompt_input) if self.validator is not None else None
+
+        def emit(item):
+            if item.section not in counts or (check is not None and check(item) is not None):
+                return
+            if counts[item.section] < self.limit:
+                counts[item.section] += 1
+                on_item(item)
+
+        def stream_first_tier(name, llm):
+            # Incremental parsing and the caller's on_item run inside the llm span
+            return stream_recommendations(llm, prompt, emit, default_section, trace)
+
+        default_section = "Series" if prompt_input["type"] == "Series" else "Movies"
+        with trace.span("prompt"):
+            prompt = self._prompt(prompt_input)
+        try:
+            result = self._generate(prompt_input, prompt, trace, on_attempt=stream_first_tier)
+        except CircuitOpenError:
+            result = self._fallback(prompt_input, trace)
+            if result is None:
+                raise
+            if not any(counts.values()):
+                for section in requested_sections(prompt_input):
+                    for item in result.section(section)[:self.limit]:
+                        on_item(item)
+            return result
+        self._record(prompt_input, result.raw, trace.spans.get("llm"))
+        self._store(prompt_input, result.raw)
+        return result
+
+    def fan_out(self, preferences, on_section, timeout=60.0, trace=None):
+        """Fetch each requested section with its own concurrent call.
+
+        on_section(section, items, error) fires as each branch completes; branches
+        are cached under the single-type preferences so they are shared with
+        Movies-only and Series-only requests.
+        """
+        prompt_input = to_prompt_input(preferences)
+        with self._tracing("fan_out", trace) as trace:
+            local = self._local(prompt_input, trace)
+            if local is not None:
+                for section in requested_sections(prompt_input):
+                    on_section(section, local.section(section), None)
+                return
+            missing = []
+            for section in requested_sections(prompt_input):
+                branch_input = {**prompt_input, "type": section}
+                result = self._hit(branch_input, trace)
+                if result is None:
+                    missing.append(section)
+                else:
+                    on_section(section, result.section(section), None)
+
+            def on_branch(section, text, error):
+                if error is not None:
+                    on_section(section, [], error)
+                    return
+                branch_input = {**prompt_input, "type": section}
+                self._record(branch_input, text)
+                self._store(branch_input, text)
+                on_section(section, self._parse(branch_input, text, trace).section(section), None)
+
+            if missing:
+                trace.attributes["cache"] = "miss"
+                # Branch prompts are formatted inside the branches, so "llm" covers them
+                with trace.span("llm"):
+                    fan_out(self.llm, SimpleNamespace(invoke=self._prompt), prompt_input, on_branch, missing,
+                            timeout, trace)
+
+
+def recommend(preferences, **options):
+    """One-off convenience wrapper: Recommender(**options).recommend(preferences)."""
+    return Recommender(**options).recommend(preferences)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+
+class DictTemplate:
+    """Stand-in for ChatPromptTemplate: the "prompt" is just the filled-in preferences."""
+
+    @staticmethod
+    def invoke(prompt_input):
+        return dict(prompt_input)
+
+
+def _text(prompt):
+    return prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+
+
+def prompt_type(prompt):
+    """The requested type of a DictTemplate prompt or a rendered chat prompt."""
+    if isinstance(prompt, dict):
+        return prompt["type"]
+    text = _text(prompt)
+    match = re.search(r"For the user's preferences, recommend ([^\n]+)", text)
+    movies = match is not None and re.search(r"\d+ movies", match.group(1)) is not None
+    series = match is not None and re.search(r"\d+ series", match.group(1)) is not None
+    if movies == series:
+        return "Both"
+    return "Movies" if movies else "Series"
+
+
+def canned_reply(prompt):
+    """Markdown answer with as many bullets per requested section as the prompt asks for (5 by default).
+
+    Titles are numbered "Movies 0", "Movies 1", ...; numbering continues after
+    the titles a prompt excludes, so refills of a pool get new ones.
+    """
+    type = prompt_type(prompt)
+    sections = ["Movies", "Series"] if type == "Both" else [type]
+    text = "" if isinstance(prompt, dict) else _text(prompt)
+    match = re.search(r"recommend (\d+) (?:movies|series)", text)
+    count = int(match.group(1)) if match else 5
+    replies = []
+    for s in sections:
+        start = len(re.findall(rf"^- {s} \d+", text, re.MULTILINE))
+        replies.append(f"### {s}\n" + "\n".join(f"- **{s} {i}** - why" for i in range(start, start + count)))
+    return "\n\n".join(replies)
+
+
+class FakeMessage:
+    """Stand-in for the langchain message/chunk objects: .content and optional .usage_metadata."""
+
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+def fake_usage(prompt, reply):
+    """Rough usage_metadata, counting whitespace-separated words as tokens."""
+    text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+    input_tokens, output_tokens = len(text.split()), len(reply.split())
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens}
+
+
+class FakeStreamingLLM:
+    """Offline LLM that replays canned chunks, optionally with a delay between them."""
+
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = list(chunks)
+        self.delay = delay
+        self.calls = 0
+
+    def stream(self, prompt):
+        self.calls += 1
+        for chunk in self.chunks:
+            if self.delay:
+                time.sleep(self.delay)
+            yield FakeMessage(chunk)
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay * len(self.chunks))
+        return FakeMessage("".join(self.chunks))
+
+
+def flaky(rate, error=ConnectionError, seed=0):
+    """error callable for FakeLatencyLLM that fails a random fraction rate of calls."""
+    rng = random.Random(seed)
+    return lambda prompt: error("injected failure") if rng.random() < rate else None
+
+
+class FakeLatencyLLM:
+    """Offline LLM whose reply, latency and failures may all depend on the prompt.
+
+    reply and latency are either constants or callables taking the prompt;
+    error is None, an exception, or a callable returning either, raised after
+    the latency has elapsed.
+    """
+
+    def __init__(self, reply=canned_reply, latency=0.0, error=None):
+        self.reply = reply
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _resolve(self, value, prompt):
+        return value(prompt) if callable(value) else value
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def _fail(self, prompt):
+        error = self._resolve(self.error, prompt)
+        if error is not None:
+            raise error
+
+    def invoke(self, prompt):
+        self._count()
+        time.sleep(self._resolve(self.latency, prompt))
+        self._fail(prompt)
+        reply = self._resolve(self.reply, prompt)
+        return FakeMessage(reply, fake_usage(prompt, reply))
+
+    async def ainvoke(self, prompt):
+        self._count()
+        await asyncio.sleep(self._resolve(self.latency, prompt))
+        self._fail(prompt)
+        reply = self._resolve(self.reply, prompt)
+        return FakeMessage(reply, fake_usage(prompt, reply))
+
+    def stream(self, prompt):
+        self._count()
+        reply = self._resolve(self.reply, prompt)
+        words = reply.split(" ")
+        delay = self._resolve(self.latency, prompt) / max(len(words), 1)
+        for i, word in enumerate(words):
+            time.sleep(delay)
+            if i == 0:
+                self._fail(prompt)
+            yield FakeMessage(word if i == 0 else " " + word)
+        # Like the real streaming clients, usage arrives on a final empty chunk
+        yield FakeMessage("", fake_usage(prompt, reply))
+
+
+def prompt_text(prompt):
+    """Lookup key for a prompt: the rendered chat text, or the DictTemplate dict as JSON."""
+    if isinstance(prompt, dict):
+        return json.dumps(prompt, sort_keys=True)
+    return prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+
+
+class ReplayLLM:
+    """Offline LLM that answers each prompt with its recorded response (see recommender.recording).
+
+    Recorded latencies are multiplied by scale (0 replays as fast as possible).
+    Prompts that were never recorded get canned_reply and are counted in misses.
+    """
+
+    def __init__(self, responses, scale=1.0):
+        self.responses = responses
+        self.scale = scale
+        self.calls = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records, template, scale=1.0):
+        responses = {}
+        for record in records:
+            prompt = template.invoke(record["prompt_input"])
+            responses[prompt_text(prompt)] = (record["response"], record.get("latency") or 0.0)
+        return cls(responses, scale)
+
+    def _answer(self, prompt):
+        with self._lock:
+            self.calls += 1
+            answer = self.responses.get(prompt_text(prompt))
+            if answer is None:
+                self.misses += 1
+        return answer or (canned_reply(prompt), 0.0)
+
+    def invoke(self, prompt):
+        response, latency = self._answer(prompt)
+        time.sleep(latency * self.scale)
+        return FakeMessage(response, fake_usage(prompt, response))
+
+    async def ainvoke(self, prompt):
+        response, latency = self._answer(prompt)
+        await asyncio.sleep(latency * self.scale)
+        return FakeMessage(response, fake_usage(prompt, response))
+
+    def stream(self, prompt):
+        response, latency = self._answer(prompt)
+        lines = response.splitlines(keepends=True) or [""]
+        for line in lines:
+            time.sleep(latency * self.scale / len(lines))
+            yield FakeMessage(line)
+        yield FakeMessage("", fake_usage(prompt, response))
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import time
+
+from .parser import SECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+async def _branch(llm, template, prompt_input, section, timeout, trace):
+    prompt = template.invoke({**prompt_input, "type": section})
+    try:
+        response = await asyncio.wait_for(llm.ainvoke(prompt), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"{section} branch exceeded {timeout}s") from None
+    if trace is not None:
+        trace.add_usage(response)
+    return response.content
+
+
+async def fan_out_async(llm, template, prompt_input, on_section, sections=SECTIONS, timeout=60.0, trace=None):
+    """Run one sub-prompt per section concurrently and report each as soon as it finishes.
+
+    on_section(section, text, error) is called in completion order on the calling
+    thread; a branch that fails or exceeds timeout reports its exception as error
+    without affecting the others. Branches still running when the caller is
+    cancelled are cancelled too. Token usage of every branch is added to trace.
+    """
+    started = time.perf_counter()
+    tasks = {
+        asyncio.ensure_future(_branch(llm, template, prompt_input, section, timeout, trace)): section
+        for section in sections
+    }
+    results = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                section = tasks[task]
+                error = task.exception()
+                text = None if error else task.result()
+                if error:
+                    logger.warning("%s branch failed after %.3fs: %r", section, time.perf_counter() - started, error)
+                else:
+                    logger.info("%s branch finished in %.3fs", section, time.perf_counter() - started)
+                    results[section] = text
+                on_section(section, text, error)
+    finally:
+        for task in pending:
+            task.cancel()
+    return results
+
+
+def fan_out(llm, template, prompt_input, on_section, sections=SECTIONS, timeout=60.0, trace=None):
+    """Blocking wrapper around fan_out_async for Streamlit's script thread."""
+    return asyncio.run(fan_out_async(llm, template, prompt_input, on_section, sections, timeout, trace))
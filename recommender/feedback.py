@@ -0,0 +1,243 @@
+"""Like/dislike/watched feedback, an implicit-feedback ALS model trained on it, and a re-ranker.
+
+    python -m recommender.feedback train [-i .cache/feedback.jsonl] [-o .cache/feedback_model.npz]
+
+FeedbackStore appends one JSON line per click, like recording.RequestRecorder:
+
+    {"ts": 1760000000.0, "user": "...", "item": "Movies/the dark knight", "title": "The Dark Knight (2008)",
+     "event": "like"}
+
+Items are keyed by section and normalized title, so the same film from two
+differently worded answers is one column. Events are summed per user and item
+with EVENT_WEIGHTS; a positive sum is a preference of 1 and a negative one a
+preference of 0, each with confidence 1 + alpha * |sum| (Hu, Koren and
+Volinsky, "Collaborative Filtering for Implicit Feedback Datasets").
+
+train() alternates between user and item factors. The interaction matrix is
+kept in CSR form (indptr, indices, values arrays), and every half-step
+updates all rows at once with a few conjugate-gradient iterations, so the
+cost is O(nnz * factors) per step and no per-row k x k system is built.
+
+FeedbackModel.rerank() orders candidates by user . item; titles the model has
+never seen score 0 and keep their relative order, and titles disliked in the
+current session go last. Users it was not trained on are folded in from the
+ratings of the current session with one small solve.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from .parser import normalize_title
+
+DEFAULT_FEEDBACK_PATH = os.path.join(".cache", "feedback.jsonl")
+DEFAULT_MODEL_PATH = os.path.join(".cache", "feedback_model.npz")
+
+EVENT_WEIGHTS = {"like": 1.0, "watched": 0.5, "dislike": -1.0}
+
+
+def item_key(item):
+    return f"{item.section}/{normalize_title(item.title)}"
+
+
+class FeedbackStore:
+    def __init__(self, path=DEFAULT_FEEDBACK_PATH):
+        self.path = path
+        self.count = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab", buffering=0)
+        self._lock = threading.Lock()
+
+    def record(self, user, item, event):
+        if event not in EVENT_WEIGHTS:
+            raise ValueError(f"event must be one of {', '.join(EVENT_WEIGHTS)}")
+        line = json.dumps({"ts": round(time.time(), 3), "user": user, "item": item_key(item), "title": item.label,
+                           "event": event}) + "\n"
+        # One write per record keeps lines whole when several processes append
+        with self._lock:
+            self._file.write(line.encode("utf-8"))
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_feedback(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def interactions(records):
+    """(users, items, user_codes, item_codes, strengths) with one entry per user and item; zero sums dropped."""
+    user_codes, item_codes = {}, {}
+    rows, columns, weights = [], [], []
+    for record in records:
+        weight = EVENT_WEIGHTS.get(record.get("event"))
+        if weight is None:
+            continue
+        rows.append(user_codes.setdefault(record["user"], len(user_codes)))
+        columns.append(item_codes.setdefault(record["item"], len(item_codes)))
+        weights.append(weight)
+    rows, columns = np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)
+    pairs, inverse = np.unique(rows * max(len(item_codes), 1) + columns, return_inverse=True)
+    strengths = np.bincount(inverse, weights=weights, minlength=len(pairs))
+    keep = strengths != 0
+    pairs, strengths = pairs[keep], strengths[keep]
+    return (list(user_codes), list(item_codes), pairs // max(len(item_codes), 1),
+            pairs % max(len(item_codes), 1), strengths.astype(np.float32))
+
+
+def _csr(rows, columns, values, n_rows):
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, columns[order], values[order]
+
+
+def _segment_sum(values, indptr, n_rows):
+    """Per-row sums of CSR-ordered values; rows without entries get zeros."""
+    out = np.zeros((n_rows,) + values.shape[1:], dtype=values.dtype)
+    filled = np.flatnonzero(np.diff(indptr))
+    if filled.size:
+        out[filled] = np.add.reduceat(values, indptr[filled], axis=0)
+    return out
+
+
+def _half_step(x, fixed, indptr, indices, strengths, alpha, regularization, cg_steps):
+    """Update every row of x against fixed with cg_steps conjugate-gradient iterations, warm-started from x."""
+    n = x.shape[0]
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    y = fixed[indices]
+    extra = (alpha * np.abs(strengths))[:, None]  # c - 1
+    gram = fixed.T @ fixed + regularization * np.eye(fixed.shape[1], dtype=fixed.dtype)
+
+    def apply(v):
+        # (Y'Y + lambda I + Y' (C_u - I) Y) v_u for every row u at once
+        return v @ gram + _segment_sum(y * (extra * np.einsum("ij,ij->i", y, v[rows])[:, None]), indptr, n)
+
+    b = _segment_sum(y * ((1 + extra) * (strengths > 0)[:, None]), indptr, n)
+    r = b - apply(x)
+    p = r.copy()
+    rs = np.einsum("ij,ij->i", r, r)
+    for _ in range(cg_steps):
+        ap = apply(p)
+        denominator = np.einsum("ij,ij->i", p, ap)
+        step = np.divide(rs, denominator, out=np.zeros_like(rs), where=denominator > 1e-12)
+        x += step[:, None] * p
+        r -= step[:, None] * ap
+        new_rs = np.einsum("ij,ij->i", r, r)
+        p = r + np.divide(new_rs, rs, out=np.zeros_like(rs), where=rs > 1e-12)[:, None] * p
+        rs = new_rs
+    return x
+
+
+def train(records, factors=32, iterations=10, regularization=0.1, alpha=10.0, cg_steps=3, seed=0):
+    """Fit a FeedbackModel to feedback records (dicts with user, item and event)."""
+    users, items, rows, columns, strengths = interactions(records)
+    rng = np.random.default_rng(seed)
+    user_factors = (rng.standard_normal((len(users), factors)) * 0.01).astype(np.float32)
+    item_factors = (rng.standard_normal((len(items), factors)) * 0.01).astype(np.float32)
+    by_user = _csr(rows, columns, strengths, len(users))
+    by_item = _csr(columns, rows, strengths, len(items))
+    for _ in range(iterations):
+        _half_step(user_factors, item_factors, *by_user, alpha, regularization, cg_steps)
+        _half_step(item_factors, user_factors, *by_item, alpha, regularization, cg_steps)
+    return FeedbackModel(users, items, user_factors, item_factors, regularization, alpha)
+
+
+class FeedbackModel:
+    def __init__(self, users, items, user_factors, item_factors, regularization=0.1, alpha=10.0):
+        self.users = {user: row for row, user in enumerate(users)}
+        self.items = {item: row for row, item in enumerate(items)}
+        self.user_factors = np.asarray(user_factors, dtype=np.float32)
+        self.item_factors = np.asarray(item_factors, dtype=np.float32)
+        self.regularization = float(regularization)
+        self.alpha = float(alpha)
+        k = self.item_factors.shape[1]
+        self._gram = self.item_factors.T @ self.item_factors + self.regularization * np.eye(k, dtype=np.float32)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, users=np.array(list(self.users), dtype=str), items=np.array(list(self.items), dtype=str),
+                 user_factors=self.user_factors, item_factors=self.item_factors,
+                 regularization=self.regularization, alpha=self.alpha)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["users"].tolist(), data["items"].tolist(), data["user_factors"], data["item_factors"],
+                       float(data["regularization"]), float(data["alpha"]))
+
+    def fold_in(self, ratings):
+        """A user vector from {item_key: event} against the trained item factors, or None if none are known."""
+        known = [(self.items[key], EVENT_WEIGHTS[event]) for key, event in ratings.items()
+                 if key in self.items and event in EVENT_WEIGHTS]
+        if not known:
+            return None
+        rows, strengths = (np.asarray(values) for values in zip(*known))
+        y = self.item_factors[rows]
+        extra = self.alpha * np.abs(strengths).astype(np.float32)
+        a = self._gram + (y * extra[:, None]).T @ y
+        b = ((1 + extra) * (strengths > 0)) @ y
+        return np.linalg.solve(a, b).astype(np.float32)
+
+    def user_vector(self, user=None, ratings=None):
+        row = self.users.get(user)
+        if row is not None:
+            return self.user_factors[row]
+        return self.fold_in(ratings) if ratings else None
+
+    def rerank(self, items, user=None, ratings=None):
+        """items ordered by predicted preference; unchanged when there is nothing to go on."""
+        vector = self.user_vector(user, ratings)
+        if vector is None or len(items) < 2:
+            return list(items)
+        keys = [item_key(item) for item in items]
+        scores = np.zeros(len(items), dtype=np.float32)
+        known = [(position, self.items[key]) for position, key in enumerate(keys) if key in self.items]
+        if known:
+            positions, rows = zip(*known)
+            scores[list(positions)] = self.item_factors[list(rows)] @ vector
+        if ratings:
+            # An explicit dislike from this session outranks whatever the model predicts
+            scores[[position for position, key in enumerate(keys) if ratings.get(key) == "dislike"]] = -np.inf
+        return [items[i] for i in np.argsort(-scores, kind="stable")]
+
+    def rerank_result(self, result, user=None, ratings=None):
+        """A copy of a Recommendations with each section re-ranked."""
+        return replace(result, movies=self.rerank(result.movies, user, ratings),
+                       series=self.rerank(result.series, user, ratings))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    fit = commands.add_parser("train", help="fit the re-ranking model to the feedback log")
+    fit.add_argument("-i", "--input", default=DEFAULT_FEEDBACK_PATH)
+    fit.add_argument("-o", "--output", default=DEFAULT_MODEL_PATH)
+    fit.add_argument("--factors", type=int, default=32)
+    fit.add_argument("--iterations", type=int, default=10)
+    fit.add_argument("--regularization", type=float, default=0.1)
+    fit.add_argument("--alpha", type=float, default=10.0, help="confidence per unit of feedback")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    model = train(read_feedback(args.input), args.factors, args.iterations, args.regularization, args.alpha)
+    model.save(args.output)
+    print(f"trained on {len(model.users)} users x {len(model.items)} titles into {args.output} "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Resilient front for the LLM: rate limiting, retries, hedged requests and a circuit breaker.
+
+LLMGateway has the invoke/ainvoke/stream surface of the model it wraps, so
+Recommender(llm=LLMGateway(gemini())) needs no other change. Every attempt,
+retries and hedges included, takes a token from the rate limiter and, with a
+semaphore, holds one of its slots while the model works; a hedge is only sent
+if both are free right away.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .llm import gemini
+from .telemetry import percentile
+
+logger = logging.getLogger(__name__)
+
+# Statuses and exception names (google.api_core, httpx, ...) worth another attempt
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_NAMES = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+                   "TooManyRequests", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError"}
+
+
+def is_transient(error):
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in TRANSIENT_STATUSES:
+        return True
+    return any(cls.__name__ in TRANSIENT_NAMES for cls in type(error).__mro__)
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, retry_in):
+        super().__init__(f"The AI service is temporarily unavailable; trying again in {retry_in:.0f}s.")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive transient failures.
+
+    While open every call fails immediately; after reset_timeout one probe call
+    is let through (half-open), and its outcome closes or re-opens the circuit.
+    A probe that ends without an outcome (a stream closed early, a cancelled
+    task) must be handed back with release_probe(), or the circuit stays
+    half-open and rejects everything.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.rejected = 0
+        self._failures = 0
+        self._opened = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpenError, or returns True if this call is the half-open probe."""
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(remaining)
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open":
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(0)
+                self._probing = True
+                return True
+        return False
+
+    def release_probe(self):
+        """Let the next call probe again; a no-op once the probe recorded success or failure."""
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("circuit closed")
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("circuit opened after %d failures", self._failures)
+                self.state = "open"
+                self._opened = time.monotonic()
+                self._probing = False
+
+
+class LLMGateway:
+    """Wraps an LLM with the protections above; all of them are optional.
+
+    llm defaults to gemini(**model_options), created on first use. limiter is a
+    RateLimiter and semaphore a recommender.workers.ProcessSemaphore capping
+    concurrent calls across processes (either may be None). Transient errors are retried up to
+    max_retries times with full-jitter exponential backoff. Once min_samples
+    successful latencies are known, a second copy of a call is sent if the first
+    exceeds the hedge_quantile latency (hedge_after seconds until then, if set),
+    and whichever answers first wins. hedge_quantile=None disables hedging.
+    """
+
+    def __init__(self, llm=None, limiter=None, breaker=None, max_retries=3, base_delay=0.5, max_delay=8.0,
+                 hedge_quantile=0.95, hedge_after=None, min_samples=20, max_workers=8,
+                 model_options=None, semaphore=None):
+        self._llm = llm
+        self.model_options = model_options or {}
+        self.limiter = limiter
+        self.semaphore = semaphore
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_quantile = hedge_quantile
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self._latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-gateway")
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = gemini(**self.model_options)
+        return self._llm
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def hedge_budget(self):
+        if self.hedge_quantile is None:
+            return None
+        if len(self._latencies) >= self.min_samples:
+            return percentile(list(self._latencies), self.hedge_quantile)
+        return self.hedge_after
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _holding(self, slot=None):
+        return self.semaphore.hold(slot) if self.semaphore is not None else nullcontext()
+
+    def _timed(self, call, prompt, slot=None):
+        with self._holding(slot):
+            started = time.perf_counter()
+            response = call(prompt)
+            self._latencies.append(time.perf_counter() - started)
+        return response
+
+    def _acquire(self):
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    def _may_hedge(self):
+        """(send, slot): whether to send a hedge now, and the semaphore slot reserved for it."""
+        if self.limiter is not None and not self.limiter.try_acquire():
+            return False, None
+        if self.semaphore is None:
+            return True, None
+        slot = self.semaphore.try_acquire()
+        return slot is not None, slot
+
+    def _before_call(self):
+        return self.breaker.before_call() if self.breaker is not None else False
+
+    def _release(self, probe):
+        # GeneratorExit and CancelledError are not Exceptions, so they reach only a finally
+        if probe:
+            self.breaker.release_probe()
+
+    def _succeeded(self):
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def _failed(self, error, attempt):
+        """True if the caller should retry after error."""
+        if not is_transient(error):
+            # The service answered; a bad request says nothing about its health
+            self._succeeded()
+            return False
+        if self.breaker is not None:
+            self.breaker.record_failure()
+            if self.breaker.state == "open":
+                return False
+        if attempt >= self.max_retries:
+            return False
+        self._count("retries")
+        logger.info("retrying LLM call after %r (attempt %d)", error, attempt + 1)
+        return True
+
+    def _hedged(self, prompt):
+        budget = self.hedge_budget()
+        if budget is None:
+            return self._timed(self.llm.invoke, prompt)
+        first = self._pool.submit(self._timed, self.llm.invoke, prompt)
+        if wait([first], timeout=budget).done:
+            return first.result()
+        send, slot = self._may_hedge()
+        if not send:
+            return first.result()
+        self._count("hedges")
+        second = self._pool.submit(self._timed, self.llm.invoke, prompt, slot)
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: f.exception() is not None):
+                if future.exception() is None or not pending:
+                    if future is second and future.exception() is None:
+                        self._count("hedge_wins")
+                    # The slower attempt is left to finish in the background
+                    return future.result()
+
+    def invoke(self, prompt):
+        probe = self._before_call()
+        try:
+            self._count("calls")
+            attempt = 0
+            while True:
+                self._acquire()
+                try:
+                    response = self._hedged(prompt)
+                except Exception as e:
+                    if not self._failed(e, attempt):
+                        self._count("failures")
+                        raise
+                    time.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                self._succeeded()
+                return response
+        finally:
+            self._release(probe)
+
+    async def _ahedged(self, prompt):
+        budget = self.hedge_budget()
+        first = asyncio.ensure_future(self._atimed(prompt))
+        if budget is None:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=budget)
+        if done:
+            return await first
+        send, slot = self._may_hedge()
+        if not send:
+            return await first
+        self._count("hedges")
+        second = asyncio.ensure_future(self._atimed(prompt, slot))
+        pending = {first, second}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t.exception() is not None):
+                    if task.exception() is None or not pending:
+                        if task is second and task.exception() is None:
+                            self._count("hedge_wins")
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _atimed(self, prompt, slot=None):
+        if self.semaphore is not None and slot is None:
+            slot = await self.semaphore.aacquire()
+        try:
+            started = time.perf_counter()
+            response = await self.llm.ainvoke(prompt)
+            self._latencies.append(time.perf_counter() - started)
+            return response
+        finally:
+            if slot is not None:
+                self.semaphore.release(slot)
+
+    async def ainvoke(self, prompt):
+        probe = self._before_call()
+        try:
+            self._count("calls")
+            attempt = 0
+            while True:
+                if self.limiter is not None:
+                    while not self.limiter.try_acquire():
+                        await asyncio.sleep(1 / self.limiter.rate)
+                try:
+                    response = await self._ahedged(prompt)
+                except Exception as e:
+                    if not self._failed(e, attempt):
+                        self._count("failures")
+                        raise
+                    await asyncio.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                self._succeeded()
+                return response
+        finally:
+            self._release(probe)
+
+    def stream(self, prompt):
+        """Streams are not hedged, and only retried until the first chunk arrives.
+
+        A semaphore slot is held until the stream ends or is closed.
+        """
+        probe = self._before_call()
+        try:
+            yield from self._stream(prompt)
+        finally:
+            self._release(probe)
+
+    def _stream(self, prompt):
+        self._count("calls")
+        attempt = 0
+        while True:
+            self._acquire()
+            slot = self.semaphore.acquire() if self.semaphore is not None else None
+            try:
+                chunks = iter(self.llm.stream(prompt))
+                first = next(chunks, None)
+            except Exception as e:
+                if slot is not None:
+                    self.semaphore.release(slot)
+                if not self._failed(e, attempt):
+                    self._count("failures")
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            break
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        except Exception as e:
+            self._failed(e, self.max_retries)
+            self._count("failures")
+            raise
+        finally:
+            if slot is not None:
+                self.semaphore.release(slot)
+        self._succeeded()
+
+    def stats(self):
+        budget = self.hedge_budget()
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "hedge_budget": round(budget, 3) if budget is not None else None,
+            "circuit": self.breaker.state if self.breaker is not None else "none",
+            "rejected": self.breaker.rejected if self.breaker is not None else 0,
+        }
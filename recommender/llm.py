@@ -0,0 +1,12 @@
+import os
+
+
+def gemini(model="gemini-2.5-pro", temperature=0.2, api_key=None, timeout=None):
+    """The default backend; any object with invoke/stream/ainvoke can replace it."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        api_key=api_key or os.getenv("GOOGLE_API_KEY"),
+        timeout=timeout,
+    )
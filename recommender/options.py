@@ -0,0 +1,10 @@
+# Choices offered by the main.py sidebar; the precompute grid is built from the same lists
+LANGUAGES = ("Hindi", "English", "Tamil", "Telugu", "Urdu", "French", "German", "Spanish")
+GENRES = ("Horror", "Action", "Thriller", "Comedy", "Romantic", "Sci-Fi", "Family", "Drama", "Adventure",
+          "Animated", "kids")
+TYPES = ("Movies", "Series", "Both")
+FORMULAS = ("Hollywood", "Bollywood", "Tollywood", "Korean", "Turkish", "chinese", "Japenese")
+PLATFORMS = ("YouTube", "Netflix", "Prime Video", "Disney+", "Jio Cinema", "Z5", "Hulu", "HBO Max", "Apple Tv")
+MOODS = ("Happy", "Sad", "Neutral", "Excited", "Relaxed")
+YEAR_MIN, YEAR_MAX = 1980, 2025
+DEFAULT_YEAR_RANGE = (2010, 2023)
@@ -0,0 +1,127 @@
+import re
+from typing import NamedTuple, Optional
+
+# A line that names a section: a markdown heading that starts with it, such as "### Series Recommendations",
+# "### `Series`" or "## 📺 Series", a bold one such as "**Movies:**", or the bare word
+SECTION_HEADER = re.compile(r"^\s*(?:#{1,6}\W*(movies|series)\b.*|\*\*\W*(movies|series)\b[^*\d]*\*\*[\s:]*"
+                            r"|\W*(movies|series)\b[\s:*`]*)$", re.IGNORECASE)
+# Longest line tried as a header: a heading or bold line, and a bare word with its punctuation
+MAX_HEADER = 64
+MAX_BARE_HEADER = 24
+# A list number such as "1. " or "2) "; "- ", "* " and "• " are checked without a regex
+NUMBER_BULLET = re.compile(r"\d{1,3}[.)]\s")
+# "**Title (2016)** - explanation" or "Title: explanation"
+BOLD_TITLE = re.compile(r"^\*\*(.+?)\*\*[\s:.\-–—]*(.*)$", re.DOTALL)
+PLAIN_TITLE = re.compile(r"^(.+?)(?:\s*[:–—]\s+|\s+-\s+)(.*)$", re.DOTALL)
+
+SECTIONS = ("Movies", "Series")
+
+# "(2016)", or a series run such as "(2017-2020)" or "(2019–)"
+TRAILING_YEAR = re.compile(r"\s*\(((?:19|20)\d{2})(?:\s*[-–]\s*((?:19|20)\d{2})?)?\)\s*$")
+
+
+class Recommendation(NamedTuple):
+    section: str
+    title: str
+    explanation: str
+    text: str
+    year: Optional[int] = None
+    platform: Optional[str] = None
+
+    @property
+    def label(self):
+        """The title with its year, as shown to users and in prompts: "Dark (2017)"."""
+        return f"{self.title} ({self.year})" if self.year else self.title
+
+
+def normalize_title(title):
+    """Comparison key for a title: ignores a trailing "(2016)" or "(2017-2020)", case, punctuation and spacing."""
+    title = TRAILING_YEAR.sub("", title)
+    return " ".join(re.sub(r"[^\w\s]", " ", title.casefold()).split())
+
+
+def title_years(title):
+    """(first, last) year from a trailing "(2016)" or "(2017-2020)"; last is None for a series still running."""
+    match = TRAILING_YEAR.search(title)
+    if match is None:
+        return None
+    first = int(match.group(1))
+    if match.group(2):
+        return first, int(match.group(2))
+    return (first, None) if "-" in match.group(0) or "–" in match.group(0) else (first, first)
+
+
+def split_title(text):
+    match = BOLD_TITLE.match(text) or PLAIN_TITLE.match(text)
+    if match:
+        return match.group(1).strip(), match.group(2).strip()
+    return text.strip(), ""
+
+
+class ResponseParser:
+    """Single-pass, line-oriented state machine over the model's markdown answer.
+
+    Text can be fed in arbitrary chunks; an item is emitted once the next
+    bullet, a blank line or a section header arrives, or on close(). A
+    bullet or list number starts an item, however far it is indented, unless
+    it is indented deeper than the open item's: that is a sub-bullet, and
+    continues it.
+    """
+
+    def __init__(self, default_section="Movies"):
+        self.section = default_section
+        self._buffer = ""
+        self._item = None
+        self._indent = 0
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        if "\n" not in chunk:
+            return []
+        *lines, self._buffer = self._buffer.split("\n")
+        items = []
+        for line in lines:
+            self._line(line, items)
+        return items
+
+    def close(self):
+        items = []
+        if self._buffer:
+            self._line(self._buffer, items)
+            self._buffer = ""
+        self._flush(items)
+        return items
+
+    def _flush(self, items):
+        if self._item is not None:
+            text = " ".join(self._item)
+            self._item = None
+            items.append(Recommendation(self.section, *split_title(text), text))
+
+    def _line(self, line, items):
+        stripped = line.strip()
+        if not stripped:
+            self._flush(items)
+            return
+        first = stripped[0]
+        if ((first in "-*•" and stripped[1:2].isspace() or first.isdigit() and NUMBER_BULLET.match(stripped))
+                and (self._item is None or len(line) - len(line.lstrip()) <= self._indent)):
+            self._flush(items)
+            self._item = [stripped.split(None, 1)[1]]
+            self._indent = len(line) - len(line.lstrip())
+        elif (len(stripped) <= (MAX_HEADER if first in "#*" else MAX_BARE_HEADER)
+              and SECTION_HEADER.match(stripped)):
+            self._flush(items)
+            header = SECTION_HEADER.match(stripped)
+            self.section = header.group(header.lastindex).capitalize()
+        elif self._item is not None:
+            self._item.append(stripped)
+
+
+def parse_response(text, default_section="Movies"):
+    """Parse a complete answer into {"Movies": [...], "Series": [...]}."""
+    parser = ResponseParser(default_section)
+    sections = {section: [] for section in SECTIONS}
+    for item in parser.feed(text) + parser.close():
+        sections[item.section].append(item)
+    return sections
@@ -0,0 +1,63 @@
+"""Paging through one over-generated answer, so "Show more" needs no LLM call.
+
+A Recommender with pool=N asks for N items per section in a single call.
+RecommendationPool keeps them in rank order and hands them out a page (the
+recommender's limit) at a time; next_page() is instant until the pool runs
+low, and only then does the caller ask Recommender.more() for a new pool,
+passing titles() so the model avoids everything already offered. Titles are
+compared with normalize_title, so a refill never repeats one, whatever its
+spelling or year suffix.
+"""
+from .engine import Recommendations, requested_sections
+from .parser import normalize_title
+
+
+class RecommendationPool:
+    def __init__(self, type, result, page_size=5):
+        self.sections = requested_sections({"type": type})
+        self.page_size = page_size
+        self.items = {section: [] for section in self.sections}
+        self.shown = {section: 0 for section in self.sections}
+        self.pages = 0
+        self.refills = 0
+        self._known = set()
+        self.extend(result)
+
+    def extend(self, result):
+        """Add a (refill) answer's items behind the ones already held, skipping titles seen before."""
+        added = 0
+        for section in self.sections:
+            for item in result.section(section):
+                key = normalize_title(item.title)
+                if key and key not in self._known:
+                    self._known.add(key)
+                    self.items[section].append(item)
+                    added += 1
+        return added
+
+    def remaining(self, section):
+        return len(self.items[section]) - self.shown[section]
+
+    def needs_refill(self):
+        """True when some section cannot fill another whole page."""
+        return any(self.remaining(section) < self.page_size for section in self.sections)
+
+    def next_page(self):
+        """The next page_size unseen items per section, marked as seen; fewer if the pool is running dry."""
+        page = Recommendations(source="pool")
+        for section in self.sections:
+            start = self.shown[section]
+            page.section(section).extend(self.items[section][start:start + self.page_size])
+            self.shown[section] = start + len(page.section(section))
+        self.pages += 1
+        return page
+
+    def titles(self):
+        """Every title the pool holds, seen or not, for Recommender.more()'s exclusion list."""
+        return [item.label for section in self.sections for item in self.items[section]]
+
+    def refill(self, recommender, preferences, trace=None, rank=None):
+        """Top the pool up from Recommender.more(), ordered by rank(result) if given; returns how many items are new."""
+        self.refills += 1
+        result = recommender.more(preferences, self.titles(), trace=trace)
+        return self.extend(rank(result) if rank is not None else result)
@@ -0,0 +1,140 @@
+"""Request popularity shared by every session and process, and a background refresher for hot entries.
+
+PopularityStore keeps an exponentially decayed request count per cache key in
+SQLite (WAL mode, so several app processes can share the file). Refresher
+periodically regenerates the hottest entries whose cached answer is getting old,
+so popular queries are answered from the cache before the TTL can expire.
+Queries below min_score are never refreshed.
+"""
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POPULARITY_PATH = os.path.join(".cache", "popularity.sqlite3")
+
+
+class PopularityStore:
+    def __init__(self, path=DEFAULT_POPULARITY_PATH, half_life=6 * 3600):
+        self.half_life = half_life
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS popularity ("
+            "key TEXT PRIMARY KEY, prompt_input TEXT NOT NULL, requests INTEGER NOT NULL, score REAL NOT NULL, "
+            "last_seen REAL NOT NULL, lease_until REAL NOT NULL DEFAULT 0)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def _decay(self, elapsed):
+        return math.exp(-math.log(2) * elapsed / self.half_life)
+
+    def touch(self, prompt_input):
+        now = time.time()
+        with self._lock:
+            # Take the write lock before reading so concurrent processes cannot lose an update
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT score, last_seen FROM popularity WHERE key = ?",
+                                       (cache_key(prompt_input),)).fetchone()
+                score = 1.0 if row is None else row[0] * self._decay(now - row[1]) + 1.0
+                self._db.execute(
+                    "INSERT INTO popularity (key, prompt_input, requests, score, last_seen) VALUES (?, ?, 1, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET requests = requests + 1, score = excluded.score, "
+                    "last_seen = excluded.last_seen",
+                    (cache_key(prompt_input), json.dumps(prompt_input), score, now),
+                )
+            except BaseException:
+                # Release the write lock, or every later touch() in this process fails inside the open transaction
+                self._db.rollback()
+                raise
+            self._db.commit()
+
+    def hot(self, limit=20, min_score=3.0):
+        """[(prompt_input, score)] of the most requested keys, by score decayed to now."""
+        now = time.time()
+        with self._lock:
+            # Decay only lowers scores, so the stored score is a safe prefilter
+            rows = self._db.execute("SELECT prompt_input, score, last_seen FROM popularity WHERE score >= ?",
+                                    (min_score,)).fetchall()
+        scored = [(json.loads(p), score * self._decay(now - seen)) for p, score, seen in rows]
+        scored = [entry for entry in scored if entry[1] >= min_score]
+        scored.sort(key=lambda entry: entry[1], reverse=True)
+        return scored[:limit]
+
+    def claim(self, prompt_input, lease=300):
+        """True if this process may refresh prompt_input now; other processes skip it until the lease ends."""
+        now = time.time()
+        with self._lock:
+            claimed = self._db.execute("UPDATE popularity SET lease_until = ? WHERE key = ? AND lease_until < ?",
+                                       (now + lease, cache_key(prompt_input), now)).rowcount
+            self._db.commit()
+        return claimed == 1
+
+
+class Refresher:
+    """Daemon thread regenerating hot entries once their cached answer is refresh_after * ttl old.
+
+    At most budget entries are refreshed per interval, hottest first.
+    """
+
+    def __init__(self, recommender, popularity, ttl, interval=60.0, refresh_after=0.8, budget=5, min_score=3.0):
+        self.recommender = recommender
+        self.popularity = popularity
+        self.ttl = ttl
+        self.interval = interval
+        self.refresh_after = refresh_after
+        self.budget = budget
+        self.min_score = min_score
+        self.refreshed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def due(self, prompt_input):
+        age = self.recommender.cache.age(prompt_input)
+        return age is None or age >= self.refresh_after * self.ttl
+
+    def run_once(self):
+        done = 0
+        for prompt_input, score in self.popularity.hot(limit=self.budget * 4, min_score=self.min_score):
+            if done >= self.budget or self._stop.is_set():
+                break
+            if not self.due(prompt_input) or not self.popularity.claim(prompt_input):
+                continue
+            done += 1
+            try:
+                self.recommender.refresh(prompt_input)
+                self.refreshed += 1
+                logger.info("refreshed hot entry (score %.1f): %s", score, prompt_input)
+            except Exception as e:
+                self.failed += 1
+                logger.warning("refresh failed for %s: %r", prompt_input, e)
+        return done
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("refresh cycle failed")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cache-refresher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
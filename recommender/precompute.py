@@ -0,0 +1,195 @@
+"""Warm recommendations for the sidebar's preference grid ahead of time.
+
+    python -m recommender.precompute --sample 500 --workers 4 --rate 2
+    python -m recommender.precompute --traffic requests.jsonl --sample 200
+
+Answers are written to a compact SQLite store (zlib-compressed raw responses
+keyed like the cache) that the UI consults before calling the LLM. Every answer
+is committed as soon as it arrives, so an interrupted run resumes where it left
+off: keys already in the store are skipped.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import options
+from .cache import cache_key, output_namespace, preference_key
+from .engine import Recommender, to_prompt_input
+from .ratelimit import RateLimiter
+from .tiers import DEFAULT_CONFIG_PATH, clients, load_tiers
+from .validate import ResponseValidator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join(".cache", "precomputed.sqlite3")
+
+
+class PrecomputedStore:
+    """Read-mostly SQLite table of precomputed raw responses."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, namespace=""):
+        self.namespace = namespace
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS precomputed (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                         "created REAL NOT NULL)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def __contains__(self, prompt_input):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM precomputed WHERE key = ?",
+                                    (cache_key(prompt_input, self.namespace),)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM precomputed").fetchone()[0]
+
+    def get(self, prompt_input):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM precomputed WHERE key = ?",
+                                   (cache_key(prompt_input, self.namespace),)).fetchone()
+        return None if row is None else zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, prompt_input, text):
+        value = zlib.compress(text.encode("utf-8"), 9)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO precomputed (key, value, created) VALUES (?, ?, ?)",
+                             (cache_key(prompt_input, self.namespace), value, time.time()))
+            self._db.commit()
+
+
+def grid_size(year_ranges):
+    return (len(options.LANGUAGES) * len(options.GENRES) * len(options.TYPES) * len(options.FORMULAS)
+            * len(options.PLATFORMS) * len(options.MOODS) * len(year_ranges))
+
+
+def grid(year_ranges):
+    """Every sidebar combination with one genre and one platform selected."""
+    for lang, genre, type, formula, platform, mood, year_range in itertools.product(
+            options.LANGUAGES, options.GENRES, options.TYPES, options.FORMULAS, options.PLATFORMS,
+            options.MOODS, year_ranges):
+        yield {"lang": lang, "genre": [genre], "type": type, "formula": formula, "platform": [platform],
+               "mood": mood, "year_range": year_range}
+
+
+def sample_grid(year_ranges, n, seed=0):
+    """n distinct grid points chosen uniformly without materializing the grid."""
+    dimensions = (options.LANGUAGES, options.GENRES, options.TYPES, options.FORMULAS, options.PLATFORMS,
+                  options.MOODS, year_ranges)
+    rng = random.Random(seed)
+    for index in rng.sample(range(grid_size(year_ranges)), min(n, grid_size(year_ranges))):
+        values = []
+        for dimension in reversed(dimensions):
+            index, i = divmod(index, len(dimension))
+            values.append(dimension[i])
+        year_range, mood, platform, formula, type, genre, lang = values
+        yield {"lang": lang, "genre": [genre], "type": type, "formula": formula, "platform": [platform],
+               "mood": mood, "year_range": year_range}
+
+
+def from_traffic(path, n):
+    """The n most frequent preference sets in a JSONL log of preference dicts."""
+    counts = Counter()
+    first_seen = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            preferences = record.get("prompt_input", record)
+            key = preference_key(to_prompt_input(preferences))
+            counts[key] += 1
+            first_seen.setdefault(key, preferences)
+    return [first_seen[key] for key, _ in counts.most_common(n)]
+
+
+def precompute(recommender, store, preferences, workers=4, rate=1.0):
+    """Fill store with answers for preferences, skipping ones it already has.
+
+    Returns (done, skipped, failed) counts.
+    """
+    limiter = RateLimiter(rate, burst=workers)
+    todo = [p for p in preferences if to_prompt_input(p) not in store]
+    skipped = len(preferences) - len(todo)
+    logger.info("%d to compute, %d already in the store", len(todo), skipped)
+
+    def work(p):
+        limiter.acquire()
+        return recommender.recommend(p).raw
+
+    done = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(work, p): p for p in todo}
+        for future in as_completed(futures):
+            try:
+                store.put(to_prompt_input(futures[future]), future.result())
+                done += 1
+            except Exception as e:
+                failed += 1
+                logger.warning("precompute failed for %s: %s", futures[future], e)
+            if (done + failed) % 50 == 0:
+                logger.info("%d/%d done, %d failed", done, len(todo), failed)
+    return done, skipped, failed
+
+
+def _year_ranges(text):
+    ranges = []
+    for part in text.split(","):
+        start, end = part.split("-")
+        ranges.append((int(start), int(end)))
+    return ranges
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=os.getenv("RECOMMENDER_PRECOMPUTED_PATH", DEFAULT_STORE_PATH))
+    parser.add_argument("--sample", type=int, help="number of preference sets (default: the whole grid)")
+    parser.add_argument("--traffic", help="JSONL log of preference dicts; the most frequent are computed first")
+    parser.add_argument("--year-ranges", type=_year_ranges, default=[options.DEFAULT_YEAR_RANGE],
+                        help="comma separated, e.g. 2010-2023,2000-2010")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="LLM calls per second across all workers")
+    parser.add_argument("--structured", action="store_true", help="store JSON answers for structured mode")
+    parser.add_argument("--compact", action="store_true", help="store titles-only answers for compact mode")
+    parser.add_argument("--pool", type=int, help="store answers with this many items per section for pool mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", default=os.getenv("RECOMMENDER_CONFIG_PATH", DEFAULT_CONFIG_PATH),
+                        help="config.toml with the model tiers")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.traffic:
+        preferences = from_traffic(args.traffic, args.sample or 1000)
+    elif args.sample:
+        preferences = list(sample_grid(args.year_ranges, args.sample, args.seed))
+    else:
+        preferences = list(grid(args.year_ranges))
+
+    store = PrecomputedStore(args.store, namespace=output_namespace(args.structured, args.compact, args.pool))
+    # The same tiers and validation as the UI, so stored answers are escalated and backfilled like live ones
+    recommender = Recommender(tiers=clients(load_tiers(args.config), rate_limit=args.rate),
+                              structured=args.structured, compact=args.compact, pool=args.pool,
+                              validator=ResponseValidator())
+    started = time.perf_counter()
+    done, skipped, failed = precompute(recommender, store, preferences, args.workers, args.rate)
+    logger.info("computed %d, skipped %d, failed %d in %.1fs; store now holds %d entries",
+                done, skipped, failed, time.perf_counter() - started, len(store))
+
+
+if __name__ == "__main__":
+    main()
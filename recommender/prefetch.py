@@ -0,0 +1,197 @@
+"""Speculative recommendations for preferences the user has not submitted yet.
+
+While a user edits the sidebar, schedule() is called on every rerun with the
+current preferences. Once they have been left unchanged for debounce seconds,
+the answer is generated in the background and cached, so that the submit
+which usually follows right away is a cache hit, or waits only for the rest
+of a call that is already under way (adopt()).
+
+A newer schedule() for the same session supersedes a prefetch that has not
+reached the model yet (still debouncing or queued for a worker); prefetches
+of the same preferences are shared by all sessions; and each session may
+spend at most max_per_session LLM calls on prefetching.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import preference_key
+from .engine import to_prompt_input
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    def __init__(self, session, key):
+        self.session = session
+        self.key = key
+        self.future = None
+        self.started = None
+        self.finished = None
+        self.cached = False
+        self.adopted = False
+
+
+class _Session:
+    def __init__(self):
+        self.key = None
+        self.timer = None
+        self.job = None
+        self.spent = 0
+
+
+class Prefetcher:
+    def __init__(self, recommender, debounce=1.0, max_per_session=5, max_workers=4, max_sessions=10000,
+                 max_jobs=256):
+        self.recommender = recommender
+        self.debounce = debounce
+        self.max_per_session = max_per_session
+        self.max_sessions = max_sessions
+        self.max_jobs = max_jobs
+        self.counts = {"scheduled": 0, "superseded": 0, "cancelled": 0, "deduplicated": 0, "capped": 0, "started": 0,
+                       "already_cached": 0, "failed": 0, "adopted_ready": 0, "adopted_in_flight": 0, "missed": 0}
+        self.saved_seconds = 0.0
+        self._sessions = OrderedDict()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+            while len(self._sessions) > self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                if oldest.timer is not None:
+                    oldest.timer.cancel()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def schedule(self, session_id, preferences):
+        """Prefetch preferences for session_id once they are debounce seconds old, unless superseded."""
+        key = preference_key(to_prompt_input(preferences))
+        with self._lock:
+            session = self._session(session_id)
+            if session.key == key:
+                return
+            if session.timer is not None:
+                # Still waiting out the debounce interval; a timer that is firing right now sees the new key
+                session.timer.cancel()
+                self.counts["superseded"] += 1
+            if session.job is not None:
+                self._cancel(session.job)
+            session.key = key
+            session.timer = None
+            if session.spent >= self.max_per_session:
+                self.counts["capped"] += 1
+                return
+            self.counts["scheduled"] += 1
+            session.timer = threading.Timer(self.debounce, self._fire, (session, key, preferences))
+            session.timer.daemon = True
+            session.timer.start()
+
+    def _fire(self, session, key, preferences):
+        with self._lock:
+            if session.key != key or session.timer is not threading.current_thread():
+                return
+            session.timer = None
+            job = self._jobs.get(key)
+            # exception() raises CancelledError for a cancelled future, so check that first
+            if job is not None and not job.future.cancelled() and (not job.future.done()
+                                                                   or job.future.exception() is None):
+                self.counts["deduplicated"] += 1
+                return
+            if session.spent >= self.max_per_session:
+                self.counts["capped"] += 1
+                return
+            session.spent += 1
+            self.counts["started"] += 1
+            job = session.job = self._jobs[key] = _Job(session, key)
+            self._jobs.move_to_end(key)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            job.future = self._pool.submit(self._run, session, job, preferences)
+
+    def _cancel(self, job):
+        """Cancel job if it has not reached a worker yet; True if this call cancelled it. Hold _lock."""
+        # cancel() is True again for a future that is already cancelled, which must not be refunded twice
+        if job.future.cancelled() or not job.future.cancel():
+            return False
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        # Never reached a worker, so it cost nothing
+        job.session.spent -= 1
+        self.counts["started"] -= 1
+        self.counts["cancelled"] += 1
+        return True
+
+    def _run(self, session, job, preferences):
+        job.started = time.perf_counter()
+        try:
+            if self.recommender.lookup(preferences) is not None:
+                job.cached = True
+                with self._lock:
+                    session.spent -= 1
+                    self.counts["already_cached"] += 1
+                return
+            self.recommender.prefetch(preferences)
+        except Exception as e:
+            with self._lock:
+                self.counts["failed"] += 1
+            logger.warning("prefetch failed: %r", e)
+            raise
+        finally:
+            job.finished = time.perf_counter()
+
+    def adopt(self, session_id, preferences, timeout=None):
+        """Called on submit, before the normal request: (outcome, seconds_saved).
+
+        outcome is "ready" when the prefetch already finished, "in_flight" when
+        this call waited for it, or None. Either way the request that follows
+        finds the answer in the cache. A prefetch that failed is ignored.
+        """
+        key = preference_key(to_prompt_input(preferences))
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session.timer is not None:
+                # Submitted within the debounce interval; the request itself does the work
+                session.timer.cancel()
+                session.timer = None
+            job = self._jobs.get(key)
+            if job is not None and self._cancel(job):
+                # Still queued behind other prefetches; calling the model directly is quicker
+                job = None
+        if job is None or job.adopted:
+            return self._missed()
+        now = time.perf_counter()
+        outcome = "ready" if job.future.done() else "in_flight"
+        try:
+            job.future.result(timeout)
+        except Exception:
+            return self._missed()
+        if job.cached:
+            # The answer was in the cache anyway
+            return self._missed()
+        # Time the model had already spent on it; started is set as the worker picks the job up
+        saved = (job.finished - job.started) if outcome == "ready" else now - (job.started or now)
+        with self._lock:
+            job.adopted = True
+            self.counts[f"adopted_{outcome}"] += 1
+            self.saved_seconds += saved
+        return outcome, saved
+
+    def _missed(self):
+        with self._lock:
+            self.counts["missed"] += 1
+        return None, 0.0
+
+    def stats(self):
+        with self._lock:
+            adopted = self.counts["adopted_ready"] + self.counts["adopted_in_flight"]
+            return {**self.counts,
+                    "not_adopted": self.counts["started"] - self.counts["already_cached"] - self.counts["failed"]
+                    - adopted,
+                    "saved_seconds": round(self.saved_seconds, 3),
+                    "mean_saved_ms": round(self.saved_seconds / adopted * 1000, 1) if adopted else None}
@@ -0,0 +1,107 @@
+from .structured import JSON_INSTRUCTIONS
+
+# Preferences are stated once, here; the system prompt only carries the instructions for the type
+USER_MESSAGE = ("Language: {lang}. Genre: {genre}. Industry: {formula}. Platform: {platform}. "
+                "Mood: {mood}. Years: {year_range}.")
+
+WANTED = {
+    "Movies": "{count} movies under a `### Movies` header and nothing else",
+    "Series": "{count} series under a `### Series` header and nothing else",
+    "Both": "{count} movies under a `### Movies` header and {count} series under a `### Series` header",
+}
+
+SYSTEM_PROMPT = "You are a movie assistant. For the user's preferences, recommend {wanted}.\n"
+
+MARKDOWN_FORMAT = "Write each as a bullet: - **Title (Year)** - one-sentence reason. No emojis.\n"
+COMPACT_MARKDOWN_FORMAT = "Write each as a bullet: - **Title (Year)**, with no explanation. No emojis.\n"
+COMPACT_JSON_NOTE = '- Leave "explanation" empty.\n'
+
+# Appended in grounded mode; {shortlist} comes from the local catalog
+GROUNDING_INSTRUCTIONS = """
+Prefer titles from this shortlist of titles known to match the filters, and only
+go beyond it if it does not have enough suitable ones:
+{shortlist}
+"""
+
+# Appended when a pool runs out (see recommender.pool); {exclude} lists every title already offered
+EXCLUSION_INSTRUCTIONS = """
+The user has already been offered these; recommend different titles:
+{exclude}
+"""
+
+# Asked when a user expands an item of a compact (titles-only) answer
+EXPLANATION_SYSTEM_PROMPT = ("You are a movie assistant. In one or two sentences, say why the {kind} {title} "
+                             "suits the user's preferences. No emojis.")
+
+
+def _template(system_prompt):
+    # Deferred so importing the package does not pull in langchain
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([("system", system_prompt), ("user", USER_MESSAGE)])
+
+
+class PromptBuilder:
+    """Template for Recommender: invoke(prompt_input) renders the prompt for prompt_input["type"].
+
+    Only the instructions for the requested type are sent, and the preferences
+    appear once, in the user message, so the system prompt is the same for
+    every request of a type. compact asks for titles only; explanations are
+    then fetched per item with explanation_template(). count is the number of
+    items asked for per section; a prompt_input with an "exclude" list gets
+    EXCLUSION_INSTRUCTIONS.
+    """
+
+    def __init__(self, structured=False, compact=False, grounded=False, count=5):
+        self.structured = structured
+        self.compact = compact
+        self.grounded = grounded
+        self.count = count
+        self._templates = {}
+
+    def system_prompt(self, type, excluding=False):
+        text = SYSTEM_PROMPT.format(wanted=WANTED[type].format(count=self.count))
+        if self.structured:
+            text += JSON_INSTRUCTIONS + (COMPACT_JSON_NOTE if self.compact else "")
+        else:
+            text += COMPACT_MARKDOWN_FORMAT if self.compact else MARKDOWN_FORMAT
+        text += GROUNDING_INSTRUCTIONS if self.grounded else ""
+        return text + (EXCLUSION_INSTRUCTIONS if excluding else "")
+
+    def invoke(self, prompt_input):
+        type = prompt_input.get("type")
+        key = (type if type in WANTED else "Both", "exclude" in prompt_input)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = _template(self.system_prompt(*key))
+        return template.invoke(prompt_input)
+
+
+def movie_title_template(compact=False, count=5):
+    return PromptBuilder(compact=compact, count=count)
+
+
+def structured_template(compact=False, count=5):
+    return PromptBuilder(structured=True, compact=compact, count=count)
+
+
+def grounded_template(structured=False, compact=False, count=5):
+    return PromptBuilder(structured, compact, grounded=True, count=count)
+
+
+def explanation_template():
+    return _template(EXPLANATION_SYSTEM_PROMPT)
+
+
+def exclusions(titles):
+    """One title per line for EXCLUSION_INSTRUCTIONS."""
+    return "\n".join(f"- {title}" for title in titles)
+
+
+def shortlist(candidates):
+    """Compact one-line-per-title text for GROUNDING_INSTRUCTIONS."""
+    lines = []
+    for section, items in candidates.items():
+        for item in items:
+            kind = "Movie" if section == "Movies" else "Series"
+            lines.append(f"- {kind}: {item.label}")
+    return "\n".join(lines)
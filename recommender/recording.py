@@ -0,0 +1,47 @@
+"""Record what the LLM was asked and what it answered, for replay benchmarks.
+
+Each record is one JSON line:
+
+    {"ts": 1760000000.0, "prompt_input": {...}, "response": "...", "latency": 3.2}
+
+Paths ending in .gz are gzip-compressed. Every record is a complete line (or
+gzip member) written with a single append, so several processes can share one
+file and a crashed session still leaves it readable.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+
+
+class RequestRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab", buffering=0)
+        self._compress = path.endswith(".gz")
+        self._lock = threading.Lock()
+
+    def record(self, prompt_input, response, latency=None):
+        line = json.dumps({"ts": round(time.time(), 3), "prompt_input": prompt_input, "response": response,
+                           "latency": None if latency is None else round(latency, 4)}) + "\n"
+        data = gzip.compress(line.encode("utf-8")) if self._compress else line.encode("utf-8")
+        with self._lock:
+            self._file.write(data)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_records(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
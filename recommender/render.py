@@ -0,0 +1,42 @@
+"""HTML for the results cards, built in one pass and emitted as one element each.
+
+Model output is escaped, so a stray "<" in an explanation cannot break the
+card markup; titles are set in <strong> because markdown inside an HTML block
+is not rendered.
+"""
+from html import escape
+
+from .parser import SECTIONS
+
+ICONS = {"Movies": "🎬", "Series": "📺"}
+CONTAINERS = {"Movies": "movie-container", "Series": "series-container"}
+
+
+def item_html(item):
+    label = item.label
+    if not label:
+        return f"<li>{escape(' '.join(item.text.split()))}</li>"
+    explanation = " ".join(item.explanation.split())
+    return f"<li><strong>{escape(label)}</strong> {escape(explanation)}</li>"
+
+
+def card_html(section, items, single=False):
+    """One Movies or Series card; single centres it for Movies-only or Series-only results."""
+    container = CONTAINERS[section]
+    if items:
+        rows = "".join(item_html(item) for item in items)
+    else:
+        rows = f"<li>No {'movie' if section == 'Movies' else 'series'} results found for your preferences.</li>"
+    if single:
+        return (f'<div style="display: flex; justify-content: center;">'
+                f'<div class="{container}" style="max-width: 600px;"><h3>{ICONS[section]} {section}</h3>'
+                f'<ul>{rows}</ul></div></div>')
+    return f'<div class="{container}"><h2>{ICONS[section]} {section}</h2><ul>{rows}</ul></div>'
+
+
+def results_html(result, type):
+    """Every requested card as a single payload; "Both" lays out side by side via .recommendations-grid."""
+    if type != "Both":
+        return card_html(type, result.section(type), single=True)
+    cards = "".join(card_html(section, result.section(section)) for section in SECTIONS)
+    return f'<div class="recommendations-grid">{cards}</div>'
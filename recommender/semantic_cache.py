@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from . import options
+from .cache import preference_key
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each preference in the similarity vector
+WEIGHTS = {"genre": 3.0, "platform": 1.0, "formula": 2.0, "mood": 2.0, "year_range": 2.0}
+YEAR_BUCKET = 5
+
+
+def _values(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value]
+    return [part.strip() for part in str(value).split(",") if part.strip()]
+
+
+def _year_bounds(year_range):
+    if isinstance(year_range, (list, tuple)):
+        return int(year_range[0]), int(year_range[1])
+    start, end = str(year_range).split("-")
+    return int(start), int(end)
+
+
+def canonicalize(prompt_input, bucket=YEAR_BUCKET):
+    """Order-insensitive multiselects and year ranges widened to bucket boundaries."""
+    canonical = dict(prompt_input)
+    for name in ("genre", "platform"):
+        canonical[name] = ", ".join(sorted(_values(prompt_input.get(name, "")), key=str.casefold))
+    start, end = _year_bounds(prompt_input.get("year_range", f"{options.YEAR_MIN}-{options.YEAR_MAX}"))
+    start -= (start - options.YEAR_MIN) % bucket
+    end += -(end - options.YEAR_MIN) % bucket
+    canonical["year_range"] = f"{start}-{min(end, options.YEAR_MAX)}"
+    return canonical
+
+
+def _one_hot(vocabulary, selected):
+    selected = {s.casefold() for s in selected}
+    return np.array([v.casefold() in selected for v in vocabulary], dtype=np.float32)
+
+
+_YEAR_BINS = np.arange(options.YEAR_MIN, options.YEAR_MAX + 1, YEAR_BUCKET)
+
+
+def preference_vector(prompt_input):
+    """Unit vector over the soft preferences; lang and type are matched exactly instead."""
+    start, end = _year_bounds(prompt_input["year_range"])
+    parts = [
+        WEIGHTS["genre"] * _one_hot(options.GENRES, _values(prompt_input.get("genre", ""))),
+        WEIGHTS["platform"] * _one_hot(options.PLATFORMS, _values(prompt_input.get("platform", ""))),
+        WEIGHTS["formula"] * _one_hot(options.FORMULAS, [prompt_input.get("formula", "")]),
+        WEIGHTS["mood"] * _one_hot(options.MOODS, [prompt_input.get("mood", "")]),
+        WEIGHTS["year_range"] * ((_YEAR_BINS + YEAR_BUCKET > start) & (_YEAR_BINS <= end)).astype(np.float32),
+    ]
+    vector = np.concatenate(parts)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Cache front that also answers near-duplicate preference sets.
+
+    Lookups first try the exact cache with canonicalized preferences, then the
+    stored preference set with the highest cosine similarity (same language and
+    type only), if it reaches threshold. The vector index lives in memory and is
+    rebuilt from new entries after a restart; the answers themselves stay in the
+    wrapped cache.
+    """
+
+    def __init__(self, cache, threshold=0.95, bucket=YEAR_BUCKET):
+        self.cache = cache
+        self.threshold = threshold
+        self.bucket = bucket
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # Recent semantic hits only, so the staleness report tracks the current threshold
+        self._ages = deque(maxlen=1000)
+        self._similarities = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        dimensions = len(preference_vector({"year_range": f"{options.YEAR_MIN}-{options.YEAR_MAX}"}))
+        self._vectors = np.zeros((64, dimensions), dtype=np.float32)
+        self._group_codes = np.zeros(64, dtype=np.int32)
+        self._groups = {}
+        self._index = {}
+        self._entries = []
+        self._created = []
+
+    def _group(self, prompt_input):
+        group = (str(prompt_input.get("lang", "")).casefold(), str(prompt_input.get("type", "")).casefold())
+        return self._groups.setdefault(group, len(self._groups))
+
+    def _nearest(self, canonical):
+        count = len(self._entries)
+        candidates = np.flatnonzero(self._group_codes[:count] == self._group(canonical))
+        if candidates.size == 0:
+            return None, 0.0
+        similarities = self._vectors[candidates] @ preference_vector(canonical)
+        best = int(np.argmax(similarities))
+        return int(candidates[best]), float(similarities[best])
+
+    def get(self, prompt_input):
+        canonical = canonicalize(prompt_input, self.bucket)
+        value = self.cache.get(canonical)
+        with self._lock:
+            if value is not None:
+                self.exact_hits += 1
+                return value
+            index, similarity = self._nearest(canonical)
+            if index is None or similarity < self.threshold:
+                self.misses += 1
+                return None
+            entry, created = self._entries[index], self._created[index]
+        # The exact lookup above already counted this request in the wrapped cache's stats
+        value = self.cache.get(entry, count=False)
+        with self._lock:
+            if value is None:
+                # The wrapped cache expired or evicted it
+                self.misses += 1
+                return None
+            self.semantic_hits += 1
+            self._similarities.append(similarity)
+            self._ages.append(time.time() - created)
+        return value
+
+    def age(self, prompt_input):
+        return self.cache.age(canonicalize(prompt_input, self.bucket))
+
+    def ping(self):
+        self.cache.ping()
+
+    def set(self, prompt_input, value):
+        canonical = canonicalize(prompt_input, self.bucket)
+        self.cache.set(canonical, value)
+        key = preference_key(canonical)
+        with self._lock:
+            index = self._index.get(key)
+            if index is not None:
+                self._created[index] = time.time()
+                return
+            index = self._index[key] = len(self._entries)
+            if index == len(self._vectors):
+                self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+                self._group_codes = np.concatenate([self._group_codes, np.zeros_like(self._group_codes)])
+            self._vectors[index] = preference_vector(canonical)
+            self._group_codes[index] = self._group(canonical)
+            self._entries.append(canonical)
+            self._created.append(time.time())
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "hits": hits,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "mean_similarity": float(np.mean(self._similarities)) if self._similarities else None,
+            "mean_staleness": float(np.mean(self._ages)) if self._ages else None,
+            "max_staleness": max(self._ages) if self._ages else None,
+        }
+
+    def log_stats(self):
+        self.cache.log_stats()
+        logger.info("semantic cache: %s", self.stats())
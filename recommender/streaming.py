@@ -0,0 +1,44 @@
+import time
+import logging
+
+from .parser import ResponseParser
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_text(chunk):
+    content = getattr(chunk, "content", chunk)
+    return content if isinstance(content, str) else ""
+
+
+def stream_recommendations(llm, prompt, on_item, default_section="Movies", trace=None):
+    """Stream the LLM answer for prompt, calling on_item(recommendation) per completed bullet.
+
+    Returns the full response text so it can be cached. With a trace, the time
+    to the first item and the token usage reported on the chunks are recorded.
+    """
+    parser = ResponseParser(default_section)
+    parts = []
+    started = time.perf_counter()
+    first_item_at = None
+
+    def emit(items):
+        nonlocal first_item_at
+        for item in items:
+            if first_item_at is None:
+                first_item_at = time.perf_counter() - started
+                if trace is not None:
+                    trace.mark("first_item")
+            on_item(item)
+
+    for chunk in llm.stream(prompt):
+        text = _chunk_text(chunk)
+        if trace is not None:
+            trace.add_usage(chunk)
+        parts.append(text)
+        emit(parser.feed(text))
+    emit(parser.close())
+    if first_item_at is not None:
+        logger.info("time to first recommendation: %.3fs (total %.3fs)",
+                    first_item_at, time.perf_counter() - started)
+    return "".join(parts)
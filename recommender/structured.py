@@ -0,0 +1,166 @@
+import json
+import logging
+import threading
+import time
+
+from .parser import Recommendation, SECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Appended to the system prompt in structured mode (braces doubled for ChatPromptTemplate)
+JSON_INSTRUCTIONS = """
+Respond with a single JSON object and nothing else, in exactly this shape:
+{{"movies": [{{"title": "...", "year": 2019, "platform": "...", "explanation": "..."}}],
+ "series": [{{"title": "...", "year": 2019, "platform": "...", "explanation": "..."}}]}}
+- "year" is an integer or null, "platform" is a string or null.
+- Use an empty list for a section the user did not ask for.
+- No markdown, no code fences, no emojis.
+"""
+
+REPAIR_PROMPT = ("Your previous reply could not be used: {error}. "
+                 "Reply again with only the corrected JSON object.")
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+class StructuredStats:
+    """Process-wide counters showing what the free-text format used to cost us."""
+
+    def __init__(self):
+        self.requests = 0
+        self.parse_failures = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.retry_seconds = 0.0
+        self.retry_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, failures, retry_seconds, retry_tokens, ok):
+        with self._lock:
+            self.requests += 1
+            self.parse_failures += failures
+            self.retries += failures if ok else max(failures - 1, 0)
+            self.gave_up += 0 if ok else 1
+            self.retry_seconds += retry_seconds
+            self.retry_tokens += retry_tokens
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "parse_failures": self.parse_failures,
+            "retries": self.retries,
+            "gave_up": self.gave_up,
+            "retry_seconds": round(self.retry_seconds, 3),
+            "retry_tokens": self.retry_tokens,
+        }
+
+
+stats = StructuredStats()
+
+
+def _strip_fences(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text
+
+
+def _validate_item(section, raw, index):
+    where = f"{section.lower()}[{index}]"
+    if not isinstance(raw, dict):
+        raise StructuredOutputError(f"{where} is not an object")
+    title = raw.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise StructuredOutputError(f"{where}.title must be a non-empty string")
+    explanation = raw.get("explanation") or ""
+    if not isinstance(explanation, str):
+        raise StructuredOutputError(f"{where}.explanation must be a string")
+    year = raw.get("year")
+    if isinstance(year, str) and year.strip().isdigit():
+        year = int(year)
+    if year is not None and (not isinstance(year, int) or isinstance(year, bool)):
+        raise StructuredOutputError(f"{where}.year must be an integer or null")
+    platform = raw.get("platform")
+    if platform is not None and not isinstance(platform, str):
+        raise StructuredOutputError(f"{where}.platform must be a string or null")
+
+    title = title.strip()
+    explanation = explanation.strip()
+    label = f"{title} ({year})" if year else title
+    text = f"**{label}** {explanation}".strip()
+    return Recommendation(section, title, explanation, text, year, platform)
+
+
+def parse_structured(text):
+    """Validate a JSON answer and return {"Movies": [...], "Series": [...]}."""
+    try:
+        data = json.loads(_strip_fences(text))
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"invalid JSON ({e.msg} at line {e.lineno} column {e.colno})") from e
+    if not isinstance(data, dict):
+        raise StructuredOutputError("top level must be a JSON object")
+
+    sections = {}
+    for section in SECTIONS:
+        raw_items = data.get(section.lower(), [])
+        if not isinstance(raw_items, list):
+            raise StructuredOutputError(f'"{section.lower()}" must be a list')
+        sections[section] = [_validate_item(section, raw, i) for i, raw in enumerate(raw_items)]
+    if not any(sections.values()):
+        raise StructuredOutputError("no recommendations were returned")
+    return sections
+
+
+def merge_structured(text, extra):
+    """One JSON answer with the items of extra appended to those of text, section by section."""
+    data, more = json.loads(_strip_fences(text)), json.loads(_strip_fences(extra))
+    for section in SECTIONS:
+        key = section.lower()
+        data[key] = list(data.get(key) or []) + list(more.get(key) or [])
+    return json.dumps(data)
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+def request_structured(llm, prompt, max_retries=2, trace=None):
+    """Invoke llm for a JSON answer, re-asking with the validation error at most max_retries times.
+
+    Returns (sections, raw_text) where raw_text is the JSON that validated.
+    Raises StructuredOutputError once the retries are used up. Token usage of
+    every attempt, retries included, is added to trace.
+    """
+    to_messages = getattr(prompt, "to_messages", None)
+    messages = list(to_messages()) if to_messages else list(prompt)
+    failures = 0
+    retry_seconds = 0.0
+    retry_tokens = 0
+    while True:
+        started = time.perf_counter()
+        response = llm.invoke(messages)
+        if trace is not None:
+            trace.add_usage(response)
+        if failures:
+            retry_seconds += time.perf_counter() - started
+            retry_tokens += _usage_tokens(response)
+        content = response.content if isinstance(response.content, str) else ""
+        try:
+            sections = parse_structured(content)
+        except StructuredOutputError as e:
+            failures += 1
+            logger.warning("structured output rejected (attempt %d): %s", failures, e)
+            if failures > max_retries:
+                stats.record(failures, retry_seconds, retry_tokens, ok=False)
+                raise
+            messages = messages + [("ai", content), ("human", REPAIR_PROMPT.format(error=e))]
+            continue
+        stats.record(failures, retry_seconds, retry_tokens, ok=True)
+        if trace is not None:
+            trace.attributes["retries"] = failures
+        logger.info("structured output stats: %s", stats.snapshot())
+        return sections, content
@@ -0,0 +1,196 @@
+"""Per-request timing spans, token counts and cache outcome, fanned out to pluggable sinks.
+
+A RequestTrace is created per submit; the engine adds spans for cache lookup,
+prompt formatting, the LLM call and parsing, and the caller can add its own
+(e.g. rendering) before handing it to Telemetry.record().
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTrace:
+    def __init__(self, kind="recommend"):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = {}
+        self.tokens = defaultdict(int)
+        self.attributes = {}
+        self.total = None
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + time.perf_counter() - started
+
+    def mark(self, name):
+        """Record the time since the trace started, e.g. for time to first item."""
+        self.spans.setdefault(name, time.perf_counter() - self._t0)
+
+    def add_usage(self, response):
+        """Accumulate token counts from a langchain message's usage_metadata, if present."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        for name in ("input_tokens", "output_tokens", "total_tokens"):
+            self.tokens[name] += usage.get(name, 0) or 0
+        details = usage.get("input_token_details") or {}
+        if details.get("cache_read"):
+            self.tokens["cache_read_tokens"] += details["cache_read"]
+
+    def finish(self):
+        if self.total is None:
+            self.total = time.perf_counter() - self._t0
+        return self
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "started": round(self.started, 3),
+            "total_ms": round((self.total or 0.0) * 1000, 2),
+            "spans_ms": {name: round(seconds * 1000, 2) for name, seconds in self.spans.items()},
+            "tokens": dict(self.tokens),
+            **self.attributes,
+        }
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+class JsonLogSink:
+    """Writes one JSON line per request to a logger or an open text file."""
+
+    def __init__(self, target=None):
+        self.target = target or logging.getLogger("recommender.requests")
+
+    def __call__(self, trace):
+        line = json.dumps(trace.as_dict(), sort_keys=True)
+        if isinstance(self.target, logging.Logger):
+            self.target.info(line)
+        else:
+            self.target.write(line + "\n")
+            self.target.flush()
+
+
+class PrometheusSink:
+    """Aggregates traces into Prometheus text exposition format."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._sums = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._tokens = defaultdict(int)
+        self._requests = defaultdict(int)
+
+    def __call__(self, trace):
+        with self._lock:
+            for name, seconds in list(trace.spans.items()) + [("total", trace.total or 0.0)]:
+                self._samples[name].append(seconds)
+                self._sums[name] += seconds
+                self._counts[name] += 1
+            for name, count in trace.tokens.items():
+                self._tokens[name] += count
+            self._requests[(trace.kind, trace.attributes.get("cache", "miss"))] += 1
+
+    def render(self):
+        lines = ["# TYPE recommender_stage_seconds summary"]
+        with self._lock:
+            for name in sorted(self._samples):
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f'recommender_stage_seconds{{stage="{name}",quantile="{q}"}} '
+                                 f"{percentile(self._samples[name], q):.6f}")
+                lines.append(f'recommender_stage_seconds_sum{{stage="{name}"}} {self._sums[name]:.6f}')
+                lines.append(f'recommender_stage_seconds_count{{stage="{name}"}} {self._counts[name]}')
+            lines.append("# TYPE recommender_tokens_total counter")
+            for name in sorted(self._tokens):
+                lines.append(f'recommender_tokens_total{{kind="{name}"}} {self._tokens[name]}')
+            lines.append("# TYPE recommender_requests_total counter")
+            for (kind, cache), count in sorted(self._requests.items()):
+                lines.append(f'recommender_requests_total{{kind="{kind}",cache="{cache}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class Telemetry:
+    """Keeps the last N traces for the debug panel and forwards each to the sinks."""
+
+    def __init__(self, sinks=(), history=50):
+        self.sinks = list(sinks)
+        self.recent = deque(maxlen=history)
+
+    def start(self, kind="recommend"):
+        return RequestTrace(kind)
+
+    def record(self, trace):
+        trace.finish()
+        self.recent.append(trace)
+        for sink in self.sinks:
+            try:
+                sink(trace)
+            except Exception:
+                logger.exception("telemetry sink %r failed", sink)
+
+    def summary(self):
+        """p50/p95 in milliseconds per span over the recent traces."""
+        samples = defaultdict(list)
+        for trace in self.recent:
+            samples["total"].append(trace.total)
+            for name, seconds in trace.spans.items():
+                samples[name].append(seconds)
+        return {
+            name: {"p50_ms": round(percentile(values, 0.5) * 1000, 2),
+                   "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                   "count": len(values)}
+            for name, values in samples.items()
+        }
+
+
+def serve_metrics(sink, port, host="127.0.0.1", ready=None):
+    """Expose sink.render() at http://host:port/metrics from a daemon thread.
+
+    /healthz answers 200 while the process is up; /readyz answers 200 or 503
+    with the JSON checks of ready(), a callable returning (ready, checks)
+    such as recommender.workers.readiness.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, sink.render().encode("utf-8"), "text/plain; version=0.0.4")
+            elif self.path == "/healthz":
+                self._send(200, b"ok", "text/plain")
+            elif self.path == "/readyz":
+                ok, checks = ready() if ready is not None else (True, {})
+                self._send(200 if ok else 503, json.dumps({"ready": ok, **checks}).encode("utf-8"),
+                           "application/json")
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
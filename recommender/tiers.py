@@ -0,0 +1,107 @@
+"""Model tiers: a cheap model answers first, stronger ones on escalation or refine.
+
+Tiers come from the [models] table of config.toml, cheapest first:
+
+    [models]
+    tiers = ["fast", "pro"]
+
+    [models.fast]
+    model = "gemini-2.5-flash"
+    temperature = 0.2
+    timeout = 20        # seconds per call
+    rate_limit = 4      # calls per second in each process, optional
+
+Without the table the single gemini-2.5-pro tier the app always used applies.
+"""
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import NamedTuple, Optional
+
+from .gateway import CircuitBreaker, LLMGateway
+from .ratelimit import RateLimiter
+from .telemetry import percentile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = "config.toml"
+
+
+class Tier(NamedTuple):
+    name: str
+    model: str
+    temperature: float = 0.2
+    timeout: Optional[float] = None
+    rate_limit: Optional[float] = None
+
+
+DEFAULT_TIERS = [Tier("pro", "gemini-2.5-pro")]
+
+
+def load_tiers(path=DEFAULT_CONFIG_PATH):
+    import tomllib
+    try:
+        with open(path, "rb") as f:
+            models = tomllib.load(f).get("models", {})
+    except FileNotFoundError:
+        return DEFAULT_TIERS
+    tiers = []
+    for name in models.get("tiers", []):
+        options = models.get(name)
+        if not options or "model" not in options:
+            raise ValueError(f"{path}: [models.{name}] needs a model")
+        tiers.append(Tier(name, options["model"], options.get("temperature", 0.2), options.get("timeout"),
+                          options.get("rate_limit")))
+    return tiers or DEFAULT_TIERS
+
+
+def clients(tiers, gateway=True, rate_limit=None, semaphore=None):
+    """[(name, llm)] for Recommender(tiers=...); each model is created on first use.
+
+    With gateway, every tier gets its own circuit breaker, so an outage of one
+    model does not stop the others from answering, and a rate limiter when the
+    tier or rate_limit sets a rate. Rates are per process: with N workers the
+    model sees up to N times as many calls. semaphore (a
+    recommender.workers.ProcessSemaphore) is shared by all tiers.
+    """
+    result = []
+    for tier in tiers:
+        options = {"model": tier.model, "temperature": tier.temperature, "timeout": tier.timeout}
+        if gateway:
+            rate = tier.rate_limit or rate_limit
+            limiter = RateLimiter(rate, burst=max(int(rate), 1)) if rate else None
+            llm = LLMGateway(limiter=limiter, breaker=CircuitBreaker(), model_options=options, semaphore=semaphore)
+        else:
+            llm = LLMGateway(max_retries=0, hedge_quantile=None, model_options=options, semaphore=semaphore)
+        result.append((tier.name, llm))
+    return result
+
+
+class TierStats:
+    """Per-tier call counts, latency, token usage and why answers were escalated."""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(lambda: defaultdict(int))
+
+    def record(self, tier, seconds, tokens, outcome):
+        """outcome is "ok", "invalid" (escalated) or "error"."""
+        with self._lock:
+            self._latencies[tier].append(seconds)
+            counts = self._counts[tier]
+            counts["calls"] += 1
+            counts[outcome] += 1
+            counts["tokens"] += tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                tier: {**counts,
+                       "p50_ms": round(percentile(self._latencies[tier], 0.5) * 1000, 1),
+                       "p95_ms": round(percentile(self._latencies[tier], 0.95) * 1000, 1)}
+                for tier, counts in self._counts.items()
+            }
+
+
+stats = TierStats()
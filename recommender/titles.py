@@ -0,0 +1,135 @@
+"""Exact and fuzzy title lookup over a large list of titles, with a character-trigram inverted index.
+
+Titles are compared by normalize_title key. An exact key is found with one
+binary search over sorted 64-bit key hashes. Otherwise the key's trigrams
+(hashed into BUCKETS) are looked up in CSR postings lists, candidates are
+counted, and the best one is returned if its Dice coefficient
+2 * shared / (query grams + title grams) reaches the threshold.
+
+Every array is fixed-width, so a TitleIndex can be written into a
+recommender.columnar table and memory-mapped like the rest of the catalog.
+"""
+import hashlib
+import zlib
+
+import numpy as np
+
+from .columnar import StringColumn
+from .parser import normalize_title
+
+BUCKETS = 1 << 20
+# How many postings lookup() counts in one np.unique pass before switching to binary searches
+COUNT_BUDGET = 1 << 16
+
+
+def trigrams(key):
+    """Character trigrams of a normalized title, with word-boundary padding."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    """Dice coefficient of two trigram sets."""
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 1.0
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _buckets(key):
+    return np.unique(np.fromiter((zlib.crc32(gram.encode("utf-8")) % BUCKETS for gram in trigrams(key)),
+                                 dtype=np.int64))
+
+
+class TitleIndex:
+    COLUMNS = ("keys", "key_hashes", "key_rows", "gram_counts", "gram_offsets", "gram_postings")
+
+    def __init__(self, keys, key_hashes, key_rows, gram_counts, gram_offsets, gram_postings):
+        self.keys = keys
+        self.key_hashes = key_hashes
+        self.key_rows = key_rows
+        self.gram_counts = gram_counts
+        self.gram_offsets = gram_offsets
+        self.gram_postings = gram_postings
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, titles):
+        keys = [normalize_title(title) for title in titles]
+        hashes = np.fromiter((_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+        order = np.argsort(hashes, kind="stable")
+        grams = [_buckets(key) for key in keys]
+        counts = np.fromiter((len(g) for g in grams), dtype=np.uint16, count=len(keys))
+        buckets = np.concatenate(grams) if grams else np.zeros(0, dtype=np.int64)
+        rows = np.repeat(np.arange(len(keys), dtype=np.int32), counts)
+        by_bucket = np.argsort(buckets, kind="stable")
+        offsets = np.zeros(BUCKETS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(buckets, minlength=BUCKETS), out=offsets[1:])
+        return cls(StringColumn.from_strings(keys), hashes[order], order.astype(np.int32), counts, offsets,
+                   rows[by_bucket])
+
+    def columns(self, prefix="title_"):
+        return {prefix + name: getattr(self, name) for name in self.COLUMNS}
+
+    @classmethod
+    def from_columns(cls, columns, prefix="title_"):
+        if not all(prefix + name in columns for name in cls.COLUMNS):
+            return None
+        return cls(*(columns[prefix + name] for name in cls.COLUMNS))
+
+    def exact(self, key):
+        """Row whose key equals key, or None."""
+        target = np.uint64(_hash(key))
+        position = int(np.searchsorted(self.key_hashes, target))
+        while position < len(self.key_hashes) and self.key_hashes[position] == target:
+            row = int(self.key_rows[position])
+            if self.keys[row] == key:
+                return row
+            position += 1
+        return None
+
+    def lookup(self, title, threshold=0.8):
+        """(row, score) of the closest title, or None if nothing reaches threshold."""
+        key = normalize_title(title)
+        if not key:
+            return None
+        row = self.exact(key)
+        if row is not None:
+            return row, 1.0
+        buckets = _buckets(key)
+        postings = [self.gram_postings[self.gram_offsets[b]:self.gram_offsets[b + 1]] for b in buckets]
+        # A title needs at least this many of the query's grams to reach threshold, however short it is
+        needed = int(np.ceil(threshold * len(buckets) / (2 - threshold)))
+        if needed > len(buckets):
+            return None
+        # ...so the rarest len - needed + 1 lists hold every candidate (pigeonhole). Counting more of the rare
+        # lists at once lets candidates that cannot reach needed from the remaining lists be dropped early
+        postings.sort(key=len)
+        sizes = np.cumsum([len(posting) for posting in postings])
+        counted = max(len(buckets) - needed + 1, int(np.searchsorted(sizes, COUNT_BUDGET, side="right")))
+        candidates, shared = np.unique(np.concatenate(postings[:counted]), return_counts=True)
+        # Dice also bounds the candidate's own gram count: q * t / (2 - t) <= g <= q * (2 - t) / t
+        grams = self.gram_counts[candidates]
+        keep = ((shared >= needed - (len(buckets) - counted)) & (grams >= needed)
+                & (grams <= len(buckets) * (2 - threshold) / threshold))
+        candidates, shared = candidates[keep], shared[keep]
+        if candidates.size == 0:
+            return None
+        # Postings are sorted by row, so the rest are binary searches for the survivors rather than scans,
+        # dropping after each list the candidates that can no longer reach needed
+        rest = postings[counted:]
+        for position, posting in enumerate(rest):
+            found = np.searchsorted(posting, candidates)
+            shared += posting[np.minimum(found, posting.size - 1)] == candidates
+            keep = shared >= needed - (len(rest) - position - 1)
+            candidates, shared = candidates[keep], shared[keep]
+            if candidates.size == 0:
+                return None
+        scores = 2 * shared / (len(buckets) + self.gram_counts[candidates].astype(np.int32))
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        return int(candidates[best]), float(scores[best])
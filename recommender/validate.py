@@ -0,0 +1,97 @@
+"""Post-processing for model answers: drops repeats, near-duplicates, out-of-range years and unknown titles.
+
+The model sometimes names a title in both sections, returns near-duplicates
+("Dark" and "Dark (2017)"), or ignores the year filter. ResponseValidator
+checks each item of an answer against the ones kept before it:
+
+  year            its year, or a series' run, falls outside prompt_input["year_range"]
+  duplicate       same normalize_title key as a kept item, in either section
+  near-duplicate  trigram Dice similarity of at least similarity with a kept item that
+                  has the same numbers, so sequels are not near-duplicates
+  unknown         an index (recommender.titles.TitleIndex, e.g. the catalog's) is
+                  given and has nothing close to the title
+
+Recommender backfills the slots this frees with a short follow-up prompt for
+just the missing items, rather than regenerating the whole answer.
+"""
+import re
+
+from .parser import normalize_title, title_years
+from .titles import similarity, trigrams
+
+# Sequel numbers: "Toy Story 2" and "Toy Story 3" are as similar as trigrams get, but different titles
+NUMBER = re.compile(r"\b(?:\d+|[ivx]+)\b")
+
+
+def year_bounds(prompt_input):
+    """(low, high) from a year_range such as "1990-2024", or None."""
+    low, _, high = str(prompt_input.get("year_range") or "").partition("-")
+    if not (low.strip().isdigit() and high.strip().isdigit()):
+        return None
+    return int(low), int(high)
+
+
+def item_years(item):
+    """(first, last) year of item; last is None for a series still running, and None if the year is unknown."""
+    if item.year:
+        return item.year, item.year
+    return title_years(item.title)
+
+
+class AnswerCheck:
+    """check(item) for one answer: the reason to drop item, or None after keeping it."""
+
+    def __init__(self, bounds, index=None, threshold=0.8):
+        self.bounds = bounds
+        self.index = index
+        self.threshold = threshold
+        self._keys = set()
+        self._kept = []
+
+    def __call__(self, item):
+        years = item_years(item)
+        if self.bounds is not None and years is not None:
+            first, last = years
+            if first > self.bounds[1] or (last is not None and last < self.bounds[0]):
+                return "year"
+        key = normalize_title(item.title)
+        if key in self._keys:
+            return "duplicate"
+        grams, numbers = trigrams(key), NUMBER.findall(key)
+        if any(numbers == kept_numbers and similarity(grams, kept) >= self.threshold
+               for kept, kept_numbers in self._kept):
+            return "near-duplicate"
+        if self.index is not None and self.index.lookup(item.title, self.threshold) is None:
+            return "unknown"
+        self._keys.add(key)
+        self._kept.append((grams, numbers))
+        return None
+
+
+class ResponseValidator:
+    def __init__(self, index=None, similarity=0.8, years=True):
+        self.index = index
+        self.similarity = similarity
+        self.years = years
+
+    def checker(self, prompt_input):
+        return AnswerCheck(year_bounds(prompt_input) if self.years else None, self.index, self.similarity)
+
+    def clean(self, prompt_input, sections, check=None):
+        """(kept, rejected): sections without the items check rejects, and [(item, reason)] for those.
+
+        Items are checked in answer order, Movies first, so a title repeated
+        across sections stays in the first. Pass check to go on checking
+        against the items an earlier call kept.
+        """
+        check = check or self.checker(prompt_input)
+        kept, rejected = {}, []
+        for section, items in sections.items():
+            kept[section] = []
+            for item in items:
+                reason = check(item)
+                if reason is None:
+                    kept[section].append(item)
+                else:
+                    rejected.append((item, reason))
+        return kept, rejected
@@ -0,0 +1,142 @@
+"""Running several app processes on one host: a global cap on LLM calls and a readiness check.
+
+Streamlit (or uvicorn --workers) processes share the SQLite cache and
+popularity files (both in WAL mode), so an answer generated by one worker is a
+cache hit in every other. ProcessSemaphore caps how many model calls run at
+once across all of them, whatever each process's own rate limiter allows.
+
+Slots are lock files held with flock(2), which the OS releases when the
+holding process exits, so a crashed worker never leaks one. POSIX only.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_LOCK_DIR = os.path.join(".cache", "locks")
+
+
+class ProcessSemaphore:
+    """At most limit holders across every process that opens the same directory and name."""
+
+    def __init__(self, directory=DEFAULT_LOCK_DIR, limit=4, name="llm", poll=0.01):
+        if fcntl is None:
+            raise RuntimeError("ProcessSemaphore needs fcntl (POSIX)")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        os.makedirs(directory, exist_ok=True)
+        self.limit = limit
+        self.poll = poll
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self._files = [open(os.path.join(directory, f"{name}.{slot}.lock"), "a+b") for slot in range(limit)]
+        # flock is per open file, so threads of this process are kept apart here
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """A free slot number, now held, or None."""
+        with self._lock:
+            for slot, f in enumerate(self._files):
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(slot)
+                self.acquired += 1
+                return slot
+        return None
+
+    def _waited(self, started):
+        with self._lock:
+            self.waited += 1
+            self.wait_seconds += time.perf_counter() - started
+
+    def acquire(self, timeout=None):
+        slot = self.try_acquire()
+        if slot is not None:
+            return slot
+        started = time.perf_counter()
+        while slot is None:
+            if timeout is not None and time.perf_counter() - started >= timeout:
+                raise TimeoutError(f"no LLM slot free within {timeout}s")
+            time.sleep(self.poll)
+            slot = self.try_acquire()
+        self._waited(started)
+        return slot
+
+    async def aacquire(self):
+        slot = self.try_acquire()
+        if slot is not None:
+            return slot
+        started = time.perf_counter()
+        while slot is None:
+            await asyncio.sleep(self.poll)
+            slot = self.try_acquire()
+        self._waited(started)
+        return slot
+
+    def release(self, slot):
+        with self._lock:
+            fcntl.flock(self._files[slot], fcntl.LOCK_UN)
+            self._held.discard(slot)
+
+    @contextmanager
+    def hold(self, slot=None):
+        """Holds slot (acquiring one if None) for the block, then releases it."""
+        if slot is None:
+            slot = self.acquire()
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def in_use(self):
+        """Slots held by any process right now (probing briefly takes each free one)."""
+        with self._lock:
+            busy = len(self._held)
+            for slot, f in enumerate(self._files):
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    busy += 1
+                else:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return busy
+
+    def stats(self):
+        return {"limit": self.limit, "in_use": self.in_use(), "acquired": self.acquired, "waited": self.waited,
+                "wait_seconds": round(self.wait_seconds, 3)}
+
+
+def readiness(recommender, semaphore=None):
+    """(ready, checks) for a readiness probe.
+
+    Ready means the cache answers and at least one model tier's circuit breaker
+    is not open; a worker that is not ready can still serve cached answers.
+    """
+    checks = {}
+    try:
+        if recommender.cache is not None:
+            recommender.cache.ping()
+        checks["cache"] = "ok"
+    except Exception as e:
+        checks["cache"] = f"error: {e}"
+    circuits = {name: llm.stats()["circuit"] if hasattr(llm, "stats") else "none"
+                for name, llm in recommender.tiers}
+    checks["models"] = circuits
+    if semaphore is not None:
+        checks["llm_slots"] = semaphore.stats()
+    ready = checks["cache"] == "ok" and (not circuits or any(state != "open" for state in circuits.values()))
+    return ready, checks
@@ -0,0 +1,52 @@
+import asyncio
+
+from recommender import Recommender
+from recommender.api import RecommendationAPI
+from recommender.fakes import DictTemplate, FakeLatencyLLM
+
+PREFERENCES = {"lang": "English", "genre": ["Drama"], "type": "Both", "formula": "Hollywood",
+               "platform": ["Netflix"], "mood": "Happy", "year_range": [2010, 2023]}
+
+
+class CountingCache:
+    def __init__(self):
+        self.values = {}
+        self.gets = 0
+
+    def get(self, prompt_input):
+        self.gets += 1
+        return self.values.get(str(sorted(prompt_input.items())))
+
+    def set(self, prompt_input, value):
+        self.values[str(sorted(prompt_input.items()))] = value
+
+
+def api(latency=0.0, cache=None):
+    recommender = Recommender(llm=FakeLatencyLLM(latency=latency), template=DictTemplate, cache=cache)
+    return RecommendationAPI(recommender)
+
+
+def test_a_miss_reads_the_cache_once():
+    cache = CountingCache()
+    app = api(cache=cache)
+    result = asyncio.run(app.recommend(PREFERENCES))
+    assert len(result.movies) == 5
+    assert cache.gets == 1
+    assert asyncio.run(app.recommend(PREFERENCES)).cached
+
+
+def test_coalesced_requests_survive_the_first_client_disconnecting():
+    app = api(latency=0.2)
+
+    async def scenario():
+        first = asyncio.ensure_future(app.recommend(PREFERENCES))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(app.recommend(PREFERENCES))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second
+
+    result = asyncio.run(scenario())
+    assert len(result.movies) == 5
+    assert app.coalesced == 1
+    assert app.upstream_calls == 1
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from recommender.fakes import FakeLatencyLLM
+from recommender.gateway import CircuitBreaker, CircuitOpenError, LLMGateway
+
+
+def half_open_gateway(latency=0.0):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    return LLMGateway(FakeLatencyLLM(latency=latency), breaker=breaker, hedge_quantile=None), breaker
+
+
+def test_probe_stream_closed_early_releases_the_probe():
+    gateway, breaker = half_open_gateway()
+    stream = gateway.stream("recommend 5")
+    next(stream)
+    assert breaker.state == "half_open"
+    # A Streamlit rerun abandons the stream with GeneratorExit
+    stream.close()
+    assert breaker.state == "half_open"
+    assert gateway.invoke("recommend 5").content
+    assert breaker.state == "closed"
+
+
+def test_probe_ainvoke_cancelled_by_wait_for_releases_the_probe():
+    gateway, breaker = half_open_gateway(latency=1.0)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(gateway.ainvoke("recommend 5"), timeout=0.05))
+    assert breaker.state == "half_open"
+    gateway.llm.latency = 0.0
+    assert gateway.invoke("recommend 5").content
+    assert breaker.state == "closed"
+
+
+def test_second_call_while_probing_is_rejected():
+    gateway, breaker = half_open_gateway()
+    stream = gateway.stream("recommend 5")
+    next(stream)
+    with pytest.raises(CircuitOpenError):
+        gateway.invoke("recommend 5")
+    stream.close()
@@ -0,0 +1,39 @@
+import pytest
+
+from recommender.parser import parse_response
+
+
+def titles(sections):
+    return {section: [item.title for item in items] for section, items in sections.items()}
+
+
+@pytest.mark.parametrize("header", ["### Series", "### Series Recommendations", "### `Series`", "## 📺 Series",
+                                    "**Series:**", "**Series Picks**", "Series"])
+def test_section_headers(header):
+    text = f"### Movies\n- **Heat (1995)** - a heist\n\n{header}\n- **Dark (2017)** - time travel\n"
+    assert titles(parse_response(text)) == {"Movies": ["Heat (1995)"], "Series": ["Dark (2017)"]}
+
+
+@pytest.mark.parametrize("line", ["Series of vignettes that everyone loves", "**Series 2 (2019)**"])
+def test_prose_and_titles_are_not_headers(line):
+    text = f"### Movies\n- **Heat (1995)** - a heist\n{line}\n"
+    assert titles(parse_response(text)) == {"Movies": ["Heat (1995)"], "Series": []}
+
+
+def test_indented_bullets_start_items():
+    text = "### Movies\n  - Heat (1995) - a heist\n  - Ronin (1998) - car chases\n"
+    assert titles(parse_response(text))["Movies"] == ["Heat (1995)", "Ronin (1998)"]
+
+
+@pytest.mark.parametrize("marker", ["1.", "1)"])
+def test_numbered_lists(marker):
+    second = marker.replace("1", "2")
+    text = f"### Series\n{marker} **Dark (2017)** - time travel\n{second} Lost (2004): an island\n"
+    assert titles(parse_response(text))["Series"] == ["Dark (2017)", "Lost (2004)"]
+
+
+def test_deeper_bullets_continue_the_item():
+    text = "### Movies\n- **Heat (1995)** - a heist\n    - Platform: Netflix\n- Ronin (1998) - car chases\n"
+    movies = parse_response(text)["Movies"]
+    assert [item.title for item in movies] == ["Heat (1995)", "Ronin (1998)"]
+    assert "Platform: Netflix" in movies[0].explanation